@@ -0,0 +1,175 @@
+import argparse
+import asyncio
+import math
+import os
+import random
+import time
+from collections import Counter, deque
+from contextlib import asynccontextmanager
+
+# Admission control for agent turns. At most max_concurrent turns run at once; the rest wait
+# in one bounded queue per priority class and a freed slot always goes to the highest class
+# with someone waiting:
+#
+#   reschedule    turns of a session in the middle of the reschedule flow (closest to done)
+#   interactive   every other customer turn
+#   batch         bulk jobs that ask for it (request "priority": "batch")
+#
+# A turn is shed with Overloaded, answered as a fast "busy" with a retry hint, when its class
+# queue is full or it has waited max_wait seconds; under overload, queue time stays bounded
+# instead of every turn running into the request timeout.
+#
+# Environment: ADMISSION_MAX_CONCURRENT (per worker, default 32, 0 disables), ADMISSION_QUEUE_SIZE
+# (per class, default 100), ADMISSION_MAX_WAIT (seconds, default 10).
+#
+#   python ./agent_admission.py --rate 60 --service 0.2 --concurrency 8     # simulated overload
+
+PRIORITIES = ("reschedule", "interactive", "batch")
+WAIT_SAMPLES = 1000
+
+
+class Overloaded(Exception):
+    def __init__(self, priority: str, reason: str, retry_after: int):
+        super().__init__(f"{priority} turn shed ({reason}); retry after {retry_after}s")
+        self.priority = priority
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    ''' Priority admission for coroutines on one event loop: `async with controller.admit(priority):` '''
+
+    def __init__(self, max_concurrent: int = 32, queue_size: int = 100, max_wait: float = 10.0):
+        self.max_concurrent = max_concurrent
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self.running = 0
+        self.stats = Counter()
+        self._queues = {priority: deque() for priority in PRIORITIES}
+        self._waits = {priority: deque(maxlen=WAIT_SAMPLES) for priority in PRIORITIES}
+        self._service_time = 1.0  # Moving average of admitted turn duration, for retry hints
+
+    @classmethod
+    def from_env(cls) -> "AdmissionController | None":
+        max_concurrent = int(os.getenv("ADMISSION_MAX_CONCURRENT", "32"))
+        if not max_concurrent:
+            return None
+        return cls(max_concurrent, int(os.getenv("ADMISSION_QUEUE_SIZE", "100")),
+                   float(os.getenv("ADMISSION_MAX_WAIT", "10")))
+
+    def _retry_after(self) -> int:
+        queued = sum(len(queue) for queue in self._queues.values())
+        return max(1, math.ceil(self._service_time * (queued + 1) / self.max_concurrent))
+
+    def _shed(self, priority: str, reason: str) -> Overloaded:
+        self.stats[f"shed_{reason}:{priority}"] += 1
+        return Overloaded(priority, reason, self._retry_after())
+
+    async def _wait_for_slot(self, priority: str):
+        if self.running < self.max_concurrent:
+            self.running += 1
+            return
+        queue = self._queues[priority]
+        if len(queue) >= self.queue_size:
+            raise self._shed(priority, "full")
+        slot = asyncio.get_running_loop().create_future()
+        queue.append(slot)
+        try:
+            await asyncio.wait_for(asyncio.shield(slot), self.max_wait)
+        except asyncio.TimeoutError:
+            self._abandon(queue, slot)
+            raise self._shed(priority, "timeout")
+        except asyncio.CancelledError:
+            self._abandon(queue, slot)
+            raise
+
+    def _abandon(self, queue: deque, slot: asyncio.Future):
+        if slot.done():  # Handed a slot just as the wait ended; pass it on
+            self._release()
+        else:
+            queue.remove(slot)
+
+    def _release(self):
+        # Hand the slot straight to the highest-priority waiter; running only drops when nobody waits.
+        for priority in PRIORITIES:
+            queue = self._queues[priority]
+            if queue:
+                queue.popleft().set_result(None)
+                return
+        self.running -= 1
+
+    @asynccontextmanager
+    async def admit(self, priority: str = "interactive"):
+        ''' Waits for a slot (raises Overloaded when shed) and holds it for the body. '''
+        queued_at = time.perf_counter()
+        await self._wait_for_slot(priority)
+        started = time.perf_counter()
+        self._waits[priority].append(started - queued_at)
+        self.stats[f"admitted:{priority}"] += 1
+        try:
+            yield
+        finally:
+            self._service_time = 0.9 * self._service_time + 0.1 * (time.perf_counter() - started)
+            self._release()
+
+    def metrics(self) -> dict:
+        classes = {}
+        for priority in PRIORITIES:
+            waits = sorted(self._waits[priority])
+            classes[priority] = {
+                "queued": len(self._queues[priority]),
+                "admitted": self.stats[f"admitted:{priority}"],
+                "shed_full": self.stats[f"shed_full:{priority}"],
+                "shed_timeout": self.stats[f"shed_timeout:{priority}"],
+                "wait_p50_ms": waits[len(waits) // 2] * 1000 if waits else 0.0,
+                "wait_p95_ms": waits[int(len(waits) * 0.95)] * 1000 if waits else 0.0,
+            }
+        return {"running": self.running, "max_concurrent": self.max_concurrent,
+                "avg_service_ms": self._service_time * 1000, "classes": classes}
+
+
+async def simulate(rate: float, service: float, concurrency: int, duration: float, mix: dict, prioritised: bool,
+                   queue_size: int, max_wait: float, seed: int = 7):
+    ''' Poisson arrivals of turns with the given class mix against one controller. '''
+    from perf_stats import latency_summary
+    rng = random.Random(seed)
+    controller = AdmissionController(concurrency, queue_size, max_wait)
+    latencies = {priority: [] for priority in PRIORITIES}
+    shed = Counter()
+
+    async def turn(priority: str):
+        started = time.perf_counter()
+        try:
+            async with controller.admit(priority if prioritised else "interactive"):
+                await asyncio.sleep(rng.expovariate(1 / service))
+            latencies[priority].append(time.perf_counter() - started)
+        except Overloaded:
+            shed[priority] += 1
+
+    tasks = []
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        priority = rng.choices(list(mix), weights=list(mix.values()))[0]
+        tasks.append(asyncio.create_task(turn(priority)))
+        await asyncio.sleep(rng.expovariate(rate))
+    await asyncio.gather(*tasks)
+    print(f"{'priority' if prioritised else 'fifo'}:")
+    for priority in mix:
+        total = len(latencies[priority]) + shed[priority]
+        print(f"  {priority:12s} {total:5d} turns, shed {shed[priority] / max(1, total):6.1%}, "
+              f"{latency_summary(latencies[priority])}")
+
+
+if __name__ == "__main__":
+    cli = argparse.ArgumentParser(description="Simulate overload against the admission controller.")
+    cli.add_argument("--rate", type=float, default=60, help="Arriving turns per second")
+    cli.add_argument("--service", type=float, default=0.2, help="Mean turn duration (s)")
+    cli.add_argument("--concurrency", type=int, default=8, help="Turns allowed to run at once")
+    cli.add_argument("--duration", type=float, default=10)
+    cli.add_argument("--queue-size", type=int, default=100)
+    cli.add_argument("--max-wait", type=float, default=2.0)
+    args = cli.parse_args()
+    mix = {"reschedule": 0.2, "interactive": 0.6, "batch": 0.2}
+    for prioritised in (False, True):
+        asyncio.run(simulate(args.rate, args.service, args.concurrency, args.duration, mix, prioritised,
+                             args.queue_size, args.max_wait))
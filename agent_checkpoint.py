@@ -0,0 +1,149 @@
+import glob
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Any
+from langchain.agents import AgentExecutor
+from langchain.agents.output_parsers.tools import ToolAgentAction
+from langchain_core.agents import AgentAction, AgentActionMessageLog, AgentStep
+from langchain_core.messages import messages_from_dict, messages_to_dict
+
+# Checkpointed agent runs. Every tool observation is appended to checkpoints/<run_id>.jsonl
+# as soon as it arrives; if the run dies later (timeout, quota error, unparseable answer),
+# running it again with the same run id feeds the saved steps straight back into the
+# executor's scratchpad, so no search or LLM call that already completed is repeated.
+# Checkpoints of finished runs are removed; abandoned ones expire after a TTL.
+#
+# Environment: AGENT_CHECKPOINT_DIR (default checkpoints/, empty disables),
+# AGENT_CHECKPOINT_TTL_HOURS (default 24).
+
+
+def run_id_for(*parts: str) -> str:
+    ''' Stable run id from the run's inputs, so re-running the same query resumes it. '''
+    normalised = "\x1f".join(" ".join(p.lower().split()) for p in parts)
+    return hashlib.sha1(normalised.encode("utf-8")).hexdigest()[:16]
+
+
+def _action_to_dict(action: AgentAction) -> dict:
+    data = {"tool": action.tool, "tool_input": action.tool_input, "log": action.log}
+    if isinstance(action, AgentActionMessageLog):
+        data["message_log"] = messages_to_dict(action.message_log)
+    if isinstance(action, ToolAgentAction):
+        data["tool_call_id"] = action.tool_call_id
+    return data
+
+
+def _action_from_dict(data: dict) -> AgentAction:
+    if "tool_call_id" in data:
+        return ToolAgentAction(tool=data["tool"], tool_input=data["tool_input"], log=data["log"],
+                               message_log=messages_from_dict(data["message_log"]), tool_call_id=data["tool_call_id"])
+    if "message_log" in data:
+        return AgentActionMessageLog(tool=data["tool"], tool_input=data["tool_input"], log=data["log"],
+                                     message_log=messages_from_dict(data["message_log"]))
+    return AgentAction(tool=data["tool"], tool_input=data["tool_input"], log=data["log"])
+
+
+class RunCheckpoint:
+    ''' Append-only step log of one run. '''
+
+    def __init__(self, path: str, run_id: str):
+        self.path = path
+        self.run_id = run_id
+
+    def load(self) -> list[tuple[AgentAction, Any]]:
+        if not os.path.exists(self.path):
+            return []
+        steps = []
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:  # Torn last line from a crash mid-write
+                    break
+                steps.append((_action_from_dict(record["action"]), record["observation"]))
+        return steps
+
+    def append(self, step: AgentStep):
+        line = json.dumps({"action": _action_to_dict(step.action), "observation": step.observation,
+                           "ts": time.time()}, ensure_ascii=False, default=str)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class CheckpointStore:
+    ''' Directory of run checkpoints; removes ones untouched for longer than ttl_hours. '''
+
+    def __init__(self, directory: str = "checkpoints", ttl_hours: float = 24):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.ttl_seconds = ttl_hours * 3600
+
+    @classmethod
+    def from_env(cls) -> "CheckpointStore | None":
+        directory = os.getenv("AGENT_CHECKPOINT_DIR", "checkpoints")
+        if not directory:
+            return None
+        return cls(directory, float(os.getenv("AGENT_CHECKPOINT_TTL_HOURS", "24")))
+
+    def run(self, run_id: str) -> RunCheckpoint:
+        return RunCheckpoint(os.path.join(self.directory, f"{run_id}.jsonl"), run_id)
+
+    def gc(self) -> int:
+        ''' Deletes expired checkpoints. Returns how many were removed. '''
+        cutoff = time.time() - self.ttl_seconds
+        removed = 0
+        for path in glob.glob(os.path.join(self.directory, "*.jsonl")):
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+            except OSError:  # Removed concurrently
+                pass
+        if removed:
+            logging.info(f"Removed {removed} expired checkpoints from {self.directory}/")
+        return removed
+
+
+class CheckpointedAgentExecutor(AgentExecutor):
+    ''' AgentExecutor that saves each tool step to `checkpoint` and resumes from it on the first step. '''
+
+    checkpoint: Any = None
+    """RunCheckpoint for this run, or None to run without checkpointing."""
+
+    def _restored_steps(self, intermediate_steps: list):
+        # Only at the start of a run: hand the saved steps to the loop as if they had just been taken.
+        if self.checkpoint is None or intermediate_steps:
+            return None
+        steps = self.checkpoint.load()
+        if steps:
+            logging.info(f"Resuming run {self.checkpoint.run_id} from {len(steps)} checkpointed tool steps")
+        return steps or None
+
+    def _take_next_step(self, name_to_tool_map, color_mapping, inputs, intermediate_steps, run_manager=None):
+        return self._restored_steps(intermediate_steps) or super()._take_next_step(
+            name_to_tool_map, color_mapping, inputs, intermediate_steps, run_manager)
+
+    async def _atake_next_step(self, name_to_tool_map, color_mapping, inputs, intermediate_steps, run_manager=None):
+        return self._restored_steps(intermediate_steps) or await super()._atake_next_step(
+            name_to_tool_map, color_mapping, inputs, intermediate_steps, run_manager)
+
+    def _save(self, step: AgentStep) -> AgentStep:
+        if self.checkpoint is not None:
+            try:
+                self.checkpoint.append(step)
+            except OSError as e:
+                logging.error(f"Could not checkpoint step of run {self.checkpoint.run_id}: {e}")
+        return step
+
+    def _perform_agent_action(self, name_to_tool_map, color_mapping, agent_action, run_manager=None):
+        return self._save(super()._perform_agent_action(name_to_tool_map, color_mapping, agent_action, run_manager))
+
+    async def _aperform_agent_action(self, name_to_tool_map, color_mapping, agent_action, run_manager=None):
+        return self._save(
+            await super()._aperform_agent_action(name_to_tool_map, color_mapping, agent_action, run_manager))
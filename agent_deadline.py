@@ -0,0 +1,154 @@
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from langchain_core.agents import AgentFinish
+from langchain_core.runnables import RunnableLambda
+
+# Per-turn deadlines. A turn runs inside `with deadline(seconds):`; the remaining budget
+# is visible to everything the turn calls (remaining()), including tool threads, and is
+# handed to each outbound call as its timeout: the LLM through DeadlineChatModel, the
+# backends and HTTP clients through remaining(). Steps run on the caller's thread, so
+# nothing is left running once the turn gives up; a tool is never started after the
+# budget is spent. A call that times out ends the turn with the best partial answer,
+# the last tool observation, marked degraded=True.
+#
+# Process-wide counters in `deadline_stats`: timeouts:llm, timeouts:tool, degraded_turns.
+
+DEGRADED_FALLBACK = "I'm sorry, this is taking longer than expected. Please try again in a moment."
+
+deadline_stats = Counter()
+
+_current: ContextVar["Deadline | None"] = ContextVar("turn_deadline", default=None)
+_stage: ContextVar["list | None"] = ContextVar("turn_stage", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    ''' Raised instead of starting work the turn no longer has time for. '''
+
+
+class Deadline:
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+
+@contextmanager
+def deadline(seconds: float | None):
+    ''' Scopes a deadline; nested scopes never extend an outer one. None means no deadline. '''
+    if seconds is None:
+        yield None
+        return
+    scoped = Deadline(seconds)
+    outer = _current.get()
+    if outer is not None and outer.expires_at < scoped.expires_at:
+        scoped = outer
+    token = _current.set(scoped)
+    try:
+        yield scoped
+    finally:
+        _current.reset(token)
+
+
+def remaining(default: float | None = None) -> float | None:
+    ''' Seconds left in the current turn, or default outside a deadline. Use it as a call timeout. '''
+    current = _current.get()
+    return current.remaining() if current is not None else default
+
+
+def _call_budget() -> dict:
+    budget = remaining()
+    if budget is None:
+        return {}
+    if budget <= 0:
+        raise DeadlineExceeded("Turn deadline exceeded before the LLM call")
+    # A retry after backoff would not fit in what is left of the turn anyway
+    return {"timeout": budget, "max_retries": 1}
+
+
+class DeadlineChatModel:
+    ''' Wraps a chat model for create_*_agent so every call gets the turn's remaining budget as its
+    timeout (ChatGoogleGenerativeAI and the stub model take timeout= per call). '''
+
+    def __init__(self, llm):
+        self.llm = llm
+
+    def bind_tools(self, tools, **kwargs):
+        bound = self.llm.bind_tools(tools, **kwargs)
+
+        def call(messages, config):
+            return bound.invoke(messages, config, **_call_budget())
+
+        async def acall(messages, config):
+            return await bound.ainvoke(messages, config, **_call_budget())
+
+        return RunnableLambda(call, afunc=acall, name=type(self.llm).__name__)
+
+
+class DeadlineAgentExecutorMixin:
+    ''' Put in front of an AgentExecutor class: steps run under the current deadline. '''
+
+    def _degraded_finish(self, intermediate_steps: list, stage: str) -> AgentFinish:
+        deadline_stats[f"timeouts:{stage}"] += 1
+        deadline_stats["degraded_turns"] += 1
+        logging.warning(f"Turn deadline exceeded during {stage} call after {len(intermediate_steps)} steps")
+        partial = str(intermediate_steps[-1][1]) if intermediate_steps else DEGRADED_FALLBACK
+        return_key = self._action_agent.return_values[0] if self._action_agent.return_values else "output"
+        return AgentFinish({return_key: partial, "degraded": True}, "Turn deadline exceeded")
+
+    def _take_next_step(self, name_to_tool_map, color_mapping, inputs, intermediate_steps, run_manager=None):
+        current = _current.get()
+        if current is None:
+            return super()._take_next_step(name_to_tool_map, color_mapping, inputs, intermediate_steps, run_manager)
+        stage = ["llm"]
+        _stage.set(stage)
+        if current.expired:
+            return self._degraded_finish(intermediate_steps, stage[0])
+        try:
+            return super()._take_next_step(name_to_tool_map, color_mapping, inputs, intermediate_steps, run_manager)
+        except Exception:
+            # Whatever the client raised on its timeout; other failures are not ours to hide
+            if not current.expired:
+                raise
+            return self._degraded_finish(intermediate_steps, stage[0])
+
+    async def _atake_next_step(self, name_to_tool_map, color_mapping, inputs, intermediate_steps, run_manager=None):
+        current = _current.get()
+        if current is None:
+            return await super()._atake_next_step(
+                name_to_tool_map, color_mapping, inputs, intermediate_steps, run_manager)
+        stage = ["llm"]
+        _stage.set(stage)
+        if current.expired:
+            return self._degraded_finish(intermediate_steps, stage[0])
+        try:
+            return await super()._atake_next_step(
+                name_to_tool_map, color_mapping, inputs, intermediate_steps, run_manager)
+        except Exception:
+            if not current.expired:
+                raise
+            return self._degraded_finish(intermediate_steps, stage[0])
+
+    def _perform_agent_action(self, name_to_tool_map, color_mapping, agent_action, run_manager=None):
+        self._start_tool()
+        return super()._perform_agent_action(name_to_tool_map, color_mapping, agent_action, run_manager)
+
+    async def _aperform_agent_action(self, name_to_tool_map, color_mapping, agent_action, run_manager=None):
+        self._start_tool()
+        return await super()._aperform_agent_action(name_to_tool_map, color_mapping, agent_action, run_manager)
+
+    @staticmethod
+    def _start_tool():
+        if (stage := _stage.get()) is not None:
+            stage[0] = "tool"
+        # A tool that starts runs to completion (confirm_reschedule must not half-happen), so none starts late
+        current = _current.get()
+        if current is not None and current.expired:
+            raise DeadlineExceeded("Turn deadline exceeded before the tool call")
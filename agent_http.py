@@ -0,0 +1,309 @@
+import argparse
+import logging
+import os
+import socket
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NameResolutionError, NewConnectionError
+from urllib3.util import connection
+from agent_deadline import remaining
+
+# Shared HTTP transport for the agents' outbound calls. One requests.Session per process with
+#   - a keep-alive connection pool per host, so repeated calls skip TCP and TLS setup
+#   - a per-host connection cap (pool_block): callers past the cap wait up to HTTP_POOL_TIMEOUT for
+#     a free connection instead of opening more sockets than the remote side will tolerate
+#   - a TTL DNS cache used by this transport's connections only, so DNS is resolved once per TTL,
+#     not per connection; nothing else in the process is affected
+#   - HTTP_TIMEOUT per request, cut to the remaining turn budget (agent_deadline.remaining())
+#
+# Clients that accept it use the shared session (the wikipedia package inside wikipedia_session();
+# its other callers keep plain requests).
+# The others keep their own transport, which the callers reuse instead of rebuilding it per call:
+#   Gemini   ChatGoogleGenerativeAI talks gRPC over one long-lived HTTP/2 channel per model instance
+#            (multiplexed and already kept alive); share the instance, as the agent factories do.
+#            gRPC resolves DNS itself, so the cache below does not apply to it.
+#   ddgs     uses its own Rust client (primp); one DDGS instance kept for the process keeps its
+#            connections open (see research_assistance_tools.py).
+#
+# Environment: HTTP_MAX_PER_HOST (default 10), HTTP_MAX_HOSTS (default 16), HTTP_DNS_TTL (seconds,
+# default 300, 0 disables the cache), HTTP_TIMEOUT (seconds, default 30), HTTP_POOL_TIMEOUT (seconds
+# to wait for a free connection, default 10).
+#
+#   python ./agent_http.py serve --port 8765 --handshake-ms 30
+#   python ./agent_http.py bench --concurrency 16 --requests 50      # starts its own stand-in server
+
+
+class DnsCache:
+    ''' TTL cache over socket.getaddrinfo for the connections of one HttpTransport. '''
+
+    def __init__(self, ttl: float = 300):
+        self.ttl = ttl
+        self.stats = Counter()
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._resolve = socket.getaddrinfo
+
+    def getaddrinfo(self, host, port, family=0, type=0, proto=0, flags=0):
+        key = (host, port, family, type, proto, flags)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and entry[0] > now:
+            self.stats["hits"] += 1
+            return entry[1]
+        self.stats["misses"] += 1
+        result = self._resolve(host, port, family, type, proto, flags)
+        with self._lock:
+            self._entries[key] = (now + self.ttl, result)
+        return result
+
+
+class _CachedDnsConnection:
+    ''' Resolves through the transport's DnsCache instead of socket.getaddrinfo. '''
+    dns_cache: DnsCache = None
+
+    def _new_conn(self) -> socket.socket:
+        try:
+            addresses = self.dns_cache.getaddrinfo(self._dns_host, self.port, 0, socket.SOCK_STREAM)
+        except socket.gaierror as e:
+            raise NameResolutionError(self.host, self, e) from e
+        error = None
+        for *_, address in addresses:
+            try:
+                # A numeric host: create_connection does no DNS lookup of its own
+                return connection.create_connection(address[:2], self.timeout, source_address=self.source_address,
+                                                    socket_options=self.socket_options)
+            except OSError as e:
+                error = e
+        if isinstance(error, TimeoutError):
+            raise ConnectTimeoutError(
+                self, f"Connection to {self.host} timed out. (connect timeout={self.timeout})") from error
+        raise NewConnectionError(self, f"Failed to establish a new connection: {error}") from error
+
+
+class _BoundedWaitPool:
+    ''' Waits at most pool_timeout (or what is left of the turn) for a free connection; requests never
+    passes a pool timeout, so with pool_block a full pool would otherwise block forever. '''
+    pool_timeout: float = None
+
+    def _get_conn(self, timeout: float = None):
+        if timeout is None:
+            timeout = min(self.pool_timeout, remaining(self.pool_timeout))
+        return super()._get_conn(timeout)
+
+
+class _TransportAdapter(HTTPAdapter):
+    def __init__(self, dns_cache: DnsCache | None, pool_timeout: float, **kwargs):
+        self.dns_cache = dns_cache
+        self.pool_timeout = pool_timeout
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        pool_classes = {}
+        for scheme, pool_cls, connection_cls in (("http", HTTPConnectionPool, HTTPConnection),
+                                                 ("https", HTTPSConnectionPool, HTTPSConnection)):
+            if self.dns_cache is not None:
+                connection_cls = type(connection_cls.__name__, (_CachedDnsConnection, connection_cls),
+                                      {"dns_cache": self.dns_cache})
+            pool_classes[scheme] = type(pool_cls.__name__, (_BoundedWaitPool, pool_cls),
+                                        {"ConnectionCls": connection_cls, "pool_timeout": self.pool_timeout})
+        self.poolmanager.pool_classes_by_scheme = pool_classes
+
+
+class DeadlineSession(requests.Session):
+    ''' Session whose requests time out after `timeout` seconds, or sooner if the turn deadline is closer. '''
+
+    def __init__(self, timeout: float = None):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        if kwargs.get("timeout") is None:
+            budget = remaining()
+            kwargs["timeout"] = self.timeout if budget is None else min(budget, self.timeout or budget)
+        return super().request(method, url, **kwargs)
+
+
+class HttpTransport:
+    ''' Keep-alive session with at most max_per_host connections to each host. '''
+
+    def __init__(self, max_per_host: int = 10, max_hosts: int = 16, dns_cache: DnsCache = None,
+                 timeout: float = 30, pool_timeout: float = 10):
+        self.max_per_host = max_per_host
+        self.dns_cache = dns_cache
+        self.adapter = _TransportAdapter(dns_cache, pool_timeout, pool_connections=max_hosts,
+                                         pool_maxsize=max_per_host, pool_block=True)
+        self.session = DeadlineSession(timeout)
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+
+    @classmethod
+    def from_env(cls) -> "HttpTransport":
+        ttl = float(os.getenv("HTTP_DNS_TTL", "300"))
+        return cls(int(os.getenv("HTTP_MAX_PER_HOST", "10")), int(os.getenv("HTTP_MAX_HOSTS", "16")),
+                   DnsCache(ttl) if ttl else None, float(os.getenv("HTTP_TIMEOUT", "30")),
+                   float(os.getenv("HTTP_POOL_TIMEOUT", "10")))
+
+    def stats(self) -> dict:
+        ''' Connections opened per host so far, plus DNS cache hits and misses. '''
+        pools = self.adapter.poolmanager.pools
+        opened = {f"{key.key_scheme}://{key.key_host}:{key.key_port}": pools[key].num_connections
+                  for key in pools.keys()}
+        return {"connections_opened": opened, "dns": dict(self.dns_cache.stats) if self.dns_cache else None}
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_transport() -> HttpTransport:
+    ''' The process-wide transport, created from the environment on first use. '''
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = HttpTransport.from_env()
+        return _shared
+
+
+_wikipedia_session: ContextVar["requests.Session | None"] = ContextVar("wikipedia_session", default=None)
+
+
+class _WikipediaRequests:
+    ''' Stands in for the requests module inside the wikipedia package, which calls requests.get for
+    every API request: within wikipedia_session() it uses that session, elsewhere plain requests. '''
+
+    def get(self, *args, **kwargs):
+        session = _wikipedia_session.get()
+        return (session or requests).get(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(requests, name)
+
+
+@contextmanager
+def wikipedia_session(transport: HttpTransport):
+    ''' Routes the wikipedia package calls made inside the block (e.g. by WikipediaAPIWrapper) through
+    the transport's session. '''
+    import wikipedia.wikipedia
+    if not isinstance(wikipedia.wikipedia.requests, _WikipediaRequests):
+        wikipedia.wikipedia.requests = _WikipediaRequests()
+    token = _wikipedia_session.set(transport.session)
+    try:
+        yield
+    finally:
+        _wikipedia_session.reset(token)
+
+
+# ======================================================== BENCHMARK ======================================================== #
+class StandInHandler(BaseHTTPRequestHandler):
+    ''' Answers every GET after `latency` seconds; each new connection first waits `handshake` seconds. '''
+    protocol_version = "HTTP/1.1"  # Keep-alive
+    latency = 0.01
+    handshake = 0.03  # Stands in for TCP + TLS setup to a remote API
+    counts = Counter()
+    counts_lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        # Headers and body go out as separate writes; without this, delayed ACKs add ~40ms per keep-alive request
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self.counts_lock:
+            self.counts["connections"] += 1
+        time.sleep(self.handshake)
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        with self.counts_lock:
+            self.counts["requests"] += 1
+        body = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.debug(format % args)
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # The default backlog of 5 makes connect() bursts stall on SYN retries
+
+
+def start_stand_in(port: int = 0, latency: float = 0.01, handshake: float = 0.03) -> StandInServer:
+    StandInHandler.latency, StandInHandler.handshake = latency, handshake
+    server = StandInServer(("127.0.0.1", port), StandInHandler)
+    threading.Thread(target=server.serve_forever, name="stand-in-http", daemon=True).start()
+    return server
+
+
+def benchmark(url: str, concurrency: int, requests_per_worker: int, max_per_host: int):
+    from perf_stats import latency_summary
+
+    def fresh_get():
+        # What a client without a shared session does: a new connection (and DNS lookup) per call.
+        with requests.Session() as session:
+            return session.get(url).status_code
+
+    def pooled_get():
+        return pooled.session.get(url).status_code
+
+    pooled = HttpTransport(max_per_host=max_per_host, dns_cache=DnsCache())
+    for name, get, dns in (("fresh", fresh_get, None), ("pooled", pooled_get, pooled.dns_cache)):
+        StandInHandler.counts.clear()
+        latencies = []
+
+        def worker():
+            for _ in range(requests_per_worker):
+                started = time.perf_counter()
+                get()
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            for future in [pool.submit(worker) for _ in range(concurrency)]:
+                future.result()
+        elapsed = time.perf_counter() - started
+        print(f"{name:>7}: {len(latencies)} requests, {len(latencies) / elapsed:.0f} req/s, "
+              f"{latency_summary(latencies)}, connections={StandInHandler.counts['connections']}"
+              + (f", dns hits={dns.stats['hits']} misses={dns.stats['misses']}" if dns else ""))
+# ======================================================== BENCHMARK ======================================================== #
+
+
+if __name__ == "__main__":
+    cli = argparse.ArgumentParser(description="Stand-in HTTP server and pooled-transport benchmark.")
+    sub = cli.add_subparsers(dest="command", required=True)
+    for name in ("serve", "bench"):
+        cmd = sub.add_parser(name)
+        cmd.add_argument("--latency-ms", type=float, default=10, help="Server time per request")
+        cmd.add_argument("--handshake-ms", type=float, default=30, help="Extra setup time per new connection")
+        cmd.add_argument("--port", type=int, default=8765 if name == "serve" else 0)
+    bench_cmd = sub.choices["bench"]
+    bench_cmd.add_argument("--concurrency", type=int, default=16)
+    bench_cmd.add_argument("--requests", type=int, default=50, help="Requests per concurrent worker")
+    bench_cmd.add_argument("--max-per-host", type=int, help="Pooled connection cap (default: --concurrency)")
+    args = cli.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='-- logger: %(message)s')
+    server = start_stand_in(args.port, args.latency_ms / 1000, args.handshake_ms / 1000)
+    if args.command == "serve":
+        logging.info(f"Stand-in API on http://localhost:{server.server_port}/")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            server.shutdown()
+    else:
+        benchmark(f"http://localhost:{server.server_port}/", args.concurrency, args.requests,
+                  args.max_per_host or args.concurrency)
@@ -0,0 +1,119 @@
+import json
+import logging
+from collections import Counter
+from contextvars import ContextVar
+from langchain.agents import AgentExecutor
+from langchain_core.agents import AgentFinish, AgentStep
+
+# Loop guard for tool-calling agents. Within one turn an identical tool call (same tool,
+# same arguments) is answered from the earlier observation instead of running the tool
+# again, and a call sequence that starts repeating itself ends the turn early with the
+# last observation as the answer instead of burning the remaining iterations.
+#
+# Process-wide counters are exported in `loop_guard_stats`:
+#   suppressed_calls   duplicate calls answered from the turn's memo
+#   forced_finishes    turns ended early because of a cycle
+#   suppressed:<tool>  duplicate calls per tool
+
+loop_guard_stats = Counter()
+
+# Per-turn call memo; a context variable so concurrent turns (threads or asyncio tasks) stay apart.
+_turn_calls: ContextVar["_TurnCalls | None"] = ContextVar("turn_calls", default=None)
+
+
+class _TurnCalls:
+    def __init__(self):
+        self.observations = {}
+        self.sequence = []
+        self.forced_output = None
+
+
+def call_key(tool: str, tool_input) -> tuple[str, str]:
+    if isinstance(tool_input, dict):
+        return tool, json.dumps(tool_input, sort_keys=True, default=str)
+    return tool, str(tool_input).strip()
+
+
+def has_cycle(sequence: list, repeats: int, max_period: int = 3) -> bool:
+    ''' True if the tail of `sequence` is some pattern of 1..max_period calls repeated `repeats` times. '''
+    for period in range(1, max_period + 1):
+        span = period * repeats
+        if len(sequence) < span:
+            break
+        tail = sequence[-span:]
+        if all(tail[i] == tail[i % period] for i in range(span)):
+            return True
+    return False
+
+
+class LoopGuardAgentExecutor(AgentExecutor):
+    ''' AgentExecutor that memoises tool calls within a turn and stops repeating call cycles. '''
+
+    cycle_repeats: int = 2
+    """How many consecutive repetitions of a call pattern end the turn (2 = the first exact repeat)."""
+
+    def _call(self, inputs, run_manager=None):
+        token = _turn_calls.set(_TurnCalls())
+        try:
+            return super()._call(inputs, run_manager=run_manager)
+        finally:
+            _turn_calls.reset(token)
+
+    async def _acall(self, inputs, run_manager=None):
+        token = _turn_calls.set(_TurnCalls())
+        try:
+            return await super()._acall(inputs, run_manager=run_manager)
+        finally:
+            _turn_calls.reset(token)
+
+    def _memoised_step(self, agent_action) -> AgentStep | None:
+        calls = _turn_calls.get()
+        if calls is None:
+            return None
+        key = call_key(agent_action.tool, agent_action.tool_input)
+        calls.sequence.append(key)
+        if key not in calls.observations:
+            return None
+        observation = calls.observations[key]
+        loop_guard_stats["suppressed_calls"] += 1
+        loop_guard_stats[f"suppressed:{agent_action.tool}"] += 1
+        logging.info(f"Suppressed repeated call {agent_action.tool}({key[1]})")
+        if has_cycle(calls.sequence, self.cycle_repeats):
+            calls.forced_output = observation
+        return AgentStep(action=agent_action, observation=observation)
+
+    def _remember(self, step: AgentStep) -> AgentStep:
+        calls = _turn_calls.get()
+        if calls is not None:
+            calls.observations[call_key(step.action.tool, step.action.tool_input)] = step.observation
+        return step
+
+    def _perform_agent_action(self, name_to_tool_map, color_mapping, agent_action, run_manager=None):
+        step = self._memoised_step(agent_action)
+        if step is not None:
+            return step
+        return self._remember(super()._perform_agent_action(name_to_tool_map, color_mapping, agent_action, run_manager))
+
+    async def _aperform_agent_action(self, name_to_tool_map, color_mapping, agent_action, run_manager=None):
+        step = self._memoised_step(agent_action)
+        if step is not None:
+            return step
+        return self._remember(
+            await super()._aperform_agent_action(name_to_tool_map, color_mapping, agent_action, run_manager))
+
+    def _forced_finish(self, next_step):
+        calls = _turn_calls.get()
+        if calls is None or calls.forced_output is None or isinstance(next_step, AgentFinish):
+            return next_step
+        loop_guard_stats["forced_finishes"] += 1
+        logging.warning("Tool call cycle detected; ending the turn with the last observation")
+        return_key = self._action_agent.return_values[0] if self._action_agent.return_values else "output"
+        return AgentFinish({return_key: str(calls.forced_output)}, "")
+
+    def _take_next_step(self, name_to_tool_map, color_mapping, inputs, intermediate_steps, run_manager=None):
+        return self._forced_finish(super()._take_next_step(
+            name_to_tool_map, color_mapping, inputs, intermediate_steps, run_manager))
+
+    async def _atake_next_step(self, name_to_tool_map, color_mapping, inputs, intermediate_steps, run_manager=None):
+        return self._forced_finish(await super()._atake_next_step(
+            name_to_tool_map, color_mapping, inputs, intermediate_steps, run_manager))
@@ -0,0 +1,171 @@
+import asyncio
+import cProfile
+import io
+import logging
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+# On-demand profiling of agent turns. Off by default; switched on with AGENT_PROFILE or
+# at runtime (":profile" in the chat loop, POST /admin/profile on the server).
+#
+#   cprofile  deterministic profile per turn: <turn>.prof (pstats/snakeviz) + <turn>.txt top functions
+#   sampling  wall-clock stack sampler per turn: <turn>.collapsed, one "frame;frame;frame count" line
+#             per stack, ready for flamegraph.pl or speedscope. Network waits show up as socket frames,
+#             so the split between LangChain's own machinery and the network is visible.
+#
+# Both profile the thread the turn runs on, which is the whole turn on the sync path (agent
+# steps, model calls and tools run inline). An event loop thread also runs every other
+# session's work, so profiling is refused there: async callers run the selected turn sync on
+# a thread of its own instead (see LogisticsSession.arespond).
+#
+# Environment: AGENT_PROFILE=cprofile|sampling, AGENT_PROFILE_EVERY=N (every Nth turn),
+# AGENT_PROFILE_DIR (default profiles/), AGENT_PROFILE_INTERVAL_MS (sampling, default 2).
+
+MODES = ("cprofile", "sampling")
+TOP_FUNCTIONS = 40
+
+
+class StackSampler:
+    ''' Samples one thread's Python stack at a fixed interval and counts collapsed stacks. '''
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write_collapsed(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+class TurnProfiler:
+    ''' Wraps selected turns with a profiler and writes one set of profile files per turn. '''
+
+    def __init__(self, directory: str = "profiles", mode: str = None, every: int = 1, interval: float = 0.002):
+        self.directory = directory
+        self.interval = interval
+        self.every = max(1, every)
+        self.mode = None
+        self._remaining = None
+        self._turns = 0
+        # Only one turn is profiled at a time; concurrent turns run unprofiled.
+        self._busy = threading.Lock()
+        if mode:
+            self.enable(mode)
+
+    @classmethod
+    def from_env(cls) -> "TurnProfiler":
+        return cls(
+            directory=os.getenv("AGENT_PROFILE_DIR", "profiles"),
+            mode=os.getenv("AGENT_PROFILE") or None,
+            every=int(os.getenv("AGENT_PROFILE_EVERY", "1")),
+            interval=float(os.getenv("AGENT_PROFILE_INTERVAL_MS", "2")) / 1000,
+        )
+
+    def enable(self, mode: str = "sampling", turns: int = None):
+        ''' Profiles every Nth turn from now on, or only the next `turns` turns. '''
+        if mode not in MODES:
+            raise ValueError(f"Unknown profile mode '{mode}', expected one of {', '.join(MODES)}")
+        os.makedirs(self.directory, exist_ok=True)
+        self.mode = mode
+        self._remaining = turns
+        logging.info(f"Turn profiling enabled ({mode}{f', next {turns} turns' if turns else ''}) -> {self.directory}/")
+
+    def disable(self):
+        self.mode = None
+        logging.info("Turn profiling disabled")
+
+    def select(self) -> str | None:
+        ''' Mode to profile the next turn with, or None. Counts the turn. '''
+        if self.mode is None:
+            return None
+        self._turns += 1
+        if self._turns % self.every:
+            return None
+        if self._remaining is not None:
+            self._remaining -= 1
+            if self._remaining <= 0:
+                mode, self.mode = self.mode, None
+                return mode
+        return self.mode
+
+    def _path(self, label: str) -> str:
+        safe_label = re.sub(r"[^\w.-]+", "_", label or "turn")[:60]
+        return os.path.join(self.directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{safe_label}-{self._turns}")
+
+    @contextmanager
+    def turn(self, label: str = None):
+        with self.profile(self.select(), label):
+            yield
+
+    @contextmanager
+    def profile(self, mode: str | None, label: str = None):
+        ''' Profiles the block on the calling thread, which must not run an event loop. '''
+        if mode is not None and _on_event_loop():
+            logging.warning("Not profiling a turn on an event loop thread; it would include other sessions' work")
+            mode = None
+        if mode is None or not self._busy.acquire(blocking=False):
+            yield
+            return
+        base = self._path(label)
+        started = time.perf_counter()
+        try:
+            if mode == "cprofile":
+                profile = cProfile.Profile()
+                profile.enable()
+                try:
+                    yield
+                finally:
+                    profile.disable()
+                    profile.dump_stats(base + ".prof")
+                    summary = io.StringIO()
+                    pstats.Stats(profile, stream=summary).sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+                    with open(base + ".txt", "w", encoding="utf-8") as f:
+                        f.write(summary.getvalue())
+            else:
+                sampler = StackSampler(threading.get_ident(), self.interval)
+                sampler.start()
+                try:
+                    yield
+                finally:
+                    sampler.stop()
+                    sampler.write_collapsed(base + ".collapsed")
+            logging.info(f"Profiled turn ({mode}, {(time.perf_counter() - started) * 1000:.0f}ms) -> {base}.*")
+        finally:
+            self._busy.release()
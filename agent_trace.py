@@ -0,0 +1,257 @@
+import argparse
+import glob
+import json
+import logging
+import os
+import queue
+import random
+import re
+import struct
+import threading
+import time
+import uuid
+import zlib
+from langchain_core.callbacks import BaseCallbackHandler
+
+# Trace store for agent turns. A callback handler captures each turn's LLM calls
+# (messages, output, tool calls, token counts), tool calls and observations, and
+# timings. Finished turns go to a background writer that redacts, compresses and
+# appends them to segment files:
+#
+#   segment-<pid>-000001.log   records: <u32 length><zlib-compressed compact JSON>
+#   segment-<pid>-000001.idx   one JSON line per record: offset, length, session, tools, latency
+#
+# Segments are named after the writing process, so serve workers sharing a trace
+# directory never append to the same file.
+#
+# The hot path only appends timestamps and object references; serialisation happens
+# on the writer thread. Unsampled turns get no callback handler at all.
+#
+#   python ./agent_trace.py traces/ --session s1 --tool track_shipment --min-latency-ms 500
+
+SEGMENT_MAX_BYTES = 64 * 1024 * 1024
+_RECORD_HEADER = struct.Struct("<I")
+
+DEFAULT_REDACT_PATTERNS = [
+    r"[\w.+-]+@[\w-]+\.[\w.]+",                # e-mail addresses
+    r"(?<!\d)(?:\+?60|0)1\d[- ]?\d{3,4}[- ]?\d{4}(?!\d)",  # Malaysian mobile numbers
+]
+
+
+def _message_summary(message) -> list:
+    return [message.type, message.content if isinstance(message.content, str) else json.dumps(message.content)]
+
+
+class TurnTrace(BaseCallbackHandler):
+    ''' Collects one turn's events. Pass it as a callback to the executor invocation. '''
+    run_inline = True  # Cheap handler; don't hop to a thread pool under async execution
+
+    def __init__(self, session_id: str, query: str):
+        self.turn_id = uuid.uuid4().hex
+        self.session_id = session_id
+        self.query = query
+        self.started_at = time.time()
+        self._t0 = time.perf_counter()
+        self.llm_calls = {}
+        self.tools = {}
+
+    def _ms(self) -> float:
+        return (time.perf_counter() - self._t0) * 1000
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self.llm_calls[run_id] = {"start_ms": self._ms(), "messages": messages[0]}
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        call = self.llm_calls.get(run_id)
+        if call is None:
+            return
+        call["end_ms"] = self._ms()
+        generation = response.generations[0][0] if response.generations and response.generations[0] else None
+        call["response"] = getattr(generation, "message", None)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        if run_id in self.llm_calls:
+            self.llm_calls[run_id].update(end_ms=self._ms(), error=f"{type(error).__name__}: {error}")
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        self.tools[run_id] = {"name": (serialized or {}).get("name") or kwargs.get("name"),
+                              "input": input_str, "start_ms": self._ms()}
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        if run_id in self.tools:
+            self.tools[run_id].update(end_ms=self._ms(), output=output)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        if run_id in self.tools:
+            self.tools[run_id].update(end_ms=self._ms(), error=f"{type(error).__name__}: {error}")
+
+
+class TraceRecorder:
+    ''' Samples turns and appends finished ones to segment files from a background thread. '''
+
+    def __init__(self, directory: str, sample_rate: float = 1.0, redact_patterns: list[str] = None,
+                 segment_max_bytes: int = SEGMENT_MAX_BYTES):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.segment_max_bytes = segment_max_bytes
+        patterns = DEFAULT_REDACT_PATTERNS if redact_patterns is None else redact_patterns
+        self._redact_re = re.compile("|".join(f"(?:{p})" for p in patterns)) if patterns else None
+        self._queue = queue.SimpleQueue()
+        self._writer_id = os.getpid()
+        self._segment_no = self._last_segment_no() + 1
+        self._log = self._idx = None
+        self.recorded = 0
+        self._writer = threading.Thread(target=self._write_loop, name="trace-writer", daemon=True)
+        self._writer.start()
+
+    @classmethod
+    def from_env(cls) -> "TraceRecorder | None":
+        ''' AGENT_TRACE_DIR enables tracing; AGENT_TRACE_SAMPLE_RATE (0-1) samples turns. '''
+        directory = os.getenv("AGENT_TRACE_DIR")
+        if not directory:
+            return None
+        return cls(directory, float(os.getenv("AGENT_TRACE_SAMPLE_RATE", "1.0")))
+
+    # -- hot path -------------------------------------------------------------------------------------------------- #
+    def start_turn(self, session_id: str, query: str) -> TurnTrace | None:
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return None
+        return TurnTrace(session_id, query)
+
+    def finish_turn(self, trace: TurnTrace | None, output: str = None, error: Exception = None, **extra):
+        if trace is None:
+            return
+        latency_ms = trace._ms()
+        self._queue.put((trace, output, f"{type(error).__name__}: {error}" if error else None, latency_ms, extra))
+
+    def flush(self, timeout: float = 5.0):
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    # -- writer thread --------------------------------------------------------------------------------------------- #
+    def _segment_prefix(self) -> str:
+        return os.path.join(self.directory, f"segment-{self._writer_id}-")
+
+    def _last_segment_no(self) -> int:
+        # A recycled pid continues after the segments its dead namesake left behind
+        prefix = self._segment_prefix()
+        numbers = [int(p[len(prefix):-4]) for p in glob.glob(prefix + "[0-9]*.log")]
+        return max(numbers, default=0)
+
+    def _redact(self, text):
+        if self._redact_re is None or not isinstance(text, str):
+            return text
+        return self._redact_re.sub("[REDACTED]", text)
+
+    def _to_record(self, trace: TurnTrace, output, error, latency_ms, extra) -> dict:
+        llm_calls = []
+        for call in trace.llm_calls.values():
+            response = call.get("response")
+            llm_calls.append({
+                "start_ms": round(call["start_ms"], 2), "end_ms": round(call.get("end_ms", latency_ms), 2),
+                "messages": [[kind, self._redact(content)] for kind, content in map(_message_summary, call["messages"])],
+                "output": self._redact(response.content) if response is not None else None,
+                "tool_calls": [{"name": c["name"], "args": json.loads(self._redact(json.dumps(c["args"])))}
+                               for c in getattr(response, "tool_calls", None) or []],
+                "tokens": getattr(response, "usage_metadata", None),
+                "error": call.get("error"),
+            })
+        tools = [{"name": t["name"], "input": self._redact(t["input"]), "output": self._redact(str(t.get("output"))),
+                  "start_ms": round(t["start_ms"], 2), "end_ms": round(t.get("end_ms", latency_ms), 2),
+                  "error": t.get("error")} for t in trace.tools.values()]
+        return {
+            "turn_id": trace.turn_id, "session": trace.session_id, "ts": trace.started_at,
+            "query": self._redact(trace.query), "output": self._redact(output), "error": error,
+            "latency_ms": round(latency_ms, 2), "llm_calls": llm_calls, "tools": tools, **extra,
+        }
+
+    def _open_segment(self):
+        base = f"{self._segment_prefix()}{self._segment_no:06d}"
+        self._log = open(base + ".log", "ab")
+        self._idx = open(base + ".idx", "a", encoding="utf-8")
+
+    def _write(self, record: dict):
+        if self._log is None or self._log.tell() >= self.segment_max_bytes:
+            if self._log is not None:
+                self._log.close()
+                self._idx.close()
+                self._segment_no += 1
+            self._open_segment()
+        payload = zlib.compress(json.dumps(record, separators=(",", ":"), default=str).encode("utf-8"))
+        offset = self._log.tell()
+        self._log.write(_RECORD_HEADER.pack(len(payload)) + payload)
+        self._idx.write(json.dumps({
+            "offset": offset, "length": len(payload), "turn_id": record["turn_id"], "session": record["session"],
+            "ts": record["ts"], "latency_ms": record["latency_ms"], "error": record["error"] is not None,
+            "tools": sorted({t["name"] for t in record["tools"]}),
+        }, separators=(",", ":")) + "\n")
+
+    def _write_loop(self):
+        while True:
+            item = self._queue.get()
+            if isinstance(item, threading.Event):
+                if self._log is not None:
+                    self._log.flush()
+                    self._idx.flush()
+                item.set()
+                continue
+            try:
+                self._write(self._to_record(*item))
+                self.recorded += 1
+            except Exception as e:
+                logging.error(f"Failed to write agent trace: {e}", exc_info=True)
+            if self._queue.empty() and self._log is not None:
+                self._log.flush()
+                self._idx.flush()
+
+
+# ========================================================= READER ========================================================== #
+def iter_index(directory: str):
+    for idx_path in sorted(glob.glob(os.path.join(directory, "segment-*.idx"))):
+        with open(idx_path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield idx_path[:-4] + ".log", json.loads(line)
+
+
+def read_record(log_path: str, offset: int) -> dict:
+    with open(log_path, "rb") as f:
+        f.seek(offset)
+        (length,) = _RECORD_HEADER.unpack(f.read(_RECORD_HEADER.size))
+        return json.loads(zlib.decompress(f.read(length)))
+
+
+def find_traces(directory: str, session: str = None, tool: str = None, min_latency_ms: float = None,
+                errors_only: bool = False):
+    ''' Yields (log_path, index entry) for traces matching every given filter, using only the index. '''
+    for log_path, entry in iter_index(directory):
+        if session is not None and entry["session"] != session:
+            continue
+        if tool is not None and tool not in entry["tools"]:
+            continue
+        if min_latency_ms is not None and entry["latency_ms"] < min_latency_ms:
+            continue
+        if errors_only and not entry["error"]:
+            continue
+        yield log_path, entry
+
+
+if __name__ == "__main__":
+    cli = argparse.ArgumentParser(description="Read agent turn traces.")
+    cli.add_argument("directory")
+    cli.add_argument("--session")
+    cli.add_argument("--tool")
+    cli.add_argument("--min-latency-ms", type=float)
+    cli.add_argument("--errors", action="store_true", help="Only turns that raised")
+    cli.add_argument("--full", action="store_true", help="Print full records instead of one line per turn")
+    args = cli.parse_args()
+
+    for log_path, entry in find_traces(args.directory, args.session, args.tool, args.min_latency_ms, args.errors):
+        if args.full:
+            print(json.dumps(read_record(log_path, entry["offset"]), indent=2, ensure_ascii=False))
+        else:
+            when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry["ts"]))
+            print(f"{when}  {entry['session']}  {entry['latency_ms']:>9.1f}ms  "
+                  f"{'ERROR ' if entry['error'] else ''}{','.join(entry['tools']) or '-'}  {entry['turn_id']}")
@@ -1,16 +1,87 @@
+import argparse
+import asyncio
+import json
+import time
 from dotenv import load_dotenv
 from pydantic import BaseModel
 from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain_core.runnables import RunnableLambda
+from perf_stats import latency_summary
 
 load_dotenv()
 
+cli = argparse.ArgumentParser(description="Ask the LLM directly, one query or a batch of prompts.")
+cli.add_argument("--batch", help="File with one prompt per line (or JSONL with a 'prompt' field)")
+cli.add_argument("--output", default="batch_output.jsonl", help="Where batch results are written, in input order")
+cli.add_argument("--concurrency", type=int, default=8, help="Maximum requests in flight")
+args = cli.parse_args()
+
 # LLM Set Up; Gemini is using GOOGLE_API_KEY env var.
 llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash")
 
-# Get Input from user
-query = input("What I can help you research? ")
 
-# Call LLM to get response
-response = llm.invoke(query)
+def read_prompts(path: str) -> list[str]:
+    prompts = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            prompts.append(json.loads(line)["prompt"] if line.startswith("{") else line)
+    return prompts
+
+
+async def timed_invoke(prompt: str) -> dict:
+    started = time.perf_counter()
+    message = await llm.ainvoke(prompt)
+    usage = message.usage_metadata or {}
+    return {
+        "response": message.content,
+        "latency": time.perf_counter() - started,
+        "tokens": usage.get("total_tokens", 0),
+    }
+
+
+async def run_batch(prompts: list[str], output_path: str, concurrency: int):
+    ''' Sends all prompts through the async batch API, writing results in input order as they complete. '''
+    latencies, total_tokens, errors = [], 0, 0
+    finished = {}
+    next_to_write = 0
+    started = time.perf_counter()
+
+    with open(output_path, "w", encoding="utf-8") as out:
+        async for index, result in RunnableLambda(timed_invoke).abatch_as_completed(
+                prompts, config={"max_concurrency": concurrency}, return_exceptions=True):
+            if isinstance(result, Exception):
+                errors += 1
+                result = {"error": f"{type(result).__name__}: {result}"}
+            else:
+                latencies.append(result["latency"])
+                total_tokens += result["tokens"]
+            finished[index] = result
+
+            # Flush every result whose predecessors are all done, so the file stays in input order.
+            while next_to_write in finished:
+                record = {"index": next_to_write, "prompt": prompts[next_to_write]}
+                record.update(finished.pop(next_to_write))
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+                next_to_write += 1
+
+    elapsed = time.perf_counter() - started
+    print(f"Completed {len(prompts)} prompts ({errors} errors) in {elapsed:.1f}s "
+          f"with concurrency {concurrency}; results in {output_path}")
+    print(f"Throughput: {len(prompts) / elapsed:.2f} queries/s, {total_tokens / elapsed:.1f} tokens/s")
+    print(f"Latency: {latency_summary(latencies)}")
+
+
+if args.batch:
+    asyncio.run(run_batch(read_prompts(args.batch), args.output, args.concurrency))
+else:
+    # Get Input from user
+    query = input("What I can help you research? ")
+
+    # Call LLM to get response
+    response = llm.invoke(query)
 
-print('Response from LLM: ', response.content)
+    print('Response from LLM: ', response.content)
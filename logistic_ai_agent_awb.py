@@ -0,0 +1,222 @@
+import argparse
+import os
+import random
+import re
+import time
+from collections import Counter
+from typing import NamedTuple
+
+# Local AWB typo correction, run before the agent. A malformed tracking number ("WB-12345",
+# "AWB12345", "awb_12345", "track 12345") would otherwise cost a whole model call just to
+# ask for the right format.
+#
+#   format typos   prefix/separator variants are rewritten to AWB-XXXXX in place
+#   digit typos    one transposed, substituted, missing or extra digit: if exactly one known AWB
+#                  is that close, the user is asked "Did you mean AWB-12345?" (no model call)
+#   bare digits    "track 12345" is only rewritten when AWB-12345 exists, never guessed at; digits
+#                  after postcode words, or while the reschedule flow waits for a postcode, are
+#                  left alone (Malaysian postcodes are five digits too)
+#
+# Instead of searching a tree, the resolver generates every one-edit variant of the digits
+# (at most ~110 for 5 digits) and asks the known-AWB sources which exist. Lookup cost depends
+# only on the AWB length, not on how many AWBs are known, so a multi-million-row shipment
+# store costs one indexed IN query per typo.
+#
+#   python ./logistic_ai_agent_awb.py --sizes 1000,100000,1000000 --digits 10
+
+AWB_PREFIX = "AWB"
+AWB_DIGITS = 5
+
+
+def awb_patterns(digits: int = AWB_DIGITS) -> tuple[re.Pattern, re.Pattern]:
+    ''' (well-formed AWB, possibly mistyped AWB) patterns for AWBs with the given digit count. '''
+    well_formed = re.compile(rf"\b{AWB_PREFIX}-\d{{{digits}}}\b", re.IGNORECASE)
+    # A letter prefix near "AWB" and a digit run one digit short or long of the real length.
+    # Digit runs that are part of dates (2025-05-15) or codes joined by / or - are left alone.
+    typo = re.compile(rf"(?<![\w/-])(?:([A-Z]{{1,4}})\s*[-_ .:#]?\s*)?(\d{{{digits - 1},{digits + 1}}})(?![\w/-])",
+                      re.IGNORECASE)
+    return well_formed, typo
+
+
+# Bare digits are only read as a tracking number when the message is about tracking and has no
+# well-formed AWB (otherwise they are more likely a postcode).
+_TRACKING_WORDS_RE = re.compile(r"\b(track\w*|parcel|package|shipment|awb|consignment)\b", re.IGNORECASE)
+# Text ending like this comes right before a postcode ("postcode 56000", "zip code is 56000").
+_POSTCODE_BEFORE_RE = re.compile(r"\b(post(al)?[\s_-]*code|zip(\s*code)?|poskod)\b\W*(is\W*)?$", re.IGNORECASE)
+CONFIRM_RE = re.compile(r"^\s*(y|yes|yeah|yep|yup|correct|right|that'?s (it|right|correct)|ok(ay)?)\b", re.IGNORECASE)
+
+# Process-wide: format_fixes, suggestions, ambiguous, lookups.
+awb_resolver_stats = Counter()
+
+
+def _prefix_distance(letters: str) -> int:
+    ''' Optimal string alignment distance between letters and AWB_PREFIX. '''
+    a, b = letters.upper(), AWB_PREFIX
+    rows = [[i + j if i * j == 0 else 0 for j in range(len(b) + 1)] for i in range(len(a) + 1)]
+    for i in range(1, len(a) + 1):
+        for j in range(1, len(b) + 1):
+            rows[i][j] = min(rows[i - 1][j] + 1, rows[i][j - 1] + 1, rows[i - 1][j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                rows[i][j] = min(rows[i][j], rows[i - 2][j - 2] + 1)
+    return rows[-1][-1]
+
+
+def digit_edits(digits: str, length: int = AWB_DIGITS) -> list[str]:
+    ''' Digit strings of the given length one edit away, transpositions first (the most common slip). '''
+    edits = []
+    if len(digits) == length:
+        edits += [digits[:i] + digits[i + 1] + digits[i] + digits[i + 2:] for i in range(length - 1)
+                  if digits[i] != digits[i + 1]]
+        edits += [digits[:i] + d + digits[i + 1:] for i in range(length) for d in "0123456789" if d != digits[i]]
+    elif len(digits) == length + 1:
+        edits += [digits[:i] + digits[i + 1:] for i in range(len(digits))]
+    elif len(digits) == length - 1:
+        edits += [digits[:i] + d + digits[i:] for i in range(len(digits) + 1) for d in "0123456789"]
+    return list(dict.fromkeys(edits))
+
+
+class AwbIndex:
+    ''' In-memory set of known AWBs, kept as ints (fixed digit count) to stay small at millions of entries. '''
+
+    def __init__(self, awbs=(), digits: int = AWB_DIGITS):
+        self.digits = digits
+        self._numbers = set()
+        for awb in awbs:
+            self.add(awb)
+
+    def add(self, awb: str):
+        self._numbers.add(int(awb[-self.digits:]))
+
+    def existing(self, awbs: list[str]) -> set[str]:
+        return {awb for awb in awbs if int(awb[-self.digits:]) in self._numbers}
+
+    def __len__(self) -> int:
+        return len(self._numbers)
+
+
+class AwbSuggestion(NamedTuple):
+    typed: str
+    awb: str
+    corrected_text: str  # The user's message with the suggestion applied
+
+    def question(self) -> str:
+        return f"I couldn't find '{self.typed}'. Did you mean {self.awb}?"
+
+
+class AwbResolver:
+    ''' Corrects AWB typos against sources that implement existing(awbs) -> set (AwbIndex, ShipmentStore). '''
+
+    def __init__(self, sources: list, digits: int = AWB_DIGITS):
+        self.sources = sources
+        self.digits = digits
+        self._awb_re, self._typo_re = awb_patterns(digits)
+
+    @classmethod
+    def from_env(cls, sources: list) -> "AwbResolver | None":
+        if os.getenv("AWB_TYPO_CORRECTION", "1") == "0":
+            return None
+        return cls(sources)
+
+    def _canonical(self, digits: str) -> str:
+        return f"{AWB_PREFIX}-{digits}"
+
+    def _existing(self, awbs: list[str]) -> set[str]:
+        awb_resolver_stats["lookups"] += 1
+        found = set()
+        for source in self.sources:
+            found |= source.existing([awb for awb in awbs if awb not in found])
+        return found
+
+    def nearest(self, digits: str) -> str | None:
+        ''' The known AWB one edit away from digits, if there is a single best one. '''
+        candidates = [self._canonical(d) for d in digit_edits(digits, self.digits)]
+        existing = self._existing(candidates)
+        found = [awb for awb in candidates if awb in existing]
+        if len(found) > 1:
+            # A lone transposition beats substitutions; anything else is a guess
+            swaps = [awb for awb in found if len(digits) == self.digits and sorted(awb[-self.digits:]) == sorted(digits)]
+            found = swaps if len(swaps) == 1 else found
+        if len(found) > 1:
+            awb_resolver_stats["ambiguous"] += 1
+            return None
+        return found[0] if found else None
+
+    def _typed_awbs(self, text: str, postcode_expected: bool):
+        # (match, digits) for every token that looks like a mistyped or unknown AWB
+        bare_digits_ok = (not postcode_expected and _TRACKING_WORDS_RE.search(text)
+                          and not self._awb_re.search(text))
+        for match in self._typo_re.finditer(text):
+            letters, digits = match.group(1), match.group(2)
+            if letters is not None and _prefix_distance(letters) > 1:
+                continue
+            if letters is None and (not bare_digits_ok or _POSTCODE_BEFORE_RE.search(text, 0, match.start())):
+                continue
+            yield match, digits
+
+    @staticmethod
+    def _apply(text: str, corrections: list) -> str:
+        for match, awb in sorted(corrections, key=lambda c: c[0].start(), reverse=True):
+            text = text[:match.start()] + awb + text[match.end():]
+        return text
+
+    def correct(self, text: str, postcode_expected: bool = False) -> tuple[str, AwbSuggestion | None]:
+        ''' Rewrites format typos in text. Also returns a suggestion to confirm for the first digit typo.
+        postcode_expected: the conversation is waiting for a postcode, so bare digit runs are one. '''
+        fixes, guess = [], None
+        for match, digits in self._typed_awbs(text, postcode_expected):
+            canonical = self._canonical(digits)
+            known = len(digits) == self.digits and self._existing([canonical])
+            if match.group(1) is None:  # Bare digits: only a known AWB, never a guess
+                if known:
+                    fixes.append((match, canonical))
+                continue
+            if not known and guess is None and (awb := self.nearest(digits)):
+                guess = (match, awb)
+            elif len(digits) == self.digits and match.group(0) != canonical:
+                fixes.append((match, canonical))
+        awb_resolver_stats["format_fixes"] += len(fixes)
+        fixed = self._apply(text, fixes)
+        if guess is None:
+            return fixed, None
+        awb_resolver_stats["suggestions"] += 1
+        return fixed, AwbSuggestion(guess[0].group(0).strip(), guess[1], self._apply(text, fixes + [guess]))
+
+
+def benchmark(sizes: list[int], digits: int, probes: int = 2000, store_path: str = None, seed: int = 7):
+    ''' Lookup latency for typo'd AWBs as the number of known AWBs grows. '''
+    from perf_stats import percentile
+    rng = random.Random(seed)
+    print(f"{'known':>9} {'source':>7} {'p50 us':>8} {'p99 us':>8} {'resolved':>9}")
+    for size in sizes:
+        numbers = [str(n).zfill(digits) for n in rng.sample(range(10 ** digits), size)]
+        sources = {"memory": AwbIndex((f"{AWB_PREFIX}-{n}" for n in numbers), digits)}
+        if store_path:
+            from logistic_ai_agent_store import ShipmentStore
+            store = ShipmentStore(f"{store_path}.{size}")
+            if store.count() < size:
+                store.upsert([(f"{AWB_PREFIX}-{n}", "En Route", "Hub", 1.0) for n in numbers])
+            sources["sqlite"] = store
+        typos = []
+        for n in rng.sample(numbers, min(probes, size)):
+            i = rng.randrange(digits - 1)
+            typo = rng.choice([n[:i] + n[i + 1] + n[i] + n[i + 2:], n[:i] + n[i + 1:], n])
+            typos.append((f"Where is {rng.choice(['WB-', 'AWB', 'awb_', 'AWB-'])}{typo}?", n))
+        for name, source in sources.items():
+            resolver = AwbResolver([source], digits)
+            latencies, resolved = [], 0
+            for text, number in typos:
+                started = time.perf_counter()
+                fixed, suggestion = resolver.correct(text)
+                latencies.append(time.perf_counter() - started)
+                resolved += number in (suggestion.corrected_text if suggestion else fixed)
+            print(f"{size:>9} {name:>7} {percentile(latencies, 50) * 1e6:>8.0f} {percentile(latencies, 99) * 1e6:>8.0f} "
+                  f"{resolved / len(typos):>9.1%}")
+
+
+if __name__ == "__main__":
+    cli = argparse.ArgumentParser(description="Benchmark AWB typo correction as the set of known AWBs grows.")
+    cli.add_argument("--sizes", type=lambda s: [int(x) for x in s.split(",")], default=[1000, 100000, 1000000])
+    cli.add_argument("--digits", type=int, default=10, help="AWB digit count for the benchmark (real AWBs use 5)")
+    cli.add_argument("--store", help="Also measure against a SQLite shipment store at this path prefix")
+    args = cli.parse_args()
+    benchmark(args.sizes, args.digits, store_path=args.store)
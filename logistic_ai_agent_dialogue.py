@@ -0,0 +1,161 @@
+import logging
+import re
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from logistic_ai_agent_postcodes import postcode_service
+from logistic_ai_agent_observations import observation, render_observation
+from logistic_ai_agent_tools import available_reschedule_dates, confirm_reschedule, lookup_shipment, reschedule_allowed
+
+# Deterministic slot filling for the reschedule conversation. Tracking number, new date
+# and postal code are extracted locally and confirm_reschedule is called directly once
+# every slot is valid; anything outside this flow is left to the LLM agent.
+
+AWB_RE = re.compile(r"\bAWB-\d{5}\b", re.IGNORECASE)
+POSTAL_CODE_RE = re.compile(r"(?<![\d-])\d{5}(?![\d-])")
+RESCHEDULE_INTENT_RE = re.compile(
+    r"\b(re-?schedul\w*|postpone|change (?:the |my )?(?:delivery )?date|deliver (?:it )?(?:on|later))\b", re.IGNORECASE)
+CANCEL_RE = re.compile(r"\b(cancel|never ?mind|forget it|stop)\b", re.IGNORECASE)
+
+_MONTHS = {m: i for i, m in enumerate(
+    ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"], start=1)}
+_MONTH = r"(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?"
+_ISO_DATE_RE = re.compile(r"(?<!\d)(\d{4})[-/.](\d{1,2})[-/.](\d{1,2})(?!\d)")
+_MONTH_DAY_RE = re.compile(r"(?<![\d-])(\d{1,2})[-/](\d{1,2})(?![\d-])")
+_DAY_MONTH_NAME_RE = re.compile(rf"\b(\d{{1,2}})(?:st|nd|rd|th)?\s+(?:of\s+)?{_MONTH}(?:\s+(\d{{4}}))?", re.IGNORECASE)
+_MONTH_NAME_DAY_RE = re.compile(rf"\b{_MONTH}\s+(\d{{1,2}})(?:st|nd|rd|th)?(?:,?\s+(\d{{4}}))?", re.IGNORECASE)
+_RELATIVE_DATE_RE = re.compile(r"\b(today|tomorrow)\b", re.IGNORECASE)
+
+
+def extract_tracking_number(text: str) -> str | None:
+    match = AWB_RE.search(text)
+    return match.group(0).upper() if match else None
+
+
+def _valid_date(year: int, month: int, day: int) -> str | None:
+    try:
+        return date(year, month, day).isoformat()
+    except ValueError:
+        return None
+
+
+def extract_date(text: str, today: date | None = None) -> str | None:
+    ''' Finds a date in free text and normalises it to YYYY-MM-DD (MM-DD and month names use the current year). '''
+    today = today or datetime.now().date()
+    text = AWB_RE.sub(" ", text)
+
+    if match := _ISO_DATE_RE.search(text):
+        return _valid_date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+    if match := _DAY_MONTH_NAME_RE.search(text):
+        year = int(match.group(3)) if match.group(3) else today.year
+        return _valid_date(year, _MONTHS[match.group(2).lower()[:3]], int(match.group(1)))
+    if match := _MONTH_NAME_DAY_RE.search(text):
+        year = int(match.group(3)) if match.group(3) else today.year
+        return _valid_date(year, _MONTHS[match.group(1).lower()[:3]], int(match.group(2)))
+    if match := _MONTH_DAY_RE.search(text):
+        return _valid_date(today.year, int(match.group(1)), int(match.group(2)))
+    if match := _RELATIVE_DATE_RE.search(text):
+        offset = 1 if match.group(1).lower() == "tomorrow" else 0
+        return (today + timedelta(days=offset)).isoformat()
+    return None
+
+
+def extract_postal_code(text: str) -> str | None:
+    # Tracking numbers and dates also contain digit runs, so drop them before looking for a postcode.
+    text = _ISO_DATE_RE.sub(" ", AWB_RE.sub(" ", text))
+    match = POSTAL_CODE_RE.search(text)
+    return match.group(0) if match else None
+
+
+@dataclass
+class RescheduleState:
+    ''' Per-session dialogue state for the reschedule flow. '''
+    tracking_number: str | None = None
+    new_date: str | None = None
+    postal_code: str | None = None
+    reschedule_eligible: bool | None = None
+    active: bool = False
+
+    def reset(self):
+        # The tracking number stays as conversation context ("reschedule it" later on).
+        self.new_date = None
+        self.postal_code = None
+        self.active = False
+
+
+class RescheduleDialogue:
+    ''' Drives the reschedule conversation without the LLM. handle() returns None for turns it does not own. '''
+
+    def __init__(self):
+        self.state = RescheduleState()
+
+    def _set_tracking_number(self, tracking_number: str):
+        if tracking_number != self.state.tracking_number:
+            self.state.tracking_number = tracking_number
+            self.state.reschedule_eligible = None
+
+    def handle(self, user_input: str) -> str | None:
+        state = self.state
+        if state.active and CANCEL_RE.search(user_input):
+            state.reset()
+            return "Okay, I've cancelled the reschedule request. Is there anything else I can help you with?"
+
+        tracking_number = extract_tracking_number(user_input)
+        new_date = extract_date(user_input)
+        postal_code = extract_postal_code(user_input)
+        intent = RESCHEDULE_INTENT_RE.search(user_input)
+        if state.active and not (new_date or postal_code or intent):
+            # A free-form question in the middle of the flow, possibly about another shipment;
+            # let the agent answer it and keep the slots filled so far.
+            return None
+        if tracking_number:
+            self._set_tracking_number(tracking_number)
+        if not state.active:
+            if not intent:
+                return None
+            state.active = True
+
+        if new_date:
+            state.new_date = new_date
+        if postal_code:
+            if not postcode_service.is_valid(postal_code):
+                return f"'{postal_code}' doesn't look like a valid postal code. Could you please check it and send it again?"
+            state.postal_code = postal_code
+        return self._next_reply()
+
+    def _next_reply(self) -> str:
+        state = self.state
+        if not state.tracking_number:
+            return "Could you please provide the tracking number? It should be in the format AWB-XXXXX."
+
+        if state.reschedule_eligible is None:
+            if lookup_shipment(state.tracking_number) is None:
+                awb = state.tracking_number
+                state.tracking_number = None
+                state.reset()
+                return f"I'm sorry, tracking number '{awb}' not found. Could you please check the tracking number?"
+            state.reschedule_eligible = bool(reschedule_allowed(state.tracking_number))
+        if not state.reschedule_eligible:
+            state.reset()
+            return "I'm sorry, rescheduling is not allowed for this shipment."
+
+        # Checked in the zone confirm_reschedule reserves in: the given postcode's, once there is one
+        dates = available_reschedule_dates(state.tracking_number, state.postal_code) if state.new_date else None
+        if dates is not None and state.new_date not in dates:
+            requested = state.new_date
+            state.new_date = None
+            if not dates:
+                return f"I'm sorry, {requested} is not available. {render_observation(observation('NO_DATES', awb=state.tracking_number))}"
+            options = render_observation(observation("RESCHEDULE_DATES", awb=state.tracking_number, dates=dates))
+            return f"I'm sorry, {requested} is not available. {options} Which date would you like?"
+        if not state.new_date and not state.postal_code:
+            return "Sure. Please provide the new delivery date (YYYY-MM-DD) and the destination postal code."
+        if not state.new_date:
+            return "What date would you like the shipment delivered on (YYYY-MM-DD)?"
+        if not state.postal_code:
+            return "Could you please provide the destination postal code?"
+
+        logging.info(
+            f"Reschedule slots filled locally: {state.tracking_number}, {state.new_date}, {state.postal_code}")
+        result = confirm_reschedule(state.tracking_number, state.new_date, state.postal_code)
+        state.reset()
+        return render_observation(result)
@@ -0,0 +1,271 @@
+import asyncio
+import logging
+import os
+from contextlib import nullcontext
+from langchain_core.prompts import ChatPromptTemplate
+from langchain.agents import create_tool_calling_agent
+from langchain.memory import ConversationBufferMemory
+from logistic_ai_agent_tools import PREFETCH_FETCHERS, known_awb_sources, shipment_store, tools
+from logistic_ai_agent_awb import CONFIRM_RE, AwbResolver
+from logistic_ai_agent_prefetch import AWB_RE, ShipmentPrefetcher
+from logistic_ai_agent_notify import StatusNotifier, StoreChangeFeed, SubscriptionRegistry
+from logistic_ai_agent_dialogue import RESCHEDULE_INTENT_RE, RescheduleDialogue
+from agent_trace import TraceRecorder
+from agent_profiling import TurnProfiler
+from agent_loop_guard import LoopGuardAgentExecutor
+from logistic_ai_agent_observations import render_observation
+from agent_deadline import DEGRADED_FALLBACK, DeadlineAgentExecutorMixin, DeadlineChatModel, deadline, deadline_stats
+
+# Prompt, executor and per-session wiring for the logistics agent, shared by the
+# interactive script and anything that drives many conversations (load tests, servers).
+
+
+# ========================================================= PROMPT ========================================================== #
+prompt = ChatPromptTemplate.from_messages(
+    [
+        ("system",
+         "You are a helpful and friendly logistics assistant. "
+         "Your primary goal is to assist users with their shipment queries. "
+         "Respond to the user in a way that does not reveal the names of the tools being used.  Focus on providing clear and concise information to the user. "
+         "Always refer to the conversation history (chat_history) to understand context, such as a tracking number that was mentioned earlier, especially if the user says 'it' or asks a follow-up question. "
+         "If a tracking number is needed for a tool and has been provided in the current query or previous messages, use it. "
+         "If a tracking number is needed for a tool and has not been provided in the current query or previous messages, politely ask the user for it. "
+         # Common AWB typos are corrected before the model sees the message (logistic_ai_agent_awb.py)
+         "An AWB number is a tracking number with the format AWB- followed by 5 digits (e.g., AWB-12345); if one does not match, ask for it again in that format. "
+         # Collecting the date and postal code is done by the local slot-filling state machine (logistic_ai_agent_dialogue.py)
+         "If you need to call 'confirm_reschedule', pass tracking_number, new_date (YYYY-MM-DD) and postal_code as separate arguments and let the tool provide the confirmation. "
+         "Be clear and concise in your responses. Do not mention the tool names to the user."
+         ),
+        ("placeholder", "{chat_history}"),
+        ("human", "{query}"),
+        ("placeholder", "{agent_scratchpad}")
+    ]
+)
+# ========================================================= PROMPT ========================================================== #
+
+
+# ===================================================== MEMORY & AGENT ====================================================== #
+AGENT_EXECUTOR_SETTINGS = dict(
+    verbose=False,  # Keep verbose=True for logging
+    handle_parsing_errors=True,  # Helps agent recover from malformed tool calls from LLM
+    max_iterations=5,  # Prevents potential infinite loops
+    cycle_repeats=2,  # Repeated tool calls are answered from the turn's memo; the first exact repeat ends the turn
+)
+
+
+class LogisticsAgentExecutor(DeadlineAgentExecutorMixin, LoopGuardAgentExecutor):
+    ''' Loop-guarded executor whose steps run under the turn deadline (see agent_deadline.py). '''
+
+
+def build_agent_executor(llm, memory: ConversationBufferMemory) -> LogisticsAgentExecutor:
+    ''' Builds prompt, tool schemas, tool-bound model and executor from scratch. Prefer LogisticsAgentFactory. '''
+    agent = create_tool_calling_agent(
+        llm=DeadlineChatModel(llm),
+        tools=tools,
+        prompt=prompt
+    )
+    return LogisticsAgentExecutor(agent=agent, tools=tools, memory=memory, **AGENT_EXECUTOR_SETTINGS)
+
+
+class LogisticsAgentFactory:
+    ''' Compiles the prompt, tool schemas and tool-bound model once per process and
+    hands out per-session executors that share them and differ only in memory. '''
+
+    def __init__(self, llm, trace_recorder: TraceRecorder = None):
+        self.llm = llm
+        # Turn tracing is off unless AGENT_TRACE_DIR is set (see agent_trace.py).
+        self.trace_recorder = trace_recorder or TraceRecorder.from_env()
+        # Turn profiling is off unless AGENT_PROFILE is set or it is enabled at runtime (see agent_profiling.py).
+        self.profiler = TurnProfiler.from_env()
+        # Shipment lookups for AWBs in a message start while the model is still thinking (SHIPMENT_PREFETCH=0 disables).
+        self.prefetcher = ShipmentPrefetcher.from_env(PREFETCH_FETCHERS)
+        # Sessions subscribe to the AWBs they ask about; see start_notifier().
+        self.subscriptions = SubscriptionRegistry()
+        # Whole-turn time budget in seconds (TURN_DEADLINE_SECONDS, 0 disables); past it a turn returns a degraded answer.
+        self.turn_timeout = float(os.getenv("TURN_DEADLINE_SECONDS", "30")) or None
+        # AWB typos are fixed or confirmed locally instead of costing a clarification turn (AWB_TYPO_CORRECTION=0 disables).
+        self.awb_resolver = AwbResolver.from_env(known_awb_sources())
+        # create_tool_calling_agent serialises every tool schema and binds it to the model;
+        # the resulting runnable is stateless, so all sessions can share it. Each model call
+        # gets what is left of the turn deadline as its timeout.
+        self.agent = create_tool_calling_agent(
+            llm=DeadlineChatModel(llm),
+            tools=tools,
+            prompt=prompt
+        )
+
+    def executor(self, memory: ConversationBufferMemory) -> LogisticsAgentExecutor:
+        return LogisticsAgentExecutor(agent=self.agent, tools=tools, memory=memory, **AGENT_EXECUTOR_SETTINGS)
+
+    def session(self, session_id: str = None) -> "LogisticsSession":
+        return LogisticsSession(self, session_id)
+
+    def start_notifier(self, sink) -> StatusNotifier | None:
+        ''' Pushes status changes of subscribed AWBs to sink. Needs the shipment store (SHIPMENT_DB). '''
+        if shipment_store is None:
+            return None
+        interval = float(os.getenv("NOTIFY_INTERVAL", "5"))
+        feed = StoreChangeFeed(shipment_store, retention=float(os.getenv("CHANGE_LOG_RETENTION", "86400")))
+        return StatusNotifier(feed, self.subscriptions, sink, interval).start()
+
+
+class LogisticsSession:
+    ''' One customer conversation: its memory, agent executor and reschedule dialogue state. '''
+
+    def __init__(self, factory: LogisticsAgentFactory, session_id: str = None):
+        self.session_id = session_id
+        self.memory = ConversationBufferMemory(
+            memory_key="chat_history", return_messages=True, output_key="output")
+        self.agent_executor = factory.executor(self.memory)
+        self.trace_recorder = factory.trace_recorder
+        self.profiler = factory.profiler
+        self.prefetcher = factory.prefetcher
+        self.subscriptions = factory.subscriptions
+        self.turn_timeout = factory.turn_timeout
+        self.awb_resolver = factory.awb_resolver
+        # AWB guess waiting for the user's "yes"
+        self.pending_awb = None
+        # Whether the last reply is a partial answer because the turn ran out of time
+        self.degraded = False
+        # Session dialogue state; fills reschedule slots without calling the LLM
+        self.dialogue = RescheduleDialogue()
+
+    def _handle_locally(self, user_input: str) -> str | None:
+        # The reschedule flow is answered locally; everything else goes to the agent.
+        try:
+            ai_message = self.dialogue.handle(user_input)
+        except TimeoutError:  # A backend lookup outlived the turn deadline
+            deadline_stats["timeouts:backend"] += 1
+            deadline_stats["degraded_turns"] += 1
+            self.degraded = True
+            return DEGRADED_FALLBACK
+        if ai_message is not None:
+            self.memory.save_context({"query": user_input}, {"output": ai_message})
+        return ai_message
+
+    def _resolve_awbs(self, user_input: str) -> tuple[str, str | None]:
+        ''' Fixes AWB typos before anything else sees the message. Returns (message, question to ask instead). '''
+        if self.awb_resolver is None:
+            return user_input, None
+        pending, self.pending_awb = self.pending_awb, None
+        if pending is not None and CONFIRM_RE.match(user_input):
+            return pending.corrected_text, None  # Answer the original question with the confirmed AWB
+        # Mid-reschedule without a postcode yet, a bare five-digit reply is the postcode, not an AWB.
+        state = self.dialogue.state
+        user_input, suggestion = self.awb_resolver.correct(
+            user_input, postcode_expected=state.active and not state.postal_code)
+        if suggestion is None:
+            return user_input, None
+        self.pending_awb = suggestion
+        question = suggestion.question()
+        self.memory.save_context({"query": user_input}, {"output": question})
+        return user_input, question
+
+    def _subscribe(self, user_input: str):
+        # Anyone who asked about an AWB gets told when it moves, instead of having to ask again.
+        for awb in AWB_RE.findall(user_input):
+            self.subscriptions.subscribe(self.session_id, awb)
+
+    def _prefetch(self, user_input: str):
+        if self.prefetcher is None:
+            return nullcontext()
+        # Follow-ups in the reschedule flow ("reschedule it", a date, a postcode) are about the session's AWB.
+        state = self.dialogue.state
+        follow_up = state.active or RESCHEDULE_INTENT_RE.search(user_input)
+        return self.prefetcher.turn(user_input, [state.tracking_number] if follow_up else ())
+
+    def _start_trace(self, user_input: str):
+        if self.trace_recorder is None:
+            return None, {}
+        trace = self.trace_recorder.start_turn(self.session_id, user_input)
+        return trace, ({"callbacks": [trace]} if trace is not None else {})
+
+    def _profiled_invoke(self, mode: str, user_input: str, config: dict) -> dict:
+        with self.profiler.profile(mode, self.session_id):
+            return self.agent_executor.invoke({"query": user_input}, config=config)
+
+    def respond(self, user_input: str) -> str:
+        user_input, question = self._resolve_awbs(user_input)
+        if question is not None:
+            return question
+        trace, config = self._start_trace(user_input)
+        self._subscribe(user_input)
+        self.degraded = False
+        try:
+            with deadline(self.turn_timeout), self._prefetch(user_input):
+                ai_message = self._handle_locally(user_input)
+                handled_locally = ai_message is not None
+                if ai_message is None:
+                    with self.profiler.turn(self.session_id):
+                        response = self.agent_executor.invoke({"query": user_input}, config=config)
+                    # Forced and degraded finishes answer with the last tool observation as-is
+                    ai_message = render_observation(response['output'])
+                    self.degraded = response.get("degraded", False)
+                    # Log the raw response for debugging
+                    logging.debug(f"Agent Response: {response}")
+        except Exception as e:
+            if trace is not None:
+                self.trace_recorder.finish_turn(trace, error=e)
+            raise
+        if trace is not None:
+            self.trace_recorder.finish_turn(trace, ai_message, handled_locally=handled_locally, degraded=self.degraded)
+        return ai_message
+
+    async def arespond(self, user_input: str) -> str:
+        user_input, question = self._resolve_awbs(user_input)
+        if question is not None:
+            return question
+        trace, config = self._start_trace(user_input)
+        self._subscribe(user_input)
+        self.degraded = False
+        try:
+            with deadline(self.turn_timeout), self._prefetch(user_input):
+                # Off the event loop: the dialogue may wait on backend lookups.
+                ai_message = await asyncio.to_thread(self._handle_locally, user_input)
+                handled_locally = ai_message is not None
+                if ai_message is None:
+                    profile_mode = self.profiler.select()
+                    if profile_mode is None:
+                        response = await self.agent_executor.ainvoke({"query": user_input}, config=config)
+                    else:
+                        # Profiled turns run sync on a thread of their own, so the profile holds only this turn
+                        response = await asyncio.to_thread(self._profiled_invoke, profile_mode, user_input, config)
+                    # Forced and degraded finishes answer with the last tool observation as-is
+                    ai_message = render_observation(response['output'])
+                    self.degraded = response.get("degraded", False)
+                    logging.debug(f"Agent Response: {response}")
+        except Exception as e:
+            if trace is not None:
+                self.trace_recorder.finish_turn(trace, error=e)
+            raise
+        if trace is not None:
+            self.trace_recorder.finish_turn(trace, ai_message, handled_locally=handled_locally, degraded=self.degraded)
+        return ai_message
+# ===================================================== MEMORY & AGENT ====================================================== #
+
+
+if __name__ == "__main__":
+    # Micro-benchmark: per-session construction cost, rebuilding everything vs. the shared factory.
+    import time
+    import warnings
+    from logistic_ai_agent_stub_llm import StubLogisticsChatModel
+    warnings.filterwarnings("ignore", category=DeprecationWarning)
+
+    llm = StubLogisticsChatModel()
+    n = 200
+
+    started = time.perf_counter()
+    for _ in range(n):
+        build_agent_executor(llm, ConversationBufferMemory(memory_key="chat_history", return_messages=True))
+    before = (time.perf_counter() - started) / n
+
+    started = time.perf_counter()
+    factory = LogisticsAgentFactory(llm)
+    factory_build = time.perf_counter() - started
+    started = time.perf_counter()
+    for _ in range(n):
+        factory.session()
+    after = (time.perf_counter() - started) / n
+
+    print(f"Per-session construction: rebuild {before * 1000:.2f}ms, "
+          f"shared factory {after * 1000:.3f}ms ({before / after:.0f}x faster; factory built once in {factory_build * 1000:.1f}ms)")
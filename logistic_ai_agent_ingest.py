@@ -0,0 +1,132 @@
+import argparse
+import bz2
+import csv
+import gzip
+import io
+import json
+import logging
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from logistic_ai_agent_store import ShipmentStore
+
+# Streaming bulk ingest of carrier scan-event feeds (CSV or NDJSON) into the shipment
+# store. Events are parsed lazily and upserted in bounded chunks, so memory stays flat
+# regardless of feed size and each write transaction is short.
+#
+#   python ./logistic_ai_agent_ingest.py scans-2025-05-12.ndjson.gz --db shipments.db
+
+DEFAULT_DB_PATH = "shipments.db"
+CHUNK_SIZE = 20000
+
+# Accepted column names for each field, first match wins.
+FIELD_ALIASES = {
+    "awb": ("awb", "tracking_number", "awb_number"),
+    "status": ("status", "event_status"),
+    "location": ("location", "scan_location", "facility"),
+    "event_time": ("event_time", "timestamp", "scanned_at", "ts"),
+}
+
+
+def _open_feed(path: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rt", encoding="utf-8", newline="")
+    return io.open(path, "r", encoding="utf-8", newline="")
+
+
+def parse_event_time(value) -> float:
+    ''' Epoch seconds from an epoch number or an ISO-8601 string (naive times are taken as UTC). '''
+    if isinstance(value, (int, float)):
+        return float(value)
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp()
+
+
+def _field(record: dict, name: str, allow_blank: bool = False):
+    for alias in FIELD_ALIASES[name]:
+        if alias in record:
+            value = record[alias]
+            # Short CSV rows give None for their missing columns
+            if value is None or (not allow_blank and not str(value).strip()):
+                raise ValueError(f"empty '{name}'")
+            return value
+    raise KeyError(f"missing '{name}' (expected one of {', '.join(FIELD_ALIASES[name])})")
+
+
+def iter_events(path: str, stats: Counter = None):
+    ''' Yields (awb, status, location, event_time) from a CSV or NDJSON feed; bad records are logged, skipped
+    and counted in stats["skipped"]. '''
+    is_ndjson = ".ndjson" in path or ".jsonl" in path
+    with _open_feed(path) as f:
+        # NDJSON lines are decoded inside the try below, so one malformed line only loses that record
+        records = (line for line in f if line.strip()) if is_ndjson else csv.DictReader(f)
+        for line_no, record in enumerate(records, start=1):
+            try:
+                if is_ndjson:
+                    record = json.loads(record)  # JSONDecodeError is a ValueError
+                    if not isinstance(record, dict):
+                        raise ValueError("not a JSON object")
+                yield (str(_field(record, "awb")).strip().upper(), _field(record, "status"),
+                       _field(record, "location", allow_blank=True), parse_event_time(_field(record, "event_time")))
+            except (KeyError, ValueError) as e:
+                if stats is not None:
+                    stats["skipped"] += 1
+                logging.warning(f"Skipping record {line_no} in {path}: {e}")
+
+
+def iter_chunks(events, chunk_size: int):
+    ''' Groups events into chunks, keeping only the newest event per AWB within each chunk. '''
+    latest = {}
+    for event in events:
+        current = latest.get(event[0])
+        if current is None or event[3] > current[3]:
+            latest[event[0]] = event
+        if len(latest) >= chunk_size:
+            yield list(latest.values())
+            latest = {}
+    if latest:
+        yield list(latest.values())
+
+
+def ingest(paths: list[str], store: ShipmentStore, chunk_size: int = CHUNK_SIZE) -> tuple[int, int]:
+    ''' Streams every feed into the store. Returns (events read, shipments changed). '''
+    started = time.perf_counter()
+    events_read, changed = 0, 0
+    stats = Counter()
+
+    def counted(events):
+        nonlocal events_read
+        for event in events:
+            events_read += 1
+            yield event
+
+    for path in paths:
+        for chunk in iter_chunks(counted(iter_events(path, stats)), chunk_size):
+            changed += store.upsert(chunk)
+            logging.info(f"{path}: {events_read} events read, {changed} shipments changed")
+
+    elapsed = time.perf_counter() - started
+    logging.info(
+        f"Ingested {events_read} events ({changed} shipments changed, {stats['skipped']} bad records skipped) in {elapsed:.1f}s "
+        f"({events_read / max(elapsed, 1e-9) * 60:,.0f} events/min)")
+    return events_read, changed
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='-- logger: %(message)s')
+
+    cli = argparse.ArgumentParser(description="Stream carrier scan-event feeds into the shipment store.")
+    cli.add_argument("feeds", nargs="+", help="CSV or NDJSON feed files (optionally .gz/.bz2)")
+    cli.add_argument("--db", default=DEFAULT_DB_PATH, help="Shipment store path (SHIPMENT_DB for the agent)")
+    cli.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Shipments per upsert transaction")
+    args = cli.parse_args()
+
+    ingest(args.feeds, ShipmentStore(args.db), args.chunk_size)
@@ -0,0 +1,132 @@
+import argparse
+import asyncio
+import logging
+import random
+import time
+import tracemalloc
+import warnings
+import logistic_ai_agent_tools
+from logistic_ai_agent_executor import LogisticsAgentFactory
+from logistic_ai_agent_prefetch import prefetch_stats, prefetch_summary
+from logistic_ai_agent_stub_llm import StubLogisticsChatModel
+from logistic_ai_agent_tools import MOCK_RESCHEDULE_DATES, MOCK_TRACKING_DATA
+from perf_stats import latency_summary, percentile
+warnings.filterwarnings("ignore", category=DeprecationWarning)
+
+# Load generator for the logistics agent: N virtual customers run randomised
+# multi-turn scripts against the real executor, tools and dialogue state machine,
+# with a local stand-in model instead of Gemini.
+#
+#   python ./logistic_ai_agent_loadtest.py --ramp 1,10,50,100 --latency 0.3
+
+
+# ==================================================== CUSTOMER SCRIPTS ===================================================== #
+def track_script(rng: random.Random) -> list[str]:
+    awb = rng.choice(list(MOCK_TRACKING_DATA))
+    return [
+        rng.choice(["Hi, where is my parcel?", "I want to track my parcel", "Hello, can you check my shipment?"]),
+        rng.choice([f"It's {awb}", f"Track {awb}", f"{awb}"]),
+        "Thanks!",
+    ]
+
+
+def reschedule_script(rng: random.Random) -> list[str]:
+    awb = rng.choice(list(MOCK_RESCHEDULE_DATES))
+    new_date = rng.choice(MOCK_RESCHEDULE_DATES[awb])
+    return [
+        f"Track {awb}",
+        "Can I reschedule it?",
+        rng.choice([f"Reschedule it to {new_date}", f"{new_date} please"]),
+        rng.choice(["Postcode 56000.", "56000"]),
+    ]
+
+
+def wrong_format_script(rng: random.Random) -> list[str]:
+    awb = rng.choice(list(MOCK_TRACKING_DATA))
+    digits = awb.split("-")[1]
+    return [
+        "I want to track my parcel",
+        rng.choice([f"WB-{digits}", f"AWB{digits}", f"AWB_{digits}"]),
+        f"Track {awb}",
+    ]
+
+
+SCRIPTS = [track_script, reschedule_script, wrong_format_script]
+# ==================================================== CUSTOMER SCRIPTS ===================================================== #
+
+
+class LevelStats:
+    def __init__(self):
+        self.latencies = []
+        self.turns = 0
+        self.errors = 0
+        self.sessions = []
+
+
+async def virtual_customer(customer_id: int, factory: LogisticsAgentFactory, conversations: int, think_time: float,
+                           stats: LevelStats, rng: random.Random):
+    for n in range(conversations):
+        session = factory.session(f"customer-{customer_id}-{n}")
+        # Keep sessions alive until the level ends so memory per session can be measured.
+        stats.sessions.append(session)
+        for user_input in rng.choice(SCRIPTS)(rng):
+            started = time.perf_counter()
+            try:
+                await session.arespond(user_input)
+            except Exception as e:
+                stats.errors += 1
+                logging.debug(f"Turn failed for {session.session_id}: {e}")
+            stats.latencies.append(time.perf_counter() - started)
+            stats.turns += 1
+            await asyncio.sleep(rng.expovariate(1 / think_time) if think_time > 0 else 0)
+
+
+async def run_level(concurrency: int, factory: LogisticsAgentFactory, conversations: int, think_time: float, seed: int):
+    stats = LevelStats()
+    baseline, _ = tracemalloc.get_traced_memory()
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        virtual_customer(i, factory, conversations, think_time, stats, random.Random(seed + i))
+        for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    current, _ = tracemalloc.get_traced_memory()
+    per_session_kib = (current - baseline) / max(1, len(stats.sessions)) / 1024
+
+    print(f"{concurrency:>6} {stats.turns:>7} {stats.turns / elapsed:>9.1f} "
+          f"{percentile(stats.latencies, 50) * 1000:>8.0f} {percentile(stats.latencies, 95) * 1000:>8.0f} "
+          f"{percentile(stats.latencies, 99) * 1000:>8.0f} {stats.errors / max(1, stats.turns):>8.1%} "
+          f"{per_session_kib:>12.1f}")
+    logging.info(f"concurrency={concurrency}: {latency_summary(stats.latencies)}")
+    if factory.prefetcher is not None:
+        logging.info(f"concurrency={concurrency}: prefetch {prefetch_summary()}")
+        prefetch_stats.clear()
+
+
+async def main(args):
+    logistic_ai_agent_tools.MOCK_API_LATENCY = args.backend_latency
+    logistic_ai_agent_tools.start_shipment_shards()  # SHIPMENT_SHARDS, if set
+    factory = LogisticsAgentFactory(StubLogisticsChatModel(latency=args.latency, latency_jitter=args.jitter))
+    tracemalloc.start()
+    print(f"{'users':>6} {'turns':>7} {'turns/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>8} {'KiB/session':>12}")
+    for concurrency in args.ramp:
+        await run_level(concurrency, factory, args.conversations, args.think_time, args.seed)
+    tracemalloc.stop()
+
+
+if __name__ == "__main__":
+    cli = argparse.ArgumentParser(description="Concurrent-customer load test for the logistics agent.")
+    cli.add_argument("--ramp", type=lambda s: [int(x) for x in s.split(",")], default=[1, 5, 10, 25, 50],
+                     help="Comma separated concurrency levels, run one after another")
+    cli.add_argument("--conversations", type=int, default=3, help="Conversations per virtual customer per level")
+    cli.add_argument("--think-time", type=float, default=0.5, help="Mean customer think time between turns (s)")
+    cli.add_argument("--latency", type=float, default=0.3, help="Stand-in model latency per call (s)")
+    cli.add_argument("--jitter", type=float, default=0.1, help="Stand-in model latency jitter (s)")
+    cli.add_argument("--backend-latency", type=float, default=0.0,
+                     help="Simulated shipment backend latency per lookup (s); SHIPMENT_PREFETCH=0 to compare without prefetch")
+    cli.add_argument("--seed", type=int, default=42)
+    cli.add_argument("--verbose", action="store_true", help="Show tool logs and per-level summaries")
+    args = cli.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format='-- logger: %(message)s')
+    asyncio.run(main(args))
@@ -0,0 +1,237 @@
+import argparse
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import NamedTuple
+from logistic_ai_agent_store import ShipmentStore
+
+# Proactive status-change notifications. Instead of customers asking "where is my parcel?"
+# again (a full agent turn each time), sessions subscribe to the AWBs they asked about and
+# a notifier pushes status/location changes to them through a sink.
+#
+# Change sources are incremental:
+#   StoreChangeFeed  reads the store's change log (trigger-maintained, see logistic_ai_agent_store.py)
+#                    from a cursor, so only rows written since the last poll are touched
+#   SnapshotDiffer   for feeds that only offer full snapshots: keeps one 8-byte hash per AWB and
+#                    reports the records whose hash changed
+#
+#   python ./logistic_ai_agent_notify.py --db shipments.db --watch AWB-12345 AWB-67890
+
+
+class StatusChange(NamedTuple):
+    awb: str
+    status: str
+    location: str
+    previous_status: str | None
+    previous_location: str | None
+    version: int | None = None
+
+    def message(self) -> str:
+        if self.previous_status is None:
+            return f"Update: your shipment {self.awb} is now '{self.status}' in '{self.location}'."
+        return (f"Update: your shipment {self.awb} changed from '{self.previous_status}' in "
+                f"'{self.previous_location}' to '{self.status}' in '{self.location}'.")
+
+
+# ======================================================== SOURCES ========================================================== #
+class StoreChangeFeed:
+    ''' Cursor over the shipment store's change log. Starts at the current end unless after_id is given.
+    With retention (seconds), rows older than that and already read are pruned about once a minute. '''
+
+    def __init__(self, store: ShipmentStore, after_id: int = None, batch_size: int = 1000,
+                 retention: float = None):
+        self.store = store
+        self.cursor = store.last_change_id() if after_id is None else after_id
+        self.batch_size = batch_size
+        self.retention = retention
+        self.pruned = 0
+        self._next_prune = 0.0
+
+    def _prune(self):
+        now = time.monotonic()
+        if self.retention is None or now < self._next_prune:
+            return
+        self._next_prune = now + min(self.retention, 60)
+        self.pruned += self.store.prune_changes(time.time() - self.retention, up_to_id=self.cursor)
+
+    def poll(self) -> list[StatusChange]:
+        changes = []
+        while True:
+            rows = self.store.changes_since(self.cursor, self.batch_size)
+            for row in rows:
+                changes.append(StatusChange(*row[1:]))
+            if rows:
+                self.cursor = rows[-1][0]
+            if len(rows) < self.batch_size:
+                self._prune()
+                return changes
+
+
+def record_hash(status: str, location: str) -> bytes:
+    return hashlib.blake2b(f"{status}\x1f{location}".encode("utf-8"), digest_size=8).digest()
+
+
+class SnapshotDiffer:
+    ''' Diffs successive {awb: {"status", "location"}} snapshots; keeps only an 8-byte hash per AWB. '''
+
+    def __init__(self):
+        self._hashes = {}
+
+    def diff(self, snapshot: dict) -> list[StatusChange]:
+        changes = []
+        for awb, record in snapshot.items():
+            digest = record_hash(record["status"], record["location"])
+            if self._hashes.get(awb) != digest:
+                self._hashes[awb] = digest
+                changes.append(StatusChange(awb, record["status"], record["location"], None, None))
+        return changes
+
+
+class SnapshotFeed:
+    ''' Adapts a snapshot callable (e.g. a carrier API returning every open shipment) to poll(). '''
+
+    def __init__(self, snapshot, differ: SnapshotDiffer = None):
+        self.snapshot = snapshot
+        self.differ = differ or SnapshotDiffer()
+        self.differ.diff(snapshot())  # Baseline; only later changes are reported
+
+    def poll(self) -> list[StatusChange]:
+        return self.differ.diff(self.snapshot())
+# ======================================================== SOURCES ========================================================== #
+
+
+# ======================================================== DELIVERY ========================================================= #
+class SubscriptionRegistry:
+    ''' Which sessions want updates for which AWB. '''
+
+    def __init__(self):
+        self._by_awb = defaultdict(set)
+        self._by_session = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, session_id, awb: str):
+        with self._lock:
+            self._by_awb[awb.upper()].add(session_id)
+            self._by_session[session_id].add(awb.upper())
+
+    def unsubscribe(self, session_id, awb: str = None):
+        ''' Drops one subscription, or every subscription of the session when awb is None. '''
+        with self._lock:
+            awbs = self._by_session.get(session_id, set())
+            for key in [awb.upper()] if awb else list(awbs):
+                awbs.discard(key)
+                sessions = self._by_awb.get(key)
+                if sessions is not None:
+                    sessions.discard(session_id)
+                    if not sessions:
+                        del self._by_awb[key]
+            if not awbs:
+                self._by_session.pop(session_id, None)
+
+    def subscribers(self, awb: str) -> set:
+        with self._lock:
+            return set(self._by_awb.get(awb, ()))
+
+    def __len__(self) -> int:
+        return sum(len(sessions) for sessions in self._by_awb.values())
+
+
+class LogSink:
+    def send(self, session_id, change: StatusChange):
+        logging.info(f"Notify {session_id}: {change.message()}")
+
+
+class JsonlFileSink:
+    ''' Appends one JSON line per notification, for another local process to pick up. '''
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def send(self, session_id, change: StatusChange):
+        line = json.dumps({"ts": time.time(), "session_id": session_id, "message": change.message(),
+                           **change._asdict()})
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+class CallbackSink:
+    ''' Hands notifications to a function, e.g. one that queues them for the session's transport. '''
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def send(self, session_id, change: StatusChange):
+        self.callback(session_id, change)
+
+
+class StatusNotifier:
+    ''' Polls a change source and sends each change to the AWB's subscribers through the sink. '''
+
+    def __init__(self, feed, subscriptions: SubscriptionRegistry, sink, interval: float = 5.0):
+        self.feed = feed
+        self.subscriptions = subscriptions
+        self.sink = sink
+        self.interval = interval
+        self.stats = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def poll_once(self) -> int:
+        ''' Returns notifications sent. '''
+        changes = self.feed.poll()
+        self.stats["changes"] += len(changes)
+        sent = 0
+        for change in changes:
+            for session_id in self.subscriptions.subscribers(change.awb):
+                try:
+                    self.sink.send(session_id, change)
+                    sent += 1
+                except Exception as e:
+                    self.stats["sink_errors"] += 1
+                    logging.error(f"Notification for {session_id} failed: {e}")
+        self.stats["notifications"] += sent
+        return sent
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll_once()
+            except Exception as e:
+                logging.error(f"Status notifier poll failed: {e}", exc_info=True)
+
+    def start(self) -> "StatusNotifier":
+        self._thread = threading.Thread(target=self._run, name="status-notifier", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+# ======================================================== DELIVERY ========================================================= #
+
+
+if __name__ == "__main__":
+    cli = argparse.ArgumentParser(description="Print status changes for AWBs as they land in the shipment store.")
+    cli.add_argument("--db", default="shipments.db")
+    cli.add_argument("--watch", nargs="+", required=True, help="AWBs to subscribe to")
+    cli.add_argument("--interval", type=float, default=2.0)
+    cli.add_argument("--jsonl", help="Append notifications to this file instead of logging them")
+    args = cli.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='-- logger: %(message)s')
+    subscriptions = SubscriptionRegistry()
+    for awb in args.watch:
+        subscriptions.subscribe("cli", awb)
+    sink = JsonlFileSink(args.jsonl) if args.jsonl else LogSink()
+    notifier = StatusNotifier(StoreChangeFeed(ShipmentStore(args.db)), subscriptions, sink, args.interval)
+    notifier.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        notifier.stop()
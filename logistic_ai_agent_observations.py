@@ -0,0 +1,119 @@
+import argparse
+import json
+import math
+import os
+from collections import Counter
+
+# Tool observations. Every logistics tool result is a code plus data fields, e.g.
+#   {"code":"RESCHEDULE_DENIED","awb":"AWB-67890"}
+# With COMPACT_TOOL_OBSERVATIONS=1 the tools hand the agent that short JSON; by default they
+# hand it the customer-facing sentence from TEMPLATES. Compact observations are cheaper to
+# carry through the scratchpad and chat history, which every later model call re-reads, and
+# leave the wording to the model. render_observation() turns one back into text wherever it
+# reaches the customer directly (local dialogue replies, forced or degraded finishes).
+#
+#   python ./logistic_ai_agent_observations.py --conversations 200    # token use per turn, both modes
+
+COMPACT_OBSERVATIONS = os.getenv("COMPACT_TOOL_OBSERVATIONS", "0") == "1"
+
+TEMPLATES = {
+    "STATUS": "Your shipment {awb} is currently '{status}' in '{location}'.",
+    "NOT_FOUND": "I'm sorry, tracking number '{awb}' not found.",
+    "RESCHEDULE_ALLOWED": "Yes, you can reschedule this shipment. Please provide the new date (YYYY-MM-DD) and destination postal code.",
+    "RESCHEDULE_DENIED": "I'm sorry, rescheduling is not allowed for this shipment.",
+    "RESCHEDULE_DATES": "Available rescheduling dates for shipment {awb} are: {dates}.",
+    "NO_DATES": "I'm sorry, there are no rescheduling dates available for shipment {awb} at the moment.",
+    "DATE_UNAVAILABLE": "I'm sorry, the requested date '{date}' is not available or suitable for rescheduling shipment {awb}. Please ask me for the available dates to pick another one.",
+    "RESCHEDULED": "Okay, I've rescheduled your shipment {awb} to {date} for delivery to postal code {postal_code}.",
+    "POSTCODE_VALID": "Postal code {postal_code} is valid ({state}, delivery zone {zone}).",
+    "INVALID_POSTCODE": "I'm sorry, '{postal_code}' is not a valid postal code. A valid postal code has 5 digits, e.g. 50000.",
+}
+
+# Process-wide: observations, compact_tokens and text_tokens (estimated size of each form), also per code
+# ("compact_tokens:NOT_FOUND"), since which form is smaller depends on the code.
+observation_stats = Counter()
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / 4)
+
+
+def render(code: str, fields: dict) -> str:
+    values = {k: ", ".join(v) if isinstance(v, list) else v for k, v in fields.items()}
+    return TEMPLATES[code].format(**values)
+
+
+def observation(code: str, **fields) -> str:
+    ''' A tool result: compact JSON when COMPACT_OBSERVATIONS is on, the rendered sentence otherwise. '''
+    compact = json.dumps({"code": code, **fields}, ensure_ascii=False, separators=(",", ":"))
+    text = render(code, fields)
+    for suffix in ("", f":{code}"):
+        observation_stats[f"observations{suffix}"] += 1
+        observation_stats[f"compact_tokens{suffix}"] += estimate_tokens(compact)
+        observation_stats[f"text_tokens{suffix}"] += estimate_tokens(text)
+    return compact if COMPACT_OBSERVATIONS else text
+
+
+def render_observation(text: str) -> str:
+    ''' Customer-facing text for a tool result in either form; any other text is returned unchanged. '''
+    if not text.startswith('{"code":'):
+        return text
+    try:
+        fields = json.loads(text)
+        return render(fields.pop("code"), fields)
+    except (ValueError, KeyError):
+        return text
+
+
+if __name__ == "__main__":
+    import logging
+    import random
+    import warnings
+    import logistic_ai_agent_observations  # The module the tools read the setting from, not __main__
+    from langchain_core.callbacks import BaseCallbackHandler
+    from logistic_ai_agent_executor import LogisticsAgentFactory
+    from logistic_ai_agent_loadtest import SCRIPTS
+    from logistic_ai_agent_stub_llm import StubLogisticsChatModel
+    warnings.filterwarnings("ignore")
+
+    class TokenUsage(BaseCallbackHandler):
+        def __init__(self):
+            self.usage = Counter()
+
+        def on_llm_end(self, response, **kwargs):
+            message = getattr(response.generations[0][0], "message", None)
+            for key, value in (getattr(message, "usage_metadata", None) or {}).items():
+                self.usage[key] += value
+            self.usage["llm_calls"] += 1
+
+    cli = argparse.ArgumentParser(description="Measure model tokens per turn with text vs compact tool observations.")
+    cli.add_argument("--conversations", type=int, default=100)
+    cli.add_argument("--seed", type=int, default=42)
+    args = cli.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    results = {}
+    for compact in (False, True):
+        logistic_ai_agent_observations.COMPACT_OBSERVATIONS = compact
+        counter = TokenUsage()
+        factory = LogisticsAgentFactory(StubLogisticsChatModel(latency=0, latency_jitter=0, callbacks=[counter]))
+        rng = random.Random(args.seed)
+        turns = 0
+        for i in range(args.conversations):
+            session = factory.session(f"bench-{i}")
+            for message in rng.choice(SCRIPTS)(rng):
+                session.respond(message)
+                turns += 1
+        usage = counter.usage
+        results[compact] = usage["input_tokens"] / turns
+        print(f"{'compact' if compact else 'text':8s} turns={turns} llm_calls={usage['llm_calls']} "
+              f"input_tokens/turn={usage['input_tokens'] / turns:.1f} "
+              f"output_tokens/turn={usage['output_tokens'] / turns:.1f}")
+    print(f"saved {results[False] - results[True]:.1f} input tokens/turn "
+          f"({(1 - results[True] / results[False]) * 100:.1f}%)")
+    print("per observation (tokens, text -> compact):")
+    observation_stats = logistic_ai_agent_observations.observation_stats
+    for code in TEMPLATES:
+        if count := observation_stats[f"observations:{code}"]:
+            print(f"  {code:20s} {observation_stats[f'text_tokens:{code}'] / count:5.1f} -> "
+                  f"{observation_stats[f'compact_tokens:{code}'] / count:5.1f}  ({count} calls)")
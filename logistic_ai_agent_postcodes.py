@@ -0,0 +1,54 @@
+import csv
+import os
+import time
+from array import array
+from bisect import bisect_right
+from typing import NamedTuple
+
+# Postal-code reference service. Code ranges from a local reference file are held in
+# two sorted integer arrays (range starts and ends), so a lookup is one bisect.
+
+DEFAULT_POSTCODES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "postcodes_my.csv")
+POSTCODE_LENGTH = 5
+
+
+class PostcodeInfo(NamedTuple):
+    postal_code: str
+    state: str
+    zone: str
+
+
+class PostcodeService:
+    ''' Maps a postal code to its state and delivery zone. Reference file columns: start,end,state,zone. '''
+
+    def __init__(self, path: str = DEFAULT_POSTCODES_PATH):
+        with open(path, encoding="utf-8", newline="") as f:
+            rows = sorted(csv.DictReader(f), key=lambda row: int(row["start"]))
+        self._starts = array("l", (int(row["start"]) for row in rows))
+        self._ends = array("l", (int(row["end"]) for row in rows))
+        self._areas = [(row["state"], row["zone"]) for row in rows]
+
+    def lookup(self, postal_code: str) -> PostcodeInfo | None:
+        postal_code = postal_code.strip()
+        if len(postal_code) != POSTCODE_LENGTH or not postal_code.isdigit():
+            return None
+        code = int(postal_code)
+        i = bisect_right(self._starts, code) - 1
+        if i < 0 or code > self._ends[i]:
+            return None
+        state, zone = self._areas[i]
+        return PostcodeInfo(postal_code, state, zone)
+
+    def is_valid(self, postal_code: str) -> bool:
+        return self.lookup(postal_code) is not None
+
+
+postcode_service = PostcodeService(os.getenv("POSTCODES_PATH", DEFAULT_POSTCODES_PATH))
+
+
+if __name__ == "__main__":
+    codes = [f"{n:05d}" for n in range(0, 100000, 7)]
+    started = time.perf_counter()
+    valid = sum(1 for code in codes if postcode_service.lookup(code))
+    elapsed = time.perf_counter() - started
+    print(f"{len(codes)} lookups ({valid} valid): {elapsed / len(codes) * 1e6:.2f}us per lookup")
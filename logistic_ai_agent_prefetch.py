@@ -0,0 +1,87 @@
+import logging
+import os
+import re
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from agent_deadline import remaining
+
+# Speculative prefetch of backend lookups. When a message mentions an AWB, the agent
+# nearly always looks it up next, but only after an LLM round trip. The session starts
+# those lookups in the background as soon as the message arrives; tool calls during the
+# same turn are then served from the warm results instead of calling the backend again.
+#
+# Process-wide counters in `prefetch_stats`:
+#   started  lookups started speculatively      hits    lookups served from a prefetch
+#   misses   lookups that had to call the backend   wasted  prefetched lookups nobody used
+
+AWB_RE = re.compile(r"\bAWB-\d{5}\b", re.IGNORECASE)
+MAX_AWBS_PER_MESSAGE = 3
+
+prefetch_stats = Counter()
+
+_turn_prefetch: ContextVar["dict | None"] = ContextVar("turn_prefetch", default=None)
+
+
+def prefetched(kind: str, key: str, fetch):
+    ''' Returns fetch(key), from this turn's prefetch if one was started for (kind, key). '''
+    futures = _turn_prefetch.get()
+    entry = futures.get((kind, key)) if futures is not None else None
+    if entry is None:
+        if futures is not None:
+            prefetch_stats["misses"] += 1
+        return fetch(key)
+    future, used = entry
+    if not used:
+        entry[1] = True
+        prefetch_stats["hits"] += 1
+    # Bounded by the turn deadline; raises TimeoutError if the backend outlives it
+    return future.result(timeout=remaining())
+
+
+def prefetch_summary() -> dict:
+    started, hits, misses = prefetch_stats["started"], prefetch_stats["hits"], prefetch_stats["misses"]
+    return {**prefetch_stats,
+            "hit_rate": round(hits / max(1, hits + misses), 3),
+            "waste_rate": round(prefetch_stats["wasted"] / max(1, started), 3)}
+
+
+class ShipmentPrefetcher:
+    ''' Starts the lookups in `fetchers` ({kind: fetch(awb)}) for every AWB in a message. '''
+
+    def __init__(self, fetchers: dict, max_workers: int = 8):
+        self.fetchers = fetchers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+
+    @classmethod
+    def from_env(cls, fetchers: dict) -> "ShipmentPrefetcher | None":
+        ''' On by default; SHIPMENT_PREFETCH=0 turns it off. '''
+        if os.getenv("SHIPMENT_PREFETCH", "1") == "0":
+            return None
+        return cls(fetchers, int(os.getenv("SHIPMENT_PREFETCH_WORKERS", "8")))
+
+    def _start(self, text: str, context_awbs) -> dict:
+        futures = {}
+        awbs = [m.upper() for m in AWB_RE.findall(text)[:MAX_AWBS_PER_MESSAGE]] + [a for a in context_awbs if a]
+        for awb in dict.fromkeys(awbs):
+            for kind, fetch in self.fetchers.items():
+                # Each lookup runs in a copy of the turn's context, so it sees the turn deadline
+                futures[(kind, awb)] = [self._pool.submit(copy_context().run, fetch, awb), False]
+                prefetch_stats["started"] += 1
+        return futures
+
+    @contextmanager
+    def turn(self, text: str, context_awbs=()):
+        ''' Wrap one turn: lookups inside it are served from the prefetch started here.
+        context_awbs are AWBs from earlier turns that this one is known to be about. '''
+        futures = self._start(text, context_awbs)
+        token = _turn_prefetch.set(futures)
+        try:
+            yield
+        finally:
+            _turn_prefetch.reset(token)
+            wasted = sum(1 for _, used in futures.values() if not used)
+            if wasted:
+                prefetch_stats["wasted"] += wasted
+                logging.debug(f"{wasted} prefetched lookups unused")
@@ -0,0 +1,435 @@
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import signal
+import threading
+import time
+import warnings
+import zlib
+from collections import Counter, defaultdict, deque
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from dotenv import load_dotenv
+warnings.filterwarnings("ignore", category=DeprecationWarning)
+
+# Pre-forked deployment of the logistics agent. The parent process runs a small HTTP
+# front end and routes each session to a fixed worker (session affinity by hash);
+# every worker builds its LLM and agent machinery once after fork and serves many
+# sessions concurrently. SIGHUP (or POST /admin/restart) restarts workers one at a
+# time without dropping queued requests.
+#
+#   python ./logistic_ai_agent_serve.py --workers 4 --port 8080
+#   curl -s localhost:8080/chat -d '{"session_id": "s1", "message": "Track AWB-12345"}'
+#   curl -s localhost:8080/chat -d '{"session_id": "b1", "message": "Track AWB-12345", "priority": "batch"}'
+#   curl -s localhost:8080/health
+#   curl -s localhost:8080/admin/shards -d '{"add": true}'                       # rebalance (SHIPMENT_SHARDS)
+#   curl -s 'localhost:8080/notifications?session_id=s1'                       # status changes (SHIPMENT_DB)
+#   curl -s localhost:8080/admin/profile -d '{"mode": "sampling", "turns": 20}'   # or {"mode": "off"}
+
+load_dotenv()
+
+METRICS_INTERVAL = 2.0
+REQUEST_TIMEOUT = 120.0
+MAILBOX_SIZE = 20  # Undelivered notifications kept per session
+MAILBOX_TTL = 900.0  # Seconds an undelivered notification waits for its session to poll
+
+
+# ========================================================= WORKER ========================================================== #
+def _build_llm(stub_latency: float | None):
+    if stub_latency is not None:
+        from logistic_ai_agent_stub_llm import StubLogisticsChatModel
+        return StubLogisticsChatModel(latency=stub_latency)
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    return ChatGoogleGenerativeAI(
+        model="gemini-2.0-flash-lite", convert_system_message_to_human=False)
+
+
+def priority_for(request: dict, session) -> str:
+    ''' Admission class of a turn: finishing a reschedule first, bulk jobs last (see agent_admission.py). '''
+    if request.get("priority") == "batch":
+        return "batch"
+    return "reschedule" if session.dialogue.state.active else "interactive"
+
+
+def worker_main(worker_id: int, requests, responses, stub_latency: float | None):
+    # The front end owns Ctrl+C / SIGTERM handling; workers only stop on the sentinel.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    asyncio.run(_worker_loop(worker_id, requests, responses, stub_latency))
+
+
+async def _worker_loop(worker_id: int, requests, responses, stub_latency: float | None):
+    from logistic_ai_agent_executor import LogisticsAgentFactory
+    from logistic_ai_agent_sessions import SessionRegistry
+    from agent_loop_guard import loop_guard_stats
+    from agent_deadline import deadline_stats
+    from logistic_ai_agent_awb import awb_resolver_stats
+    from logistic_ai_agent_prefetch import prefetch_summary
+    from logistic_ai_agent_notify import CallbackSink
+    from agent_admission import AdmissionController, Overloaded
+    # langchain registers its own warning filters on import; keep deprecation noise out of worker logs.
+    warnings.filterwarnings("ignore", category=DeprecationWarning)
+
+    # Built once per worker; every session on this worker shares it.
+    factory = LogisticsAgentFactory(_build_llm(stub_latency))
+    # LRU registry with idle eviction and memory caps (SESSION_* environment variables).
+    sessions = SessionRegistry.from_env(factory)
+    session_locks = defaultdict(asyncio.Lock)
+    waiting = Counter()
+    # Bounds concurrent turns and orders the backlog by priority class (ADMISSION_* environment variables).
+    admission = AdmissionController.from_env()
+    stats = {"handled": 0, "errors": 0, "shed": 0, "in_flight": 0, "busy_seconds": 0.0}
+    started_at = time.time()
+    loop = asyncio.get_running_loop()
+    tasks = set()
+    # Status changes for subscribed AWBs go to the front end's per-session mailbox (needs SHIPMENT_DB).
+    notifier = factory.start_notifier(CallbackSink(lambda session_id, change: responses.put(
+        {"type": "notification", "session_id": session_id, "message": change.message(), **change._asdict()})))
+
+    def report():
+        responses.put({
+            "type": "metrics", "worker": worker_id, "pid": os.getpid(), "uptime": time.time() - started_at,
+            "sessions": sessions.metrics(), "loop_guard": dict(loop_guard_stats), "deadline": dict(deadline_stats),
+            "prefetch": prefetch_summary(), "awb_resolver": dict(awb_resolver_stats),
+            "subscriptions": len(factory.subscriptions),
+            "admission": admission.metrics() if admission is not None else None,
+            "notifier": dict(notifier.stats) if notifier is not None else None,
+            "max_rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            "avg_latency_ms": stats["busy_seconds"] / max(1, stats["handled"]) * 1000, **stats,
+        })
+
+    async def report_periodically():
+        while True:
+            sessions.evict_idle()
+            report()
+            await asyncio.sleep(METRICS_INTERVAL)
+
+    async def handle(request: dict):
+        session_id = request["session_id"]
+        stats["in_flight"] += 1
+        started = time.perf_counter()
+        try:
+            # Turns of one session run in order; different sessions run concurrently.
+            waiting[session_id] += 1
+            try:
+                async with session_locks[session_id]:
+                    session = sessions.acquire(session_id)
+                    try:
+                        async with admission.admit(priority_for(request, session)) if admission else nullcontext():
+                            reply = await session.arespond(request["message"])
+                            degraded = session.degraded
+                    finally:
+                        sessions.release(session)
+            finally:
+                waiting[session_id] -= 1
+                if not waiting[session_id]:
+                    del waiting[session_id], session_locks[session_id]
+            responses.put({"type": "reply", "id": request["id"], "reply": reply, "degraded": degraded,
+                           "worker": worker_id})
+        except Overloaded as e:
+            stats["shed"] += 1
+            responses.put({"type": "reply", "id": request["id"], "worker": worker_id, "busy": True,
+                           "retry_after": e.retry_after, "error": str(e)})
+        except Exception as e:
+            stats["errors"] += 1
+            logging.error(f"Worker {worker_id} failed on session {session_id}: {e}", exc_info=True)
+            responses.put({"type": "reply", "id": request["id"], "worker": worker_id,
+                           "error": f"{type(e).__name__}: {e}"})
+        finally:
+            stats["in_flight"] -= 1
+            stats["handled"] += 1
+            stats["busy_seconds"] += time.perf_counter() - started
+
+    reporter = asyncio.create_task(report_periodically())
+    logging.info(f"Worker {worker_id} (pid {os.getpid()}) ready")
+    while True:
+        request = await loop.run_in_executor(None, requests.get)
+        if request is None:  # Sentinel: finish what is in flight, then exit
+            break
+        if request.get("admin") == "profile":
+            try:
+                if request["mode"] == "off":
+                    factory.profiler.disable()
+                else:
+                    factory.profiler.enable(request["mode"], request.get("turns"))
+            except ValueError as e:
+                logging.error(f"Worker {worker_id}: {e}")
+            continue
+        task = asyncio.create_task(handle(request))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    await asyncio.gather(*tasks)
+    persisted = sessions.persist_all()
+    if notifier is not None:
+        notifier.stop()
+    reporter.cancel()
+    report()
+    logging.info(f"Worker {worker_id} (pid {os.getpid()}) drained and stopped, {persisted} sessions saved")
+# ========================================================= WORKER ========================================================== #
+
+
+# ======================================================= FRONT END ========================================================= #
+class WorkerPool:
+    ''' Owns the worker processes, routes requests to them and collects replies and metrics. '''
+
+    def __init__(self, workers: int, stub_latency: float | None = None):
+        self._context = multiprocessing.get_context("fork")
+        self.stub_latency = stub_latency
+        # Request queues outlive worker processes, so a restart never loses queued requests.
+        self.request_queues = [self._context.Queue() for _ in range(workers)]
+        self.responses = self._context.Queue()
+        self.processes = [None] * workers
+        self.metrics = {}
+        self.mailboxes = defaultdict(lambda: deque(maxlen=MAILBOX_SIZE))  # session -> (received_at, notification)
+        self.restarts = 0
+        self.shard_cluster = None  # Shared shipment state (SHIPMENT_SHARDS), started before the workers
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._ids = itertools.count()
+        self._restart_lock = threading.Lock()
+        self._stopping = False
+
+    def _spawn(self, worker_id: int):
+        process = self._context.Process(
+            target=worker_main, name=f"logistics-worker-{worker_id}", daemon=True,
+            args=(worker_id, self.request_queues[worker_id], self.responses, self.stub_latency))
+        process.start()
+        self.processes[worker_id] = process
+
+    def start(self):
+        for worker_id in range(len(self.processes)):
+            self._spawn(worker_id)
+        threading.Thread(target=self._collect, name="collector", daemon=True).start()
+        threading.Thread(target=self._supervise, name="supervisor", daemon=True).start()
+
+    def worker_for(self, session_id: str) -> int:
+        # Stable hash (unlike hash()) so a session keeps its worker across restarts.
+        return zlib.crc32(session_id.encode("utf-8")) % len(self.processes)
+
+    def chat(self, session_id: str, message: str, timeout: float = REQUEST_TIMEOUT, priority: str = None) -> dict:
+        request_id = next(self._ids)
+        done = threading.Event()
+        with self._pending_lock:
+            self._pending[request_id] = [done, None]
+        self.request_queues[self.worker_for(session_id)].put(
+            {"id": request_id, "session_id": session_id, "message": message, "priority": priority})
+        finished = done.wait(timeout)
+        with self._pending_lock:
+            _, result = self._pending.pop(request_id)
+        return result if finished else {"error": "Timed out waiting for a worker"}
+
+    def _collect(self):
+        while True:
+            message = self.responses.get()
+            if message["type"] == "metrics":
+                self.metrics[message["worker"]] = message
+                continue
+            if message["type"] == "notification":
+                with self._pending_lock:
+                    self.mailboxes[message["session_id"]].append((time.monotonic(), message))
+                continue
+            with self._pending_lock:
+                waiter = self._pending.get(message["id"])
+                if waiter is not None:
+                    waiter[1] = message
+                    waiter[0].set()
+
+    def _supervise(self):
+        # Respawn workers that died unexpectedly (OOM kill, crash).
+        while not self._stopping:
+            time.sleep(1)
+            self._expire_mailboxes()
+            with self._restart_lock:
+                for worker_id, process in enumerate(self.processes):
+                    if not self._stopping and not process.is_alive():
+                        logging.warning(f"Worker {worker_id} exited with {process.exitcode}; respawning")
+                        self.restarts += 1
+                        self._spawn(worker_id)
+
+    def _stop_worker(self, worker_id: int):
+        self.request_queues[worker_id].put(None)
+        self.processes[worker_id].join()
+
+    def restart(self):
+        ''' Rolling restart: each worker drains its queue up to the sentinel before its replacement starts. '''
+        with self._restart_lock:
+            for worker_id in range(len(self.processes)):
+                logging.info(f"Restarting worker {worker_id}")
+                self._stop_worker(worker_id)
+                self._spawn(worker_id)
+                self.restarts += 1
+        logging.info("Rolling restart complete")
+
+    def broadcast(self, message: dict):
+        ''' Sends an admin message to every worker, queued behind its pending requests. '''
+        for request_queue in self.request_queues:
+            request_queue.put(message)
+
+    def shutdown(self):
+        self._stopping = True
+        with self._restart_lock:
+            for worker_id in range(len(self.processes)):
+                self._stop_worker(worker_id)
+
+    def health(self) -> dict:
+        workers = []
+        for worker_id, process in enumerate(self.processes):
+            metrics = dict(self.metrics.get(worker_id, {}))
+            metrics.pop("type", None)
+            metrics.update(worker=worker_id, alive=process.is_alive(), queued=self._queue_depth(worker_id))
+            workers.append(metrics)
+        return {"workers": workers, "restarts": self.restarts,
+                "shards": self.shard_cluster.stats() if self.shard_cluster is not None else None}
+
+    def take_notifications(self, session_id: str) -> list[dict]:
+        with self._pending_lock:
+            mailbox = self.mailboxes.pop(session_id, None)
+        return [{k: v for k, v in n.items() if k not in ("type", "session_id")} for _, n in mailbox or ()]
+
+    def _expire_mailboxes(self):
+        # Sessions that never poll would otherwise keep their mailboxes for the life of the process.
+        cutoff = time.monotonic() - MAILBOX_TTL
+        with self._pending_lock:
+            for session_id in list(self.mailboxes):
+                mailbox = self.mailboxes[session_id]
+                while mailbox and mailbox[0][0] < cutoff:
+                    mailbox.popleft()
+                if not mailbox:
+                    del self.mailboxes[session_id]
+
+    def _queue_depth(self, worker_id: int) -> int | None:
+        try:
+            return self.request_queues[worker_id].qsize()
+        except NotImplementedError:  # macOS
+            return None
+
+
+def make_handler(pool: WorkerPool):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, status: int, body: dict, headers: dict = None):
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            if url.path == "/health":
+                self._send(200, pool.health())
+            elif url.path == "/notifications":
+                session_id = parse_qs(url.query).get("session_id", [None])[0]
+                if session_id is None:
+                    self._send(400, {"error": "expected ?session_id="})
+                else:
+                    self._send(200, {"session_id": session_id, "notifications": pool.take_notifications(session_id)})
+            else:
+                self._send(404, {"error": "not found"})
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)) or 0)
+            if self.path == "/admin/restart":
+                threading.Thread(target=pool.restart, daemon=True).start()
+                self._send(202, {"status": "restarting"})
+                return
+            if self.path == "/admin/profile":
+                try:
+                    request = json.loads(body or b"{}")
+                    mode = request.get("mode", "sampling")
+                    if mode not in ("off", "cprofile", "sampling"):
+                        raise ValueError(mode)
+                except ValueError:
+                    self._send(400, {"error": "expected JSON with 'mode' of sampling, cprofile or off"})
+                    return
+                pool.broadcast({"admin": "profile", "mode": mode, "turns": request.get("turns")})
+                self._send(202, {"status": "profiling " + mode})
+                return
+            if self.path == "/admin/shards":
+                # {"add": true} or {"remove": "shard-0"}; workers pick up the new ring on their next call.
+                if pool.shard_cluster is None:
+                    self._send(400, {"error": "shipment state is not sharded (SHIPMENT_SHARDS)"})
+                    return
+                try:
+                    request = json.loads(body or b"{}")
+                    if request.get("remove"):
+                        moved = pool.shard_cluster.remove_shard(str(request["remove"]))
+                    elif request.get("add"):
+                        moved = pool.shard_cluster.add_shard()[1]
+                    else:
+                        raise ValueError("expected JSON with 'add': true or 'remove': <shard>")
+                except (ValueError, KeyError) as e:
+                    self._send(400, {"error": str(e)})
+                    return
+                self._send(200, {"moved_keys": moved, "shards": list(pool.shard_cluster.client.ring.shards)})
+                return
+            if self.path != "/chat":
+                self._send(404, {"error": "not found"})
+                return
+            try:
+                request = json.loads(body)
+                session_id, message = str(request["session_id"]), str(request["message"])
+            except (ValueError, KeyError, TypeError):
+                self._send(400, {"error": "expected JSON with 'session_id' and 'message'"})
+                return
+            # Bulk clients send "priority": "batch" to queue behind customer turns.
+            result = pool.chat(session_id, message, priority=request.get("priority"))
+            if result.get("busy"):
+                self._send(503, {"error": "busy", "retry_after": result["retry_after"]},
+                           {"Retry-After": str(result["retry_after"])})
+            elif "error" in result:
+                self._send(503 if result["error"].startswith("Timed out") else 500, result)
+            else:
+                self._send(200, {"session_id": session_id, "reply": result["reply"], "degraded": result["degraded"],
+                                 "worker": result["worker"]})
+
+        def log_message(self, format, *args):
+            logging.debug(format % args)
+
+    return Handler
+# ======================================================= FRONT END ========================================================= #
+
+
+if __name__ == "__main__":
+    cli = argparse.ArgumentParser(description="Serve the logistics agent from pre-forked worker processes.")
+    cli.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    cli.add_argument("--host", default="127.0.0.1")
+    cli.add_argument("--port", type=int, default=8080)
+    cli.add_argument("--stub-latency", type=float, default=None,
+                     help="Use the local stand-in model with this latency (s) instead of Gemini")
+    args = cli.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='-- logger: %(processName)s: %(message)s')
+
+    pool = WorkerPool(args.workers, args.stub_latency)
+    if os.getenv("SHIPMENT_SHARDS"):
+        # Start the shard processes once, before the fork, so every worker shares the same state.
+        from logistic_ai_agent_tools import start_shipment_shards
+        pool.shard_cluster = start_shipment_shards()
+    pool.start()
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(pool))
+    server.daemon_threads = True
+
+    signal.signal(signal.SIGHUP, lambda *_: threading.Thread(target=pool.restart, daemon=True).start())
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown, daemon=True).start())
+
+    logging.info(f"Serving on http://{args.host}:{args.port} with {args.workers} workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        pool.shutdown()
+        logging.info("Stopped")
@@ -0,0 +1,233 @@
+import hashlib
+import json
+import logging
+import os
+import time
+import tracemalloc
+from collections import Counter, OrderedDict
+from dataclasses import asdict
+from langchain_core.messages import messages_from_dict, messages_to_dict
+from logistic_ai_agent_dialogue import RescheduleState
+from logistic_ai_agent_executor import LogisticsAgentFactory, LogisticsSession
+
+# Registry of live logistics sessions with memory accounting and eviction. Sessions are
+# kept in LRU order; idle sessions, sessions beyond max_sessions and sessions pushing
+# the total over max_total_bytes are persisted to disk and dropped, then restored
+# transparently on their next turn. A per-session cap trims the oldest chat messages.
+# Persisted state that is not restored within state_ttl is deleted.
+
+# Rough per-message overhead of a LangChain message object on top of its text.
+MESSAGE_OVERHEAD_BYTES = 600
+
+
+def approximate_bytes(session: LogisticsSession) -> int:
+    return sum(len(str(m.content).encode("utf-8")) + MESSAGE_OVERHEAD_BYTES
+               for m in session.memory.chat_memory.messages)
+
+
+class SessionRegistry:
+    ''' Owns sessions for one process: acquire() before a turn, release() after it. '''
+
+    def __init__(self, factory: LogisticsAgentFactory, max_sessions: int = 10000, idle_timeout: float = 1800,
+                 max_total_bytes: int = None, max_session_bytes: int = None,
+                 state_dir: str = "session_state", state_ttl: float = 86400, debug_tracemalloc: bool = False):
+        self.factory = factory
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.max_total_bytes = max_total_bytes
+        self.max_session_bytes = max_session_bytes
+        self.state_dir = state_dir
+        self.state_ttl = state_ttl
+        self.debug_tracemalloc = debug_tracemalloc
+        self._sessions: OrderedDict[str, LogisticsSession] = OrderedDict()
+        self._bytes: dict[str, int] = {}
+        self._last_used: dict[str, float] = {}
+        self._in_use: Counter = Counter()
+        self.total_bytes = 0
+        self.evictions = Counter()
+        self.restores = 0
+        self.expired_states = 0
+        self.trimmed_messages = 0
+        self._started = time.monotonic()
+        self._next_state_sweep = self._started
+        if debug_tracemalloc and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @classmethod
+    def from_env(cls, factory: LogisticsAgentFactory) -> "SessionRegistry":
+        def optional_int(name):
+            return int(os.environ[name]) if os.getenv(name) else None
+        return cls(
+            factory,
+            max_sessions=int(os.getenv("SESSION_MAX_COUNT", "10000")),
+            idle_timeout=float(os.getenv("SESSION_IDLE_TIMEOUT", "1800")),
+            max_total_bytes=optional_int("SESSION_MAX_TOTAL_BYTES"),
+            max_session_bytes=optional_int("SESSION_MAX_BYTES"),
+            state_dir=os.getenv("SESSION_STATE_DIR", "session_state"),
+            state_ttl=float(os.getenv("SESSION_STATE_TTL", "86400")),
+            debug_tracemalloc=os.getenv("SESSION_DEBUG_TRACEMALLOC") == "1",
+        )
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    # ==================================================== TURN LIFECYCLE =================================================== #
+    def acquire(self, session_id: str) -> LogisticsSession:
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self._restore(session_id) or self.factory.session(session_id)
+            self._sessions[session_id] = session
+            self._bytes[session_id] = approximate_bytes(session)
+            self.total_bytes += self._bytes[session_id]
+        self._sessions.move_to_end(session_id)
+        self._in_use[session_id] += 1
+        self._last_used[session_id] = time.monotonic()
+        return session
+
+    def release(self, session: LogisticsSession):
+        session_id = session.session_id
+        self._in_use[session_id] -= 1
+        if self._in_use[session_id] <= 0:
+            del self._in_use[session_id]
+
+        if self.max_session_bytes is not None:
+            self._trim(session)
+        size = approximate_bytes(session)
+        self.total_bytes += size - self._bytes.get(session_id, 0)
+        self._bytes[session_id] = size
+        self._enforce_caps()
+
+    # ======================================================= EVICTION ====================================================== #
+    def _trim(self, session: LogisticsSession):
+        # Drop the oldest exchanges (human + AI pairs) until the session fits its cap.
+        messages = session.memory.chat_memory.messages
+        while len(messages) > 2 and approximate_bytes(session) > self.max_session_bytes:
+            del messages[:2]
+            self.trimmed_messages += 2
+
+    def _evictable(self):
+        return (sid for sid in self._sessions if sid not in self._in_use)
+
+    def _enforce_caps(self):
+        while len(self._sessions) > self.max_sessions:
+            if not self._evict_next("lru"):
+                break
+        while self.max_total_bytes is not None and self.total_bytes > self.max_total_bytes:
+            if not self._evict_next("memory"):
+                break
+
+    def _evict_next(self, reason: str) -> bool:
+        session_id = next(self._evictable(), None)
+        if session_id is None:
+            return False
+        self._evict(session_id, reason)
+        return True
+
+    def evict_idle(self) -> int:
+        ''' Evicts sessions idle for longer than idle_timeout and expires old persisted state. Call periodically. '''
+        now = time.monotonic()
+        cutoff = now - self.idle_timeout
+        idle = [sid for sid in self._evictable() if self._last_used[sid] < cutoff]
+        for session_id in idle:
+            self._evict(session_id, "idle")
+        if now >= self._next_state_sweep:
+            self._next_state_sweep = now + min(self.state_ttl, 60)
+            self.expire_state()
+        return len(idle)
+
+    def _evict(self, session_id: str, reason: str):
+        session = self._sessions.pop(session_id)
+        try:
+            self._persist(session)
+        except OSError as e:
+            logging.error(f"Could not persist session {session_id} before eviction: {e}")
+        self.total_bytes -= self._bytes.pop(session_id, 0)
+        self._last_used.pop(session_id, None)
+        # An evicted session gets no pushes; it subscribes again when it next asks about an AWB
+        self.factory.subscriptions.unsubscribe(session_id)
+        self.evictions[reason] += 1
+        logging.debug(f"Evicted session {session_id} ({reason})")
+
+    # ====================================================== PERSISTENCE ==================================================== #
+    def _state_path(self, session_id: str) -> str:
+        digest = hashlib.sha1(session_id.encode("utf-8")).hexdigest()
+        return os.path.join(self.state_dir, f"{digest}.json")
+
+    def _persist(self, session: LogisticsSession):
+        os.makedirs(self.state_dir, exist_ok=True)
+        state = {
+            "session_id": session.session_id,
+            "messages": messages_to_dict(session.memory.chat_memory.messages),
+            "dialogue": asdict(session.dialogue.state),
+        }
+        path = self._state_path(session.session_id)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(path + ".tmp", path)
+
+    def persist_all(self) -> int:
+        ''' Saves every live session, e.g. when a worker stops, so each is restored on its next message. '''
+        persisted = 0
+        for session in list(self._sessions.values()):
+            try:
+                self._persist(session)
+                persisted += 1
+            except OSError as e:
+                logging.error(f"Could not persist session {session.session_id} on shutdown: {e}")
+        return persisted
+
+    def expire_state(self) -> int:
+        ''' Deletes persisted sessions older than state_ttl; they start over if they come back. '''
+        cutoff = time.time() - self.state_ttl
+        expired = 0
+        try:
+            entries = list(os.scandir(self.state_dir))
+        except FileNotFoundError:
+            return 0
+        for entry in entries:
+            try:
+                if entry.name.endswith(".json") and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    expired += 1
+            except FileNotFoundError:  # Restored or expired by another worker meanwhile
+                pass
+        self.expired_states += expired
+        return expired
+
+    def _restore(self, session_id: str) -> LogisticsSession | None:
+        path = self._state_path(session_id)
+        if not os.path.exists(path) or os.path.getmtime(path) < time.time() - self.state_ttl:
+            return None
+        with open(path, encoding="utf-8") as f:
+            state = json.load(f)
+        os.remove(path)
+        session = self.factory.session(session_id)
+        session.memory.chat_memory.messages = messages_from_dict(state["messages"])
+        session.dialogue.state = RescheduleState(**state["dialogue"])
+        self.restores += 1
+        return session
+
+    # ======================================================== METRICS ====================================================== #
+    def metrics(self, top_allocations: int = 0) -> dict:
+        sizes = list(self._bytes.values())
+        metrics = {
+            "sessions": len(self._sessions),
+            "messages": sum(len(s.memory.chat_memory.messages) for s in self._sessions.values()),
+            "total_bytes": self.total_bytes,
+            "avg_session_bytes": self.total_bytes // max(1, len(sizes)),
+            "max_session_bytes": max(sizes, default=0),
+            "evictions": dict(self.evictions),
+            "evictions_per_min": round(sum(self.evictions.values()) / max(1e-9, time.monotonic() - self._started) * 60, 2),
+            "restores": self.restores,
+            "expired_states": self.expired_states,
+            "trimmed_messages": self.trimmed_messages,
+        }
+        if self.debug_tracemalloc:
+            # Process-wide: concurrent turns share the heap, so none of it is attributable to one session
+            metrics["process_traced_bytes"], metrics["process_traced_peak_bytes"] = tracemalloc.get_traced_memory()
+            if top_allocations:
+                snapshot = tracemalloc.take_snapshot()
+                metrics["top_allocations"] = [
+                    f"{stat.traceback[0].filename}:{stat.traceback[0].lineno} {stat.size} B"
+                    for stat in snapshot.statistics("lineno")[:top_allocations]]
+        return metrics
@@ -0,0 +1,648 @@
+import argparse
+import atexit
+import bisect
+import hashlib
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import random
+import shutil
+import signal
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+from multiprocessing.connection import Client, Listener
+from logistic_ai_agent_calendar import DEFAULT_HORIZON_DAYS, RescheduleCalendar
+
+# Sharded shipment state. Per-AWB records (status, location, reschedule_allowed, postal_code,
+# confirmation) and per-zone reschedule capacity are partitioned over N local shard processes
+# by a consistent hash ring; ShardClient routes each call to the shard that owns the key.
+#
+#   keys       an AWB ("AWB-12345") for shipment records, "zone:<zone>" for a zone's capacity
+#   shards     one process each, serving a Unix socket; ops on a shard run one at a time, so each
+#              record or zone is updated atomically there (confirm_reschedule: reserve on the
+#              zone's shard, then record the new date on the AWB's shard)
+#   rebalance  ShardCluster.add_shard()/remove_shard() move only the keys whose owner changes
+#              (~1/N of them). Moved keys are taken off the old shard first; calls for them
+#              wait until the ring switches over, so no update lands on the old copy.
+#   epochs     every ring change bumps the ring epoch, written to ring.json next to the shard
+#              sockets and announced to every shard. A call made with an older ring is answered
+#              "stale" (or fails to connect to a removed shard); the client then re-reads
+#              ring.json and retries, so clients in other processes (the serve workers) follow
+#              membership changes made by the ShardCluster that owns the shards.
+#
+# Environment: SHIPMENT_SHARDS (number of shard processes, unset keeps state in-process; see
+# logistic_ai_agent_tools.py), SHIPMENT_SHARD_LATENCY (simulated backend time per shard op, s).
+#
+#   python ./logistic_ai_agent_shards.py bench --shards 1,2,4,8 --clients 16 --latency-ms 1
+#   python ./logistic_ai_agent_shards.py rebalance --shards 4 --awbs 100000
+
+VIRTUAL_NODES = 128
+MOVE_WAIT = 10.0  # Longest a call waits for a rebalance to switch the ring over (s)
+
+
+def zone_key(zone: str) -> str:
+    return f"zone:{zone}"
+
+
+def _point(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    ''' Immutable consistent hash ring over shard names, with virtual nodes to even out the key share. '''
+
+    def __init__(self, shards=(), vnodes: int = VIRTUAL_NODES, epoch: int = 0):
+        self.shards = tuple(shards)
+        self.vnodes = vnodes
+        self.epoch = epoch
+        ring = sorted((_point(f"{shard}#{i}"), shard) for shard in self.shards for i in range(vnodes))
+        self._points = [point for point, _ in ring]
+        self._owners = [shard for _, shard in ring]
+
+    def owner(self, key: str) -> str:
+        index = bisect.bisect(self._points, _point(key))
+        return self._owners[index % len(self._owners)]
+
+    def with_shard(self, shard: str) -> "HashRing":
+        return HashRing(self.shards + (shard,), self.vnodes, self.epoch + 1)
+
+    def without_shard(self, shard: str) -> "HashRing":
+        return HashRing([s for s in self.shards if s != shard], self.vnodes, self.epoch + 1)
+
+
+# ========================================================== SHARD ========================================================== #
+class Moved(Exception):
+    ''' The key is being moved to another shard by a rebalance. '''
+
+
+class ShardState:
+    ''' The records and zone calendars one shard owns. Callers hold `lock` around every op. '''
+
+    def __init__(self, calendar_start: date, horizon_days: int, latency: float = 0.0):
+        self.records = {}
+        self.calendar = RescheduleCalendar(calendar_start, horizon_days)
+        self.moving = set()  # Keys taken by a rebalance that has not switched the ring yet
+        self.epoch = 0  # Latest ring epoch announced by the cluster
+        self.latency = latency
+        self.ops = Counter()
+        self.lock = threading.Lock()
+
+    def _check(self, *keys):
+        if self.moving and not self.moving.isdisjoint(keys):
+            raise Moved()
+
+    def op_get(self, awbs: list[str]) -> dict:
+        self._check(*awbs)
+        return {awb: self.records[awb] for awb in awbs if awb in self.records}
+
+    def op_put(self, items: dict) -> int:
+        self._check(*items)
+        for key, value in items.items():
+            if key.startswith("zone:"):
+                for day, slots in value.items():
+                    self.calendar.set_capacity(key[5:], day, slots)
+            else:
+                self.records[key] = value
+        return len(items)
+
+    def op_reschedule(self, awb: str, new_date: str, postal_code: str) -> dict | None:
+        self._check(awb)
+        confirmation = (self.records.get(awb) or {}).get("confirmation")
+        if confirmation is None:
+            return None
+        previous = dict(confirmation)
+        confirmation.update(new_date=new_date, postal_code=postal_code, status="Rescheduled")
+        return previous
+
+    def op_available_dates(self, zone: str, days: int = None, from_day=None) -> list[str]:
+        self._check(zone_key(zone))
+        return self.calendar.available_dates(zone, days, from_day)
+
+    def op_remaining(self, zone: str, day) -> int:
+        self._check(zone_key(zone))
+        return self.calendar.remaining(zone, day)
+
+    def op_reserve(self, zone: str, day) -> bool:
+        self._check(zone_key(zone))
+        return self.calendar.reserve(zone, day)
+
+    def op_release(self, zone: str, day):
+        self._check(zone_key(zone))
+        self.calendar.release(zone, day)
+
+    def op_set_capacity(self, zone: str, day, slots: int):
+        self._check(zone_key(zone))
+        self.calendar.set_capacity(zone, day, slots)
+
+    def op_keys(self) -> list[str]:
+        return list(self.records) + [zone_key(zone) for zone in self.calendar.zones()]
+
+    def op_take(self, keys: list[str]) -> dict:
+        ''' Removes keys for a rebalance and returns them; calls for them get Moved until settle(). '''
+        items = {}
+        for key in keys:
+            if key.startswith("zone:"):
+                items[key] = self.calendar.export_zone(key[5:])
+                self.calendar.drop_zone(key[5:])
+            elif key in self.records:
+                items[key] = self.records.pop(key)
+        self.moving.update(keys)
+        return items
+
+    def op_settle(self, keys: list[str]):
+        self.moving.difference_update(keys)
+
+    def op_epoch(self, epoch: int):
+        self.epoch = max(self.epoch, epoch)
+
+    def op_advance(self, new_start: str):
+        self.calendar.advance(new_start)
+
+    def op_stats(self) -> dict:
+        return {"pid": os.getpid(), "epoch": self.epoch, "calendar_start": self.calendar.start.isoformat(),
+                "records": len(self.records),
+                "zones": len(self.calendar.zones()), "ops": dict(self.ops)}
+
+
+def _serve_connection(state: ShardState, conn):
+    with conn:
+        while True:
+            try:
+                epoch, op, args = conn.recv()
+            except (EOFError, OSError):
+                return
+            handler = getattr(state, f"op_{op}")
+            with state.lock:
+                state.ops[op] += 1
+                if epoch is not None and epoch < state.epoch:  # Routed with an old ring
+                    reply = ("stale", state.epoch)
+                else:
+                    if state.latency:  # Simulated backend time per op (storage write, replication, ...)
+                        time.sleep(state.latency)
+                    try:
+                        reply = ("ok", handler(*args))
+                    except Moved:
+                        reply = ("moved", None)
+                    except Exception as e:
+                        reply = ("error", e)
+            conn.send(reply)
+
+
+def shard_main(name: str, address: str, calendar_start: date, horizon_days: int, latency: float):
+    # The process that started the shard owns shutdown; shards only stop when it terminates them.
+    # A shard added at runtime is forked from a process that may have its own SIGTERM/SIGHUP handlers.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGHUP, signal.SIG_DFL)
+    state = ShardState(calendar_start, horizon_days, latency)
+    with Listener(address, "AF_UNIX") as listener:
+        while True:
+            conn = listener.accept()
+            threading.Thread(target=_serve_connection, args=(state, conn), name=f"{name}-conn", daemon=True).start()
+# ========================================================== SHARD ========================================================== #
+
+
+# ========================================================== CLIENT ========================================================= #
+class ShardClient:
+    ''' Routes state calls to the owning shard. One connection per thread and shard; safe to share across threads. '''
+
+    def __init__(self, ring: HashRing, addresses: dict[str, str], ring_path: str):
+        self.ring = ring
+        self.addresses = addresses
+        self.ring_path = ring_path
+        self.stats = Counter()
+        self.calendar = ShardedCalendar(self)
+        self._local = threading.local()
+        self._pid = os.getpid()
+
+    def refresh(self) -> bool:
+        ''' Picks up a newer ring from ring_path. Returns True if the ring changed. '''
+        with open(self.ring_path) as f:
+            published = json.load(f)
+        if published["epoch"] <= self.ring.epoch:
+            return False
+        # Addresses first: a thread that sees the new ring must be able to reach its shards.
+        self.addresses = published["shards"]
+        self.ring = HashRing(published["shards"], published["vnodes"], published["epoch"])
+        self.stats["ring_refreshes"] += 1
+        return True
+
+    def _connection(self, shard: str):
+        if self._pid != os.getpid():  # Forked child: open its own sockets instead of sharing the parent's
+            self._pid, self._local = os.getpid(), threading.local()
+        conns = self._local.__dict__.setdefault("conns", {})
+        conn = conns.get(shard)
+        if conn is None:
+            for gone in [name for name in conns if name not in self.addresses]:  # Removed shards
+                conns.pop(gone).close()
+            address = self.addresses.get(shard)
+            if address is None:  # Routed with a ring older than the addresses
+                raise ConnectionError(f"{shard} is no longer part of the ring")
+            conn = conns[shard] = Client(address, "AF_UNIX")
+        return conn
+
+    def _send(self, shard: str, epoch: int | None, op: str, *args):
+        try:
+            conn = self._connection(shard)
+            conn.send((epoch, op, args))
+            return conn.recv()
+        except (EOFError, OSError):
+            self._local.__dict__.get("conns", {}).pop(shard, None)
+            raise
+
+    def _try(self, ring: HashRing, shard: str, op: str, *args):
+        ''' (True, value) on success, (False, None) if the call has to be retried with a newer ring. '''
+        try:
+            status, value = self._send(shard, ring.epoch, op, *args)
+        except (EOFError, OSError):  # Removed shard; the ring that dropped it is (about to be) published
+            status, value = "unreachable", None
+        if status == "error":
+            raise value
+        if status != "ok":
+            self.stats[status] += 1
+            return False, None
+        return True, value
+
+    def _await_ring(self, ring: HashRing, started: float, what: str):
+        # A rebalance is moving the keys, or this process has not seen the latest ring yet.
+        while self.ring is ring and not self.refresh():
+            if time.monotonic() - started > MOVE_WAIT:
+                raise TimeoutError(f"{what}: no newer shard ring after {MOVE_WAIT}s")
+            time.sleep(0.001)
+
+    def _call(self, key: str, op: str, *args):
+        started = time.monotonic()
+        while True:
+            ring = self.ring
+            done, value = self._try(ring, ring.owner(key), op, *args)
+            if done:
+                return value
+            self._await_ring(ring, started, key)
+
+    def _scatter(self, op: str, keys: list[str], values: dict = None) -> list:
+        ''' One op per shard over the keys it owns; keys that hit a ring change are regrouped and retried. '''
+        started, results, pending = time.monotonic(), [], keys
+        while pending:
+            ring, by_shard, retry = self.ring, defaultdict(list), []
+            for key in pending:
+                by_shard[ring.owner(key)].append(key)
+            for shard, group in by_shard.items():
+                payload = group if values is None else {key: values[key] for key in group}
+                done, value = self._try(ring, shard, op, payload)
+                if done:
+                    results.append(value)
+                else:
+                    retry += group
+            if retry:
+                self._await_ring(ring, started, f"{len(retry)} keys")
+            pending = retry
+        return results
+
+    def call_shard(self, shard: str, op: str, *args):
+        ''' One op on a named shard, bypassing the ring and epoch checks (rebalance and stats). '''
+        status, value = self._send(shard, None, op, *args)
+        if status != "ok":
+            raise value if status == "error" else Moved()
+        return value
+
+    def get(self, awb: str) -> dict | None:
+        self.stats["get"] += 1
+        return self._call(awb, "get", [awb]).get(awb)
+
+    def get_many(self, awbs: list[str]) -> dict:
+        ''' Records for the known AWBs among awbs, one call per shard involved. '''
+        self.stats["get_many"] += 1
+        found = {}
+        for records in self._scatter("get", list(dict.fromkeys(awbs))):
+            found.update(records)
+        return found
+
+    def existing(self, awbs: list[str]) -> set[str]:
+        return set(self.get_many(awbs))
+
+    def reschedule(self, awb: str, new_date: str, postal_code: str) -> dict | None:
+        ''' Records the new date on the AWB's confirmation; returns the previous one (None if it has none). '''
+        self.stats["reschedule"] += 1
+        return self._call(awb, "reschedule", awb, new_date, postal_code)
+
+    def put(self, records: dict) -> int:
+        ''' Bulk load of AWB records and/or zone capacity ({"zone:<zone>": {day: slots}}). '''
+        return sum(self._scatter("put", list(records), records))
+
+
+class ShardedCalendar:
+    ''' The RescheduleCalendar calls the tools use, each sent to the zone's shard. '''
+
+    def __init__(self, client: ShardClient):
+        self.client = client
+
+    def available_dates(self, zone: str, days: int = None, from_day=None) -> list[str]:
+        return self.client._call(zone_key(zone), "available_dates", zone, days, from_day)
+
+    def remaining(self, zone: str, day) -> int:
+        return self.client._call(zone_key(zone), "remaining", zone, day)
+
+    def reserve(self, zone: str, day) -> bool:
+        return self.client._call(zone_key(zone), "reserve", zone, day)
+
+    def release(self, zone: str, day):
+        self.client._call(zone_key(zone), "release", zone, day)
+
+    def set_capacity(self, zone: str, day, slots: int):
+        self.client._call(zone_key(zone), "set_capacity", zone, day, slots)
+
+    def advance(self, new_start: date):
+        ''' Rolls every shard's horizon forward; shards already there ignore it. '''
+        for shard in self.client.ring.shards:
+            self.client.call_shard(shard, "advance", new_start.isoformat())
+# ========================================================== CLIENT ========================================================= #
+
+
+class ShardCluster:
+    ''' Starts and owns the local shard processes. add_shard()/remove_shard() rebalance over the ring. '''
+
+    def __init__(self, shards: int, calendar_start: date, horizon_days: int = DEFAULT_HORIZON_DAYS,
+                 latency: float = 0.0, vnodes: int = VIRTUAL_NODES):
+        self._context = multiprocessing.get_context("fork")
+        self.calendar_start = calendar_start
+        self.horizon_days = horizon_days
+        self.latency = latency
+        self.processes = {}
+        self.moved_keys = 0
+        self._dir = tempfile.mkdtemp(prefix="shipment-shards-")
+        self._names = itertools.count()
+        self._membership_lock = threading.Lock()
+        self._owner_pid = os.getpid()
+        addresses = {}
+        for _ in range(shards):
+            name = self._spawn()
+            addresses[name] = self._address(name)
+        ring = HashRing(addresses, vnodes)
+        self._publish(ring, addresses)
+        self.client = ShardClient(ring, addresses, self.ring_path)
+        atexit.register(self.close)
+
+    @classmethod
+    def from_env(cls, calendar_start: date) -> "ShardCluster | None":
+        shards = int(os.getenv("SHIPMENT_SHARDS", "0"))
+        if not shards:
+            return None
+        return cls(shards, calendar_start, latency=float(os.getenv("SHIPMENT_SHARD_LATENCY", "0")))
+
+    @property
+    def ring_path(self) -> str:
+        return os.path.join(self._dir, "ring.json")
+
+    def _address(self, name: str) -> str:
+        return os.path.join(self._dir, f"{name}.sock")
+
+    def _publish(self, ring: HashRing, addresses: dict[str, str]):
+        # Written to a temporary file and renamed, so readers never see a partial ring.
+        staged = f"{self.ring_path}.{os.getpid()}"
+        with open(staged, "w") as f:
+            json.dump({"epoch": ring.epoch, "vnodes": ring.vnodes,
+                       "shards": {name: addresses[name] for name in ring.shards}}, f)
+        os.replace(staged, self.ring_path)
+
+    def _spawn(self) -> str:
+        name = f"shard-{next(self._names)}"
+        address = self._address(name)
+        process = self._context.Process(
+            target=shard_main, name=f"shipment-{name}", daemon=True,
+            args=(name, address, self.calendar_start, self.horizon_days, self.latency))
+        process.start()
+        self.processes[name] = process
+        deadline = time.monotonic() + 10
+        while True:  # Wait until it accepts connections
+            try:
+                Client(address, "AF_UNIX").close()
+                return name
+            except (FileNotFoundError, ConnectionRefusedError):
+                if not process.is_alive() or time.monotonic() > deadline:
+                    raise RuntimeError(f"{name} did not start (exit code {process.exitcode})")
+                time.sleep(0.005)
+
+    def _move(self, new_ring: HashRing, addresses: dict[str, str]) -> int:
+        ''' Moves every key whose owner differs under new_ring, then switches every client over to it. '''
+        client, old_ring = self.client, self.client.ring
+        taken = {}
+        for shard in old_ring.shards:
+            outgoing = defaultdict(list)
+            for key in client.call_shard(shard, "keys"):
+                owner = new_ring.owner(key)
+                if owner != shard:
+                    outgoing[owner].append(key)
+            for owner, keys in outgoing.items():
+                client.call_shard(owner, "put", client.call_shard(shard, "take", keys))
+                taken.setdefault(shard, []).extend(keys)
+        # Publish, then announce: from here on any call routed with the old ring is told to refresh.
+        self._publish(new_ring, addresses)
+        for shard in set(old_ring.shards) | set(new_ring.shards):
+            client.call_shard(shard, "epoch", new_ring.epoch)
+        client.refresh()
+        for shard, keys in taken.items():
+            if shard in new_ring.shards:
+                client.call_shard(shard, "settle", keys)
+        moved = sum(len(keys) for keys in taken.values())
+        self.moved_keys += moved
+        return moved
+
+    def add_shard(self) -> tuple[str, int]:
+        ''' Starts a shard and moves its share of the keys to it. Returns (name, keys moved). '''
+        with self._membership_lock:
+            name = self._spawn()
+            addresses = {**self.client.addresses, name: self._address(name)}
+            self.client.addresses = addresses  # call_shard() reaches the new shard before the ring switch
+            # Zones moved in must fit its horizon, which may have rolled forward since the cluster started
+            start = max(self.client.call_shard(shard, "stats")["calendar_start"] for shard in self.client.ring.shards)
+            self.client.call_shard(name, "advance", start)
+            return name, self._move(self.client.ring.with_shard(name), addresses)
+
+    def remove_shard(self, name: str) -> int:
+        ''' Moves a shard's keys to the remaining shards and stops it. Returns keys moved. '''
+        with self._membership_lock:
+            if name not in self.client.ring.shards:
+                raise ValueError(f"no shard named {name}")
+            if len(self.client.ring.shards) == 1:
+                raise ValueError("cannot remove the last shard")
+            new_ring = self.client.ring.without_shard(name)
+            moved = self._move(new_ring, {shard: self.client.addresses[shard] for shard in new_ring.shards})
+            process = self.processes.pop(name)
+            process.terminate()
+            process.join()
+            os.unlink(self._address(name))
+            return moved
+
+    def stats(self) -> dict:
+        shards = {name: self.client.call_shard(name, "stats") for name in self.client.ring.shards}
+        return {"shards": shards, "moved_keys": self.moved_keys, "client": dict(self.client.stats)}
+
+    def close(self):
+        if os.getpid() != self._owner_pid:  # Forked children share the shards but do not own them
+            return
+        for process in self.processes.values():
+            process.terminate()
+        for process in self.processes.values():
+            process.join()
+        self.processes.clear()
+        shutil.rmtree(self._dir, ignore_errors=True)
+
+
+# ======================================================== BENCHMARK ======================================================== #
+BENCH_START = date(2025, 5, 12)
+BENCH_ZONES = 200
+
+
+def _bench_records(awbs: int) -> dict:
+    records = {f"AWB-{n:07d}": {"status": "En Route", "location": "Hub", "reschedule_allowed": True,
+                                "postal_code": f"{n % BENCH_ZONES:05d}",
+                                "confirmation": {"original_date": BENCH_START.isoformat(), "new_date": "",
+                                                 "status": "Pending Reschedule"}}
+               for n in range(awbs)}
+    capacity = {(BENCH_START + timedelta(days=d)).isoformat(): 5000 for d in range(1, 15)}
+    records.update({zone_key(f"Z{z:03d}"): capacity for z in range(BENCH_ZONES)})
+    return records
+
+
+def _bench_client(client: ShardClient, kind: str, awbs: int, seconds: float, seed: int, results):
+    rng = random.Random(seed)
+    days = [(BENCH_START + timedelta(days=d)).isoformat() for d in range(1, 15)]
+    done, deadline = 0, time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        awb = f"AWB-{rng.randrange(awbs):07d}"
+        if kind == "lookup":
+            client.get(awb)
+        else:  # The confirm_reschedule path: take a slot in the zone, record it, give back the old one
+            zone, day = f"Z{rng.randrange(BENCH_ZONES):03d}", rng.choice(days)
+            if client.calendar.reserve(zone, day):
+                previous = client.reschedule(awb, day, zone)
+                if previous and previous["new_date"]:
+                    client.calendar.release(previous["postal_code"], previous["new_date"])
+        done += 1
+    results.put(done)
+
+
+def benchmark(shard_counts: list[int], clients: int, awbs: int, seconds: float, latency: float):
+    ''' Lookup and reschedule throughput of `clients` client processes against 1..N shards. '''
+    context = multiprocessing.get_context("fork")
+    print(f"{awbs} AWBs, {clients} client processes, {latency * 1000:g}ms backend time per shard op, "
+          f"{os.cpu_count()} CPUs")
+    print(f"{'shards':>6} {'lookup/s':>10} {'reschedule/s':>13} {'keys per shard (min-max)':>25}")
+    for shards in shard_counts:
+        cluster = ShardCluster(shards, BENCH_START, latency=latency)
+        try:
+            cluster.client.put(_bench_records(awbs))
+            per_shard = [s["records"] for s in cluster.stats()["shards"].values()]
+            rates = {}
+            for kind in ("lookup", "reschedule"):
+                results = context.Queue()
+                workers = [context.Process(target=_bench_client, args=(cluster.client, kind, awbs, seconds, i, results))
+                           for i in range(clients)]
+                for worker in workers:
+                    worker.start()
+                rates[kind] = sum(results.get() for _ in workers) / seconds
+                for worker in workers:
+                    worker.join()
+            print(f"{shards:>6} {rates['lookup']:>10.0f} {rates['reschedule']:>13.0f} "
+                  f"{min(per_shard):>12}-{max(per_shard)}")
+        finally:
+            cluster.close()
+
+
+def _rebalance_writer(client: ShardClient, awbs: int, stop, results):
+    rng, rescheduled = random.Random(1), 0
+    while not stop.is_set():
+        zone = f"Z{rng.randrange(BENCH_ZONES):03d}"
+        day = (BENCH_START + timedelta(days=rng.randrange(1, 15))).isoformat()
+        if client.calendar.reserve(zone, day):
+            previous = client.reschedule(f"AWB-{rng.randrange(awbs):07d}", day, zone)
+            if previous["new_date"]:
+                client.calendar.release(previous["postal_code"], previous["new_date"])
+            else:
+                rescheduled += 1
+    results.put(("writer", rescheduled, client.stats["ring_refreshes"]))
+
+
+def _rebalance_reader(client: ShardClient, awbs: int, stop, results):
+    rng, lookups, missing = random.Random(2), 0, 0
+    while not stop.is_set():
+        batch = [f"AWB-{rng.randrange(awbs):07d}" for _ in range(200)]
+        missing += len(set(batch) - client.existing(batch))
+        lookups += len(batch)
+    results.put(("reader", (lookups, missing), client.stats["ring_refreshes"]))
+
+
+def rebalance_demo(shards: int, awbs: int):
+    ''' Adds then removes a shard while processes forked beforehand (like serve workers) keep reading
+    and rescheduling, and checks that they followed the ring and that nothing was lost. '''
+    context = multiprocessing.get_context("fork")
+    cluster = ShardCluster(shards, BENCH_START)
+    try:
+        records = _bench_records(awbs)
+        cluster.client.put(records)
+
+        def total_slots():
+            return sum(cluster.client.calendar.remaining(key[5:], day)
+                       for key, capacity in records.items() if key.startswith("zone:") for day in capacity)
+
+        slots_before = total_slots()
+
+        stop, results = context.Event(), context.Queue()
+        workers = [context.Process(target=target, args=(cluster.client, awbs, stop, results))
+                   for target in (_rebalance_writer, _rebalance_reader)]
+        for worker in workers:
+            worker.start()
+        time.sleep(0.2)
+        for step in ("add", "remove"):
+            started = time.perf_counter()
+            if step == "add":
+                name, moved = cluster.add_shard()
+            else:
+                moved = cluster.remove_shard(cluster.client.ring.shards[0])
+            elapsed = time.perf_counter() - started
+            print(f"{step:>6} shard: {len(cluster.client.ring.shards)} shards (epoch {cluster.client.ring.epoch}), "
+                  f"moved {moved} of {len(records)} keys ({moved / len(records):.1%}) in {elapsed * 1000:.0f}ms")
+            time.sleep(0.2)
+        stop.set()
+        reports = {role: (value, refreshes) for role, value, refreshes in (results.get() for _ in workers)}
+        for worker in workers:
+            worker.join()
+
+        rescheduled = reports["writer"][0]
+        (lookups, missing), refreshes = reports["reader"]
+        found = cluster.client.get_many([key for key in records if not key.startswith("zone:")])
+        booked = sum(1 for record in found.values() if record["confirmation"]["new_date"])
+        print(f"forked reader: {lookups} lookups, {missing} missing, {refreshes} ring refreshes")
+        print(f"records: {len(found)}/{awbs} found; rescheduled AWBs {booked} (forked writer saw {rescheduled}); "
+              f"slots {slots_before} -> {total_slots()} (expected {slots_before - rescheduled})")
+    finally:
+        cluster.close()
+
+
+# ======================================================== BENCHMARK ======================================================== #
+
+
+if __name__ == "__main__":
+    cli = argparse.ArgumentParser(description="Sharded shipment state: throughput and rebalance benchmarks.")
+    commands = cli.add_subparsers(dest="command", required=True)
+    bench_cmd = commands.add_parser("bench", help="Lookup and reschedule throughput by shard count")
+    bench_cmd.add_argument("--shards", type=lambda s: [int(x) for x in s.split(",")], default=[1, 2, 4, 8])
+    bench_cmd.add_argument("--clients", type=int, default=16, help="Client processes")
+    bench_cmd.add_argument("--awbs", type=int, default=100000)
+    bench_cmd.add_argument("--seconds", type=float, default=3)
+    bench_cmd.add_argument("--latency-ms", type=float, default=1, help="Simulated backend time per shard op")
+    rebalance_cmd = commands.add_parser("rebalance", help="Add and remove a shard under concurrent writes")
+    rebalance_cmd.add_argument("--shards", type=int, default=4)
+    rebalance_cmd.add_argument("--awbs", type=int, default=100000)
+    args = cli.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='-- logger: %(message)s')
+    if args.command == "bench":
+        benchmark(args.shards, args.clients, args.awbs, args.seconds, args.latency_ms / 1000)
+    else:
+        rebalance_demo(args.shards, args.awbs)
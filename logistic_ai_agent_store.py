@@ -0,0 +1,126 @@
+import os
+import sqlite3
+import threading
+
+# Shipment store backing track_shipment: latest status and location per AWB in SQLite.
+# WAL mode lets the ingest pipeline write in short transactions while tools keep reading.
+# Triggers append every status/location change to shipment_changes, whose increasing id
+# lets watchers (logistic_ai_agent_notify.py) read only what changed since their cursor.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS shipments (
+    awb        TEXT PRIMARY KEY,
+    status     TEXT NOT NULL,
+    location   TEXT NOT NULL,
+    event_time REAL NOT NULL,
+    version    INTEGER NOT NULL DEFAULT 1
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS shipment_changes (
+    id                INTEGER PRIMARY KEY,
+    awb               TEXT NOT NULL,
+    status            TEXT NOT NULL,
+    location          TEXT NOT NULL,
+    previous_status   TEXT,
+    previous_location TEXT,
+    version           INTEGER NOT NULL,
+    changed_at        REAL NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS REAL))
+);
+
+CREATE TRIGGER IF NOT EXISTS shipment_created AFTER INSERT ON shipments
+BEGIN
+    INSERT INTO shipment_changes (awb, status, location, version)
+    VALUES (NEW.awb, NEW.status, NEW.location, NEW.version);
+END;
+
+-- A newer scan at the same status and location is not a change worth telling anyone about.
+CREATE TRIGGER IF NOT EXISTS shipment_changed AFTER UPDATE ON shipments
+WHEN NEW.status IS NOT OLD.status OR NEW.location IS NOT OLD.location
+BEGIN
+    INSERT INTO shipment_changes (awb, status, location, previous_status, previous_location, version)
+    VALUES (NEW.awb, NEW.status, NEW.location, OLD.status, OLD.location, NEW.version);
+END;
+"""
+
+# Only a strictly newer event replaces the stored one, so replaying a feed is a no-op.
+UPSERT = """
+INSERT INTO shipments (awb, status, location, event_time) VALUES (?, ?, ?, ?)
+ON CONFLICT (awb) DO UPDATE SET
+    status = excluded.status,
+    location = excluded.location,
+    event_time = excluded.event_time,
+    version = shipments.version + 1
+WHERE excluded.event_time > shipments.event_time
+"""
+
+
+class ShipmentStore:
+    ''' SQLite-backed latest-status-per-AWB store. Safe to share across threads and forked processes:
+    each thread of each process opens its own connection on first use. '''
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        # Schema setup uses a throwaway connection, so nothing is open yet if the process forks next
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        # A connection inherited across fork belongs to the parent; leave it alone and open our own
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def get(self, awb: str) -> dict | None:
+        row = self._connection().execute(
+            "SELECT status, location, event_time, version FROM shipments WHERE awb = ?", (awb,)).fetchone()
+        if row is None:
+            return None
+        return {"status": row[0], "location": row[1], "event_time": row[2], "version": row[3]}
+
+    def upsert(self, events: list[tuple[str, str, str, float]]) -> int:
+        ''' Applies (awb, status, location, event_time) events in one transaction. Returns rows changed. '''
+        conn = self._connection()
+        with conn:
+            # rowcount, unlike total_changes, leaves out the change-log rows written by triggers
+            return conn.executemany(UPSERT, events).rowcount
+
+    def existing(self, awbs: list[str]) -> set[str]:
+        ''' The given AWBs that are in the store; one primary-key probe each (see logistic_ai_agent_awb.py). '''
+        if not awbs:
+            return set()
+        rows = self._connection().execute(
+            f"SELECT awb FROM shipments WHERE awb IN ({','.join('?' * len(awbs))})", awbs).fetchall()
+        return {row[0] for row in rows}
+
+    def count(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM shipments").fetchone()[0]
+
+    # ---- change log ------------------------------------------------------------------------------------------------ #
+    def last_change_id(self) -> int:
+        return self._connection().execute("SELECT COALESCE(MAX(id), 0) FROM shipment_changes").fetchone()[0]
+
+    def changes_since(self, after_id: int, limit: int = 1000) -> list[tuple]:
+        ''' (id, awb, status, location, previous_status, previous_location, version) rows with id > after_id. '''
+        return self._connection().execute(
+            "SELECT id, awb, status, location, previous_status, previous_location, version FROM shipment_changes "
+            "WHERE id > ? ORDER BY id LIMIT ?", (after_id, limit)).fetchall()
+
+    def prune_changes(self, older_than: float, up_to_id: int = None) -> int:
+        ''' Deletes change-log rows recorded before the epoch time older_than (and with id <= up_to_id, if
+        given). Ids grow with time, so this walks the oldest rows by id instead of scanning the log. '''
+        conn = self._connection()
+        with conn:
+            return conn.execute(
+                "DELETE FROM shipment_changes WHERE id < COALESCE("
+                "(SELECT id FROM shipment_changes WHERE changed_at >= ? ORDER BY id LIMIT 1), "
+                "(SELECT MAX(id) + 1 FROM shipment_changes)) AND id <= COALESCE(?, id)",
+                (older_than, up_to_id)).rowcount
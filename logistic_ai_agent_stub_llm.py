@@ -0,0 +1,98 @@
+import asyncio
+import math
+import random
+import re
+import time
+import uuid
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from logistic_ai_agent_observations import render_observation
+
+# Local stand-in for ChatGoogleGenerativeAI with configurable latency. It answers the
+# logistics conversations well enough to drive the real AgentExecutor and tools
+# (tool calls included) without any network access or API key.
+
+AWB_RE = re.compile(r"\bAWB-\d{5}\b", re.IGNORECASE)
+AWB_TYPO_RE = re.compile(r"\b[A-Z]{1,4}[-_ ]?\d{4,6}\b", re.IGNORECASE)
+
+
+def _estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / 4)
+
+
+class StubLogisticsChatModel(BaseChatModel):
+    ''' Rule-based chat model that sleeps latency +/- latency_jitter seconds per call (at most timeout=). '''
+    latency: float = 0.3
+    latency_jitter: float = 0.1
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub-logistics"
+
+    def bind_tools(self, tools, **kwargs):
+        # Serialise the schemas like a real provider would, so that cost is part of the measurement.
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], **kwargs)
+
+    def _delay(self) -> float:
+        return max(0.0, random.uniform(self.latency - self.latency_jitter, self.latency + self.latency_jitter))
+
+    def _reply(self, messages) -> AIMessage:
+        last = messages[-1]
+        if isinstance(last, ToolMessage):
+            return AIMessage(content=render_observation(str(last.content)))
+
+        human_texts = [str(m.content) for m in messages if isinstance(m, HumanMessage)]
+        text = human_texts[-1] if human_texts else ""
+        awb = None
+        for candidate in reversed(human_texts):
+            if match := AWB_RE.search(candidate):
+                awb = match.group(0).upper()
+                break
+
+        lowered = text.lower()
+        if not AWB_RE.search(text) and AWB_TYPO_RE.search(text):
+            content = "The tracking number should be in the format AWB- followed by 5 digits (e.g., AWB-12345). Could you please provide it again?"
+        elif awb is None:
+            content = "Could you please provide the tracking number? It should be in the format AWB-XXXXX."
+        elif "date" in lowered:
+            return self._tool_call("get_reschedule_dates", awb)
+        elif "reschedul" in lowered:
+            return self._tool_call("check_reschedule_availability", awb)
+        elif any(word in lowered for word in ("track", "where", "status", "awb")):
+            return self._tool_call("track_shipment", awb)
+        else:
+            content = "You're welcome! Is there anything else I can help you with?"
+        return AIMessage(content=content)
+
+    def _tool_call(self, name: str, tracking_number: str) -> AIMessage:
+        return AIMessage(content="", tool_calls=[
+            {"name": name, "args": {"__arg1": tracking_number}, "id": f"call_{uuid.uuid4().hex[:12]}"}])
+
+    def _result(self, messages) -> ChatResult:
+        message = self._reply(messages)
+        prompt_tokens = sum(_estimate_tokens(str(m.content)) for m in messages)
+        output_tokens = _estimate_tokens(str(message.content)) + 10 * len(message.tool_calls)
+        message.usage_metadata = {
+            "input_tokens": prompt_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": prompt_tokens + output_tokens,
+        }
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, timeout: float = None, **kwargs) -> ChatResult:
+        delay = self._delay()
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"{self._llm_type} call timed out after {timeout:.2f}s")
+        time.sleep(delay)
+        return self._result(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, timeout: float = None, **kwargs) -> ChatResult:
+        delay = self._delay()
+        if timeout is not None and delay > timeout:
+            await asyncio.sleep(timeout)
+            raise TimeoutError(f"{self._llm_type} call timed out after {timeout:.2f}s")
+        await asyncio.sleep(delay)
+        return self._result(messages)
@@ -0,0 +1,315 @@
+import logging
+import os
+import time
+from datetime import date, timedelta
+from langchain.tools import Tool, StructuredTool  # Import StructuredTool
+from logistic_ai_agent_store import ShipmentStore
+from logistic_ai_agent_calendar import RescheduleCalendar
+from logistic_ai_agent_postcodes import postcode_service
+from logistic_ai_agent_prefetch import prefetched
+from logistic_ai_agent_observations import observation
+from logistic_ai_agent_shards import ShardCluster
+from logistic_ai_agent_awb import AwbIndex
+from agent_deadline import remaining
+
+
+# =================================================== MOCKING (API CALLS) =================================================== #
+MOCK_TRACKING_DATA = {
+    "AWB-12345": {"status": "En Route", "location": "Kuala Lumpur"},
+    "AWB-67890": {"status": "Delivered", "location": "Ampang Jaya"},
+    "AWB-12341": {"status": "En Route", "location": "Petaling Jaya"}
+}
+MOCK_RESCHEDULE_ALLOWED = {
+    "AWB-12345": True,
+    "AWB-67890": False,
+    "AWB-12341": False
+}
+# Open reschedule days, a few days after the day the process starts (a fixed date would soon be in the past)
+_MOCK_TODAY = date.today()
+MOCK_RESCHEDULE_DATES = {
+    "AWB-12345": [(_MOCK_TODAY + timedelta(days=offset)).isoformat() for offset in (3, 4, 5)],
+}
+MOCK_RESCHEDULE_CONFIRMATION = {
+    "AWB-12345": {"original_date": "2025-05-12", "new_date": "", "status": "Pending Reschedule"},
+}
+MOCK_DESTINATION_POSTAL_CODES = {
+    "AWB-12345": "56000",
+    "AWB-67890": "68000",
+    "AWB-12341": "46000"
+}
+MOCK_DAILY_ZONE_CAPACITY = 50
+# Simulated round trip of the shipment backend per lookup (s), for latency experiments.
+MOCK_API_LATENCY = float(os.getenv("MOCK_API_LATENCY", "0"))
+# =================================================== MOCKING (API CALLS) =================================================== #
+
+# Set SHIPMENT_DB to read shipment status from the store filled by logistic_ai_agent_ingest.py.
+# Shipments missing from the store fall back to MOCK_TRACKING_DATA.
+shipment_store = ShipmentStore(os.getenv("SHIPMENT_DB")) if os.getenv("SHIPMENT_DB") else None
+
+
+# Set SHIPMENT_SHARDS=N to keep per-AWB state and zone capacity in N shard processes instead of
+# this process's memory (see logistic_ai_agent_shards.py). Entrypoints start them with
+# start_shipment_shards(); importing this module never starts processes.
+shipment_cluster = None
+shipment_shards = None
+
+
+def _mock_shipment_record(tracking_number: str) -> dict | None:
+    if tracking_number not in MOCK_TRACKING_DATA:
+        return None
+    return {**MOCK_TRACKING_DATA[tracking_number],
+            "reschedule_allowed": MOCK_RESCHEDULE_ALLOWED.get(tracking_number),
+            "postal_code": MOCK_DESTINATION_POSTAL_CODES.get(tracking_number),
+            "confirmation": MOCK_RESCHEDULE_CONFIRMATION.get(tracking_number)}
+
+
+def _mock_api_call():
+    # The turn's remaining budget is the call timeout, as it would be for a real HTTP client.
+    timeout = remaining()
+    if timeout is not None and timeout < MOCK_API_LATENCY:
+        time.sleep(timeout)
+        raise TimeoutError("Shipment backend timed out")
+    time.sleep(MOCK_API_LATENCY)
+
+
+def fetch_shipment(tracking_number: str) -> dict | None:
+    if MOCK_API_LATENCY:
+        _mock_api_call()
+    if shipment_store is not None:
+        data = shipment_store.get(tracking_number)
+        if data is not None:
+            return data
+    if shipment_shards is None:
+        return MOCK_TRACKING_DATA.get(tracking_number)
+    record = shipment_shards.get(tracking_number)
+    return {"status": record["status"], "location": record["location"]} if record else None
+
+
+def fetch_reschedule_allowed(tracking_number: str) -> bool | None:
+    ''' True/False for known shipments, None if the tracking number is unknown. '''
+    if MOCK_API_LATENCY:
+        _mock_api_call()
+    if shipment_shards is None:
+        return MOCK_RESCHEDULE_ALLOWED.get(tracking_number)
+    record = shipment_shards.get(tracking_number)
+    return record["reschedule_allowed"] if record else None
+
+
+# Backend lookups the session may start speculatively (see logistic_ai_agent_prefetch.py).
+PREFETCH_FETCHERS = {"shipment": fetch_shipment, "reschedule_allowed": fetch_reschedule_allowed}
+
+
+def lookup_shipment(tracking_number: str) -> dict | None:
+    return prefetched("shipment", tracking_number, fetch_shipment)
+
+
+def reschedule_allowed(tracking_number: str) -> bool | None:
+    return prefetched("reschedule_allowed", tracking_number, fetch_reschedule_allowed)
+
+
+# Reschedule availability comes from per-zone daily capacity, seeded from MOCK_RESCHEDULE_DATES.
+RESCHEDULE_WINDOW_DAYS = 14
+
+
+def postal_zone(postal_code: str) -> str | None:
+    info = postcode_service.lookup(postal_code)
+    return info.zone if info else None
+
+
+def shipment_zone(tracking_number: str) -> str | None:
+    if shipment_shards is None:
+        postal_code = MOCK_DESTINATION_POSTAL_CODES.get(tracking_number)
+    else:
+        postal_code = (shipment_shards.get(tracking_number) or {}).get("postal_code")
+    return postal_zone(postal_code) if postal_code else None
+
+
+def _seed_reschedule_calendar(calendar):
+    for tracking_number, dates in MOCK_RESCHEDULE_DATES.items():
+        zone = postal_zone(MOCK_DESTINATION_POSTAL_CODES[tracking_number])
+        for day in dates:
+            calendar.set_capacity(zone, day, MOCK_DAILY_ZONE_CAPACITY)
+    return calendar
+
+
+reschedule_calendar = _seed_reschedule_calendar(RescheduleCalendar(date.today()))
+_calendar_day = reschedule_calendar.start
+
+
+def current_calendar():
+    ''' The reschedule calendar with its horizon rolled forward to today, so past days are gone. '''
+    global _calendar_day
+    today = date.today()
+    if today > _calendar_day:
+        reschedule_calendar.advance(today)
+        _calendar_day = today
+    return reschedule_calendar
+
+
+def start_shipment_shards() -> ShardCluster | None:
+    ''' Moves shipment state into SHIPMENT_SHARDS shard processes, seeded from the mock data. Call once per
+    entrypoint, before forking workers, so they all share the shards. None if the variable is unset. '''
+    global shipment_cluster, shipment_shards, reschedule_calendar
+    if shipment_cluster is not None:
+        return shipment_cluster
+    cluster = ShardCluster.from_env(_calendar_day)
+    if cluster is None:
+        return None
+    cluster.client.put({awb: _mock_shipment_record(awb) for awb in MOCK_TRACKING_DATA})
+    # The same calls as a RescheduleCalendar, sent to the shard that owns each zone.
+    reschedule_calendar = _seed_reschedule_calendar(cluster.client.calendar)
+    shipment_cluster, shipment_shards = cluster, cluster.client
+    return cluster
+
+
+def known_awb_sources() -> list:
+    ''' Sources of existing(awbs) for the AWB typo resolver: the shards or mock data, plus the store. '''
+    sources = [shipment_shards if shipment_shards is not None else AwbIndex(MOCK_TRACKING_DATA)]
+    return sources + ([shipment_store] if shipment_store is not None else [])
+
+
+def record_reschedule(tracking_number: str, new_date: str, postal_code: str) -> dict | None:
+    ''' Stores the new date on the shipment's confirmation. Returns the previous one (None if it has none). '''
+    if shipment_shards is not None:
+        return shipment_shards.reschedule(tracking_number, new_date, postal_code)
+    confirmation = MOCK_RESCHEDULE_CONFIRMATION.get(tracking_number)
+    if confirmation is None:
+        return None
+    previous = dict(confirmation)
+    confirmation.update(new_date=new_date, postal_code=postal_code, status="Rescheduled")
+    return previous
+
+
+def available_reschedule_dates(tracking_number: str, postal_code: str = None) -> list[str]:
+    ''' Open days in the zone confirm_reschedule would reserve in: the postal code's if given, else the shipment's. '''
+    zone = postal_zone(postal_code) if postal_code else shipment_zone(tracking_number)
+    return current_calendar().available_dates(zone, RESCHEDULE_WINDOW_DAYS, from_day=date.today()) if zone else []
+
+
+# ========================================================= TOOLS =========================================================== #
+
+# Tools return observation(code, **fields): the customer-facing sentence, or compact JSON with
+# COMPACT_TOOL_OBSERVATIONS=1 (see logistic_ai_agent_observations.py).
+
+# TOOL-1: track_shipment - to track shipment
+def track_shipment(tracking_number: str) -> str:
+    logging.info(
+        f"Calling mock_track_shipment with tracking_number: {tracking_number}")
+    data = lookup_shipment(tracking_number)
+    if data is not None:
+        result = observation("STATUS", awb=tracking_number, status=data['status'], location=data['location'])
+    else:
+        result = observation("NOT_FOUND", awb=tracking_number)
+    logging.info(f"mock_track_shipment result: {result}")
+    return result
+
+
+tracking_tool = Tool(
+    name="track_shipment",
+    func=track_shipment,
+    description="Use this tool to get the current status and location of a shipment given its tracking number (e.g., AWB-XXXXX).",
+)
+
+
+# TOOL-2: check_reschedule_availability - to check reschedule availability
+def check_reschedule_availability(tracking_number: str) -> str:
+    logging.info(
+        f"Calling mock_check_reschedule_availability with tracking_number: {tracking_number}")
+    allowed = reschedule_allowed(tracking_number)
+    if allowed is None:
+        result = observation("NOT_FOUND", awb=tracking_number)
+    elif allowed:
+        result = observation("RESCHEDULE_ALLOWED", awb=tracking_number)
+    else:
+        result = observation("RESCHEDULE_DENIED", awb=tracking_number)
+    logging.info(f"mock_check_reschedule_availability result: {result}")
+    return result
+
+
+reschedule_check_tool = Tool(
+    name="check_reschedule_availability",
+    func=check_reschedule_availability,
+    description="Use this tool to determine if rescheduling is allowed for a given shipment tracking number. Typically used if a user asks if they can reschedule their shipment.",
+)
+
+
+# TOOL-3: get_reschedule_dates - get the available dates for rescheduling a shipment
+def get_reschedule_dates(tracking_number: str) -> str:
+    logging.info(
+        f"Calling mock_get_reschedule_dates with tracking_number: {tracking_number}")
+    allowed = reschedule_allowed(tracking_number)
+    dates = available_reschedule_dates(tracking_number) if allowed else []
+    if dates:
+        result = observation("RESCHEDULE_DATES", awb=tracking_number, dates=dates)
+    elif allowed is None:
+        result = observation("NOT_FOUND", awb=tracking_number)
+    elif allowed:  # Every day in the window is fully booked
+        result = observation("NO_DATES", awb=tracking_number)
+    else:
+        result = observation("RESCHEDULE_DENIED", awb=tracking_number)
+    logging.info(f"mock_get_reschedule_dates result: {result}")
+    return result
+
+
+reschedule_dates_tool = Tool(
+    name="get_reschedule_dates",
+    func=get_reschedule_dates,
+    description="Use this tool to get the available dates for rescheduling a shipment, given the tracking number. Only use if rescheduling is confirmed to be allowed or if the user explicitly asks for available dates.",
+)
+
+
+# TOOL-4: confirm_reschedule - Confirms the rescheduling of a shipment.
+def confirm_reschedule(tracking_number: str, new_date: str, postal_code: str) -> str:
+    """Confirms the rescheduling of a shipment."""
+    logging.info(
+        f"Calling mock_confirm_reschedule with tracking_number: {tracking_number}, new_date: {new_date}, postal_code: {postal_code}"
+    )
+    if not reschedule_allowed(tracking_number):
+        result = observation("RESCHEDULE_DENIED", awb=tracking_number)
+    elif not postcode_service.is_valid(postal_code):
+        result = observation("INVALID_POSTCODE", postal_code=postal_code)
+    elif lookup_shipment(tracking_number) is None:  # Check if AWB even exists broadly
+        result = observation("NOT_FOUND", awb=tracking_number)
+    elif current_calendar().reserve(postal_zone(postal_code), new_date):
+        # Simulate update
+        try:
+            previous = record_reschedule(tracking_number, new_date, postal_code)
+        except Exception:  # Nothing was recorded; give the slot back before reporting the failure
+            reschedule_calendar.release(postal_zone(postal_code), new_date)
+            raise
+        if previous and previous["new_date"]:  # Rescheduled before; give the old slot back
+            reschedule_calendar.release(postal_zone(previous["postal_code"]), previous["new_date"])
+        result = observation("RESCHEDULED", awb=tracking_number, date=new_date, postal_code=postal_code)
+    else:  # Date not available or other issue
+        result = observation("DATE_UNAVAILABLE", awb=tracking_number, date=new_date)
+    logging.info(f"mock_confirm_reschedule result: {result}")
+    return result
+
+
+# TOOL-5: validate_postal_code - Checks a postal code and finds its state and delivery zone.
+def validate_postal_code(postal_code: str) -> str:
+    logging.info(
+        f"Calling validate_postal_code with postal_code: {postal_code}")
+    info = postcode_service.lookup(postal_code)
+    if info is not None:
+        result = observation("POSTCODE_VALID", postal_code=info.postal_code, state=info.state, zone=info.zone)
+    else:
+        result = observation("INVALID_POSTCODE", postal_code=postal_code)
+    logging.info(f"validate_postal_code result: {result}")
+    return result
+
+
+postal_code_tool = Tool(
+    name="validate_postal_code",
+    func=validate_postal_code,
+    description="Use this tool to check whether a postal code is valid and find its state and delivery zone. Use it before rescheduling if you are unsure about the postal code the user gave.",
+)
+
+# ========================================================= TOOLS =========================================================== #
+
+
+# Tools available to the logistics agent
+tools = [tracking_tool, reschedule_check_tool,
+         reschedule_dates_tool, postal_code_tool,
+         # Change to StructuredTool
+         StructuredTool.from_function(confirm_reschedule)]
@@ -0,0 +1,22 @@
+import math
+
+# Small helpers shared by the batch, load-test and benchmark scripts.
+
+
+def percentile(values: list[float], p: float) -> float:
+    ''' Nearest-rank percentile (p in 0-100). Returns 0.0 for an empty list. '''
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(p / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def latency_summary(latencies: list[float]) -> str:
+    ''' One-line p50/p95/p99/max summary of latencies given in seconds. '''
+    return (
+        f"p50={percentile(latencies, 50) * 1000:.0f}ms "
+        f"p95={percentile(latencies, 95) * 1000:.0f}ms "
+        f"p99={percentile(latencies, 99) * 1000:.0f}ms "
+        f"max={max(latencies, default=0) * 1000:.0f}ms"
+    )
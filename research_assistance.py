@@ -1,14 +1,26 @@
+import json
+import os
 from dotenv import load_dotenv
 from pydantic import BaseModel
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import PydanticOutputParser
-from langchain.agents import create_tool_calling_agent, AgentExecutor
-from research_assistance_tools import search_tool, wikipedia_tool, save_tool
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain.agents import create_tool_calling_agent
+from research_assistance_tools import archive_tool, search_tool, wikipedia_tool, save_tool
+from agent_trace import TraceRecorder
+from agent_profiling import TurnProfiler
+from research_assistance_query_cache import QueryCache
+from agent_checkpoint import CheckpointStore, CheckpointedAgentExecutor, run_id_for
+from agent_deadline import DeadlineAgentExecutorMixin, DeadlineChatModel, deadline
 
 load_dotenv()
 
 
+class ResearchAgentExecutor(DeadlineAgentExecutorMixin, CheckpointedAgentExecutor):
+    ''' Checkpointed executor whose steps run under the run deadline (see agent_deadline.py). '''
+
+
 class ResearchResponse(BaseModel):
     ''' Pydantic Set up. Output will folow this model. '''
     topic: str
@@ -32,21 +44,67 @@ prompt = ChatPromptTemplate.from_messages(
     ]
 ).partial(format_instructions=parser.get_format_instructions())
 
-# Set Available Tools
-tools = [search_tool, wikipedia_tool, save_tool]
+# Set Available Tools; earlier saved research is searched locally before the web (RESEARCH_ARCHIVE_PATH)
+tools = ([archive_tool] if archive_tool else []) + [search_tool, wikipedia_tool, save_tool]
 
-# Create AI Agent
+# Create AI Agent; each model call gets what is left of the run deadline as its timeout
 agent = create_tool_calling_agent(
-    llm=llm,
+    llm=DeadlineChatModel(llm),
     prompt=prompt,
     tools=tools
 )
 
 query = input("What I can help you research? ")
 
+# Near-duplicate questions reuse an earlier answer (see research_assistance_query_cache.py)
+query_cache = QueryCache.from_env()
+match = query_cache.lookup(query) if query_cache else None
+
+if match is not None and match.reusable:
+    print(f"(Reusing the answer to a {match.similarity:.0%} similar earlier question: {match.query!r})")
+    structured_response = ResearchResponse.model_validate(match.response)
+    print(structured_response)
+    print('- Topic: ', structured_response.topic)
+    print('- Summary: ', structured_response.summary)
+    raise SystemExit
+
+# A related but not close enough (or stale) answer seeds the run, so the agent can refresh it cheaply
+chat_history = []
+if match is not None:
+    chat_history = [HumanMessage(match.query), AIMessage(json.dumps(match.response, ensure_ascii=False))]
+
+# Tool steps are checkpointed per run; re-running the same query (or RESEARCH_RUN_ID) after a failure
+# resumes from the last completed step (see agent_checkpoint.py)
+checkpoints = CheckpointStore.from_env()
+checkpoint = None
+if checkpoints:
+    checkpoints.gc()
+    checkpoint = checkpoints.run(os.getenv("RESEARCH_RUN_ID") or run_id_for(query))
+
 # Invoke AI Agent
-agent_executor = AgentExecutor(agent=agent, tools=tools, verbose=True)
-raw_response = agent_executor.invoke({"query": query})
+agent_executor = ResearchAgentExecutor(agent=agent, tools=tools, verbose=True, checkpoint=checkpoint)
+# Whole-run time budget (RESEARCH_DEADLINE_SECONDS, 0 disables). A run cut short ends with its last
+# observation, which fails to parse below and keeps the checkpoint, so re-running picks up from there.
+run_timeout = float(os.getenv("RESEARCH_DEADLINE_SECONDS", "120")) or None
+
+# Record the run's intermediate steps when AGENT_TRACE_DIR is set (see agent_trace.py)
+trace_recorder = TraceRecorder.from_env()
+trace = trace_recorder.start_turn("research", query) if trace_recorder else None
+# Profile the run when AGENT_PROFILE is set (see agent_profiling.py)
+try:
+    with TurnProfiler.from_env().turn("research"), deadline(run_timeout):
+        raw_response = agent_executor.invoke(
+            {"query": query, "chat_history": chat_history}, config={"callbacks": [trace]} if trace else {})
+except Exception as e:
+    if trace_recorder:
+        trace_recorder.finish_turn(trace, error=e)
+    raise
+else:
+    if trace_recorder:
+        trace_recorder.finish_turn(trace, raw_response.get("output"))
+finally:
+    if trace_recorder:
+        trace_recorder.flush()
 
 # print(raw_response)
 
@@ -56,5 +114,9 @@ try:
     print(structured_response)
     print('- Topic: ', structured_response.topic)
     print('- Summary: ', structured_response.summary)
+    if query_cache:
+        query_cache.store(query, structured_response.model_dump())
+    if checkpoint:
+        checkpoint.clear()  # Finished; nothing to resume
 except Exception as e:
     print("Error parsing: ", e, " Raw Response: ", raw_response)
@@ -0,0 +1,227 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from langchain.tools import Tool
+from research_assistance_wiki_index import to_fts_query
+
+# Searchable archive of saved research. Every result the agent saves (save_to_txt) is also
+# indexed here, one row per result, with its topic, summary, result, sources, tools used and
+# save time. An FTS5 index kept in step by triggers backs search() and the
+# search_previous_research tool, which the agent can try before going to the web.
+# research_output.txt stays the human-readable log; `import` indexes what was saved before the
+# archive existed (and only blocks added since the last import on later runs).
+#
+#   python ./research_assistance_archive.py import research_output.txt
+#   python ./research_assistance_archive.py query "population of South Asian countries"
+#
+# Environment: RESEARCH_ARCHIVE_PATH (default research_archive.db, empty disables).
+
+DEFAULT_ARCHIVE_PATH = "research_archive.db"
+NO_RESULT = "No earlier research found on this topic."
+FIELDS = ("topic", "summary", "result", "sources", "tools_used")
+# A hit has to contain at least this share of the query's words; FTS5 OR queries match any one of them.
+MIN_TERM_COVERAGE = 0.5
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id         INTEGER PRIMARY KEY,
+    digest     TEXT NOT NULL UNIQUE,
+    saved_at   TEXT NOT NULL,
+    topic      TEXT NOT NULL,
+    summary    TEXT NOT NULL,
+    result     TEXT NOT NULL,
+    sources    TEXT NOT NULL,
+    tools_used TEXT NOT NULL
+);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5(
+    topic, summary, result, sources, tools_used,
+    content='entries', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+
+CREATE TRIGGER IF NOT EXISTS entries_indexed AFTER INSERT ON entries
+BEGIN
+    INSERT INTO entries_fts (rowid, topic, summary, result, sources, tools_used)
+    VALUES (NEW.id, NEW.topic, NEW.summary, NEW.result, NEW.sources, NEW.tools_used);
+END;
+
+-- Byte offset up to which a text log has been imported
+CREATE TABLE IF NOT EXISTS imports (
+    path   TEXT PRIMARY KEY,
+    offset INTEGER NOT NULL
+);
+"""
+
+_LABEL_RE = re.compile(r"^\s*[-*]?\s*(topic|summary|result|sources|tools[ _]used)\s*:\s*", re.IGNORECASE | re.MULTILINE)
+# Matched on the raw bytes so resume offsets stay byte offsets even when the log has invalid UTF-8
+_BLOCK_RE = re.compile(rb"--- Research Output ---\nTimestamp: ([^\n]*)\n\n(.*?)\n\n(?=--- Research Output ---\n|\Z)",
+                       re.DOTALL)
+_WORD_RE = re.compile(r"\w{3,}", re.UNICODE)
+
+
+def _text(value) -> str:
+    if isinstance(value, (list, tuple)):
+        return "\n".join(str(v) for v in value)
+    return "" if value is None else str(value)
+
+
+def parse_research(data: str) -> dict:
+    ''' Fields of a saved result: a ResearchResponse JSON, "Topic: ..." labelled text, or free text. '''
+    fields = {}
+    try:
+        parsed = json.loads(data)
+        if isinstance(parsed, dict):
+            fields = {name: _text(parsed.get(name)) for name in FIELDS}
+    except ValueError:
+        labels = list(_LABEL_RE.finditer(data))
+        for label, following in zip(labels, labels[1:] + [None]):
+            name = label.group(1).lower().replace(" ", "_")
+            fields[name] = data[label.end():following.start() if following else len(data)].strip()
+    fields = {name: fields.get(name, "") for name in FIELDS}
+    if not any(fields.values()):
+        fields["result"] = data.strip()
+    if not fields["topic"]:
+        fields["topic"] = next((line.strip() for line in data.splitlines() if line.strip()), "")[:120]
+    return fields
+
+
+class ResearchArchive:
+    ''' SQLite FTS5 index of saved research results. Safe to share across threads. '''
+
+    def __init__(self, path: str = DEFAULT_ARCHIVE_PATH, top_k: int = 3, chars_max: int = 1500):
+        self.path = path
+        self.top_k = top_k
+        self.chars_max = chars_max
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        conn.commit()
+
+    @classmethod
+    def from_env(cls) -> "ResearchArchive | None":
+        path = os.getenv("RESEARCH_ARCHIVE_PATH", DEFAULT_ARCHIVE_PATH)
+        return cls(path) if path else None
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def add(self, data: str, saved_at: str = None) -> bool:
+        ''' Indexes one saved result. Returns False if the same text was already archived. '''
+        fields = parse_research(data)
+        digest = hashlib.sha1(data.strip().encode("utf-8")).hexdigest()
+        saved_at = saved_at or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        conn = self._connection()
+        with conn:
+            return conn.execute(
+                "INSERT OR IGNORE INTO entries (digest, saved_at, topic, summary, result, sources, tools_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", (digest, saved_at, *(fields[name] for name in FIELDS))).rowcount > 0
+
+    def import_log(self, path: str) -> int:
+        ''' Indexes the blocks save_to_txt appended to path since the last import. Returns entries added. '''
+        conn = self._connection()
+        row = conn.execute("SELECT offset FROM imports WHERE path = ?", (os.path.abspath(path),)).fetchone()
+        offset = row[0] if row else 0
+        with open(path, "rb") as f:
+            f.seek(offset)
+            chunk = f.read()
+        added, consumed = 0, 0
+        for block in _BLOCK_RE.finditer(chunk):
+            added += self.add(block.group(2).decode("utf-8", errors="replace"),
+                              block.group(1).decode("utf-8", errors="replace"))
+            consumed = block.end()
+        with conn:
+            conn.execute("INSERT INTO imports (path, offset) VALUES (?, ?) ON CONFLICT (path) DO UPDATE SET "
+                         "offset = excluded.offset", (os.path.abspath(path), offset + consumed))
+        return added
+
+    def search(self, query: str, top_k: int = None) -> list[dict]:
+        fts_query = to_fts_query(query)
+        if not fts_query:
+            return []
+        # Topic and summary matches count most; candidates are then checked for query-term coverage.
+        rows = self._connection().execute(
+            "SELECT e.saved_at, e.topic, e.summary, e.result, e.sources, e.tools_used FROM entries_fts "
+            "JOIN entries e ON e.id = entries_fts.rowid WHERE entries_fts MATCH ? "
+            "ORDER BY bm25(entries_fts, 10.0, 4.0, 1.0, 1.0, 0.5) LIMIT ?",
+            (fts_query, 4 * (top_k or self.top_k))).fetchall()
+        terms = set(_WORD_RE.findall(query.lower()))
+        hits = []
+        for saved_at, *values in rows:
+            entry = dict(zip(FIELDS, values), saved_at=saved_at)
+            words = set(_WORD_RE.findall(" ".join(values).lower()))
+            if not terms or len(terms & words) >= MIN_TERM_COVERAGE * len(terms):
+                hits.append(entry)
+        return hits[: top_k or self.top_k]
+
+    def run(self, query: str) -> str:
+        started = time.perf_counter()
+        hits = self.search(query)
+        logging.debug(f"Research archive lookup for '{query}' took {(time.perf_counter() - started) * 1000:.2f}ms")
+        if not hits:
+            return NO_RESULT
+        blocks = []
+        for hit in hits:
+            lines = [f"Saved: {hit['saved_at']}", f"Topic: {hit['topic']}"]
+            lines += [f"{name.replace('_', ' ').capitalize()}: {hit[name]}"
+                      for name in ("summary", "result", "sources") if hit[name]]
+            blocks.append("\n".join(lines))
+        return "\n\n".join(blocks)[: self.chars_max]
+
+    def stats(self) -> dict:
+        conn = self._connection()
+        count, first, last = conn.execute("SELECT COUNT(*), MIN(saved_at), MAX(saved_at) FROM entries").fetchone()
+        return {"entries": count, "first_saved": first, "last_saved": last,
+                "bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0}
+
+
+def previous_research_tool(archive: ResearchArchive) -> Tool:
+    return Tool(
+        name="search_previous_research",
+        func=archive.run,
+        description=(
+            "Search research results saved in earlier sessions. Try this first for a topic that may have "
+            "been researched before; use the web search only if nothing relevant or recent enough comes back. "
+            "Input should be a search query."
+        ),
+    )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='-- logger: %(message)s')
+
+    cli = argparse.ArgumentParser(description="Full-text archive of saved research results.")
+    cli.add_argument("--archive", default=os.getenv("RESEARCH_ARCHIVE_PATH") or DEFAULT_ARCHIVE_PATH)
+    commands = cli.add_subparsers(dest="command", required=True)
+    import_cmd = commands.add_parser("import", help="Index results appended to a save_to_txt log since the last import")
+    import_cmd.add_argument("log", nargs="?", default="research_output.txt")
+    query_cmd = commands.add_parser("query", help="Search the archive")
+    query_cmd.add_argument("text")
+    query_cmd.add_argument("--top-k", type=int, default=3)
+    commands.add_parser("stats", help="Entries and time range")
+    args = cli.parse_args()
+
+    if args.command == "import":
+        archive = ResearchArchive(args.archive)
+        started = time.perf_counter()
+        added = archive.import_log(args.log)
+        logging.info(f"Indexed {added} results from {args.log} in {time.perf_counter() - started:.2f}s")
+    elif args.command == "query":
+        archive = ResearchArchive(args.archive, args.top_k, chars_max=10000)
+        started = time.perf_counter()
+        print(archive.run(args.text))
+        print(f"\n({(time.perf_counter() - started) * 1000:.2f}ms)")
+    else:
+        print(json.dumps(ResearchArchive(args.archive).stats(), indent=2))
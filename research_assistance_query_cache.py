@@ -0,0 +1,273 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import random
+import sqlite3
+import time
+from typing import NamedTuple
+from perf_stats import latency_summary, percentile
+from research_assistance_rerank import tokenize
+
+# Near-duplicate question cache for the research assistant. Each question is reduced to
+# a set of character shingles of its (stopword-free) words, so word order and plurals barely
+# move it; demonyms ending in -ian/-ean/-can are shingled as their place name ("Asian" as
+# "Asia"), so "South Asia countries and population" matches "population of South Asian countries". A 64-value MinHash signature is split
+# into 16 LSH bands stored in SQLite; a lookup only compares against questions sharing
+# a band bucket, then checks the real Jaccard similarity of the shingle sets.
+#
+#   similarity >= threshold, fresh, same key tokens   reuse the cached ResearchResponse, no agent run
+#   similarity >= seed_threshold                      run the agent with the cached answer as context
+#
+# Shingles barely notice "World War I" vs "World War II" (0.85) or 2019 vs 2020, so an
+# answer is only reused when the numbers and short tokens of both questions are identical.
+# Reuse is off unless enabled (RESEARCH_CACHE_REUSE=1); by default matches only seed a run.
+#
+#   python ./research_assistance_query_cache.py lookup "population of South Asian countries"
+#   python ./research_assistance_query_cache.py stats
+#   python ./research_assistance_query_cache.py bench --sizes 1000,10000,50000
+
+DEFAULT_CACHE_PATH = "research_cache.db"
+SHINGLE_SIZE = 4
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+_PRIME = (1 << 61) - 1
+_rng = random.Random(0x5EED)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS queries (
+    id         INTEGER PRIMARY KEY,
+    query      TEXT NOT NULL,
+    response   TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS lsh (
+    band     INTEGER NOT NULL,
+    bucket   INTEGER NOT NULL,
+    query_id INTEGER NOT NULL,
+    PRIMARY KEY (band, bucket, query_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS stats (
+    name  TEXT PRIMARY KEY,
+    value REAL NOT NULL
+);
+"""
+
+
+def _place_form(token: str) -> str:
+    return token[:-1] if len(token) > 4 and token.endswith(("ian", "ean", "can")) else token
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> frozenset[str]:
+    grams = set()
+    for token in map(_place_form, tokenize(text)):
+        padded = f"^{token}$"
+        if len(padded) <= size:
+            grams.add(padded)
+        else:
+            grams.update(padded[i:i + size] for i in range(len(padded) - size + 1))
+    return frozenset(grams)
+
+
+def key_tokens(text: str) -> frozenset[str]:
+    ''' Numbers and short tokens (roman numerals, codes, "us"/"uk"), where one character changes the question. '''
+    return frozenset(t for t in tokenize(text) if len(t) <= 3 or any(c.isdigit() for c in t))
+
+
+def jaccard(a: frozenset, b: frozenset) -> float:
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+
+def _hash64(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def minhash(grams: frozenset[str]) -> list[int]:
+    hashes = [_hash64(g) for g in grams] or [0]
+    return [min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def band_buckets(signature: list[int]) -> list[int]:
+    ''' One signed 64-bit bucket id per band (SQLite INTEGER range). '''
+    return [int.from_bytes(hashlib.blake2b(repr(signature[band * ROWS:(band + 1) * ROWS]).encode(),
+                                           digest_size=8).digest(), "little", signed=True)
+            for band in range(BANDS)]
+
+
+class CacheMatch(NamedTuple):
+    query: str
+    response: dict
+    similarity: float
+    age_seconds: float
+    reusable: bool  # Similar, fresh and same key tokens: answers without running the agent
+
+
+class QueryCache:
+    ''' SQLite-backed MinHash/LSH index over earlier questions and their parsed answers. '''
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, threshold: float = 0.9, seed_threshold: float = 0.5,
+                 max_age_days: float = 30, reuse: bool = False):
+        self.path = path
+        self.reuse = reuse
+        self.threshold = threshold
+        self.seed_threshold = seed_threshold
+        self.max_age_seconds = max_age_days * 86400
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    @classmethod
+    def from_env(cls) -> "QueryCache | None":
+        ''' RESEARCH_CACHE_PATH (set it empty to disable), RESEARCH_CACHE_REUSE, RESEARCH_CACHE_THRESHOLD,
+        RESEARCH_CACHE_SEED_THRESHOLD, RESEARCH_CACHE_MAX_AGE_DAYS. '''
+        path = os.getenv("RESEARCH_CACHE_PATH", DEFAULT_CACHE_PATH)
+        if not path:
+            return None
+        return cls(path,
+                   threshold=float(os.getenv("RESEARCH_CACHE_THRESHOLD", "0.9")),
+                   seed_threshold=float(os.getenv("RESEARCH_CACHE_SEED_THRESHOLD", "0.5")),
+                   max_age_days=float(os.getenv("RESEARCH_CACHE_MAX_AGE_DAYS", "30")),
+                   reuse=os.getenv("RESEARCH_CACHE_REUSE", "0") == "1")
+
+    def _count(self, **increments):
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO stats (name, value) VALUES (?, ?) ON CONFLICT (name) DO UPDATE SET value = value + excluded.value",
+                increments.items())
+
+    def _candidates(self, buckets: list[int]) -> list[int]:
+        clauses = " OR ".join("(band = ? AND bucket = ?)" for _ in buckets)
+        params = [v for band, bucket in enumerate(buckets) for v in (band, bucket)]
+        return [row[0] for row in self.conn.execute(f"SELECT DISTINCT query_id FROM lsh WHERE {clauses}", params)]
+
+    def lookup(self, query: str) -> CacheMatch | None:
+        ''' Best earlier question at or above seed_threshold, or None. Counts hits, seeds and misses. '''
+        started = time.perf_counter()
+        grams = shingles(query)
+        best = None
+        candidates = self._candidates(band_buckets(minhash(grams)))
+        if candidates:
+            placeholders = ",".join("?" * len(candidates))
+            for cached_query, response, created_at in self.conn.execute(
+                    f"SELECT query, response, created_at FROM queries WHERE id IN ({placeholders})", candidates):
+                similarity = jaccard(grams, shingles(cached_query))
+                if similarity >= self.seed_threshold and (best is None or similarity > best[0]):
+                    best = (similarity, cached_query, response, created_at)
+
+        match = None
+        if best is not None:
+            similarity, cached_query, response, created_at = best
+            age = time.time() - created_at
+            reusable = (self.reuse and similarity >= self.threshold and age <= self.max_age_seconds
+                        and key_tokens(query) == key_tokens(cached_query))
+            match = CacheMatch(cached_query, json.loads(response), similarity, age, reusable)
+        outcome = "misses" if match is None else "hits" if match.reusable else "seeded"
+        self._count(lookups=1, lookup_ms=(time.perf_counter() - started) * 1000, candidates=len(candidates),
+                    **{outcome: 1})
+        return match
+
+    def store(self, query: str, response: dict):
+        buckets = band_buckets(minhash(shingles(query)))
+        with self.conn:
+            query_id = self.conn.execute(
+                "INSERT INTO queries (query, response, created_at) VALUES (?, ?, ?)",
+                (query, json.dumps(response, ensure_ascii=False), time.time())).lastrowid
+            self.conn.executemany("INSERT OR IGNORE INTO lsh (band, bucket, query_id) VALUES (?, ?, ?)",
+                                  [(band, bucket, query_id) for band, bucket in enumerate(buckets)])
+
+    def stats(self) -> dict:
+        values = dict(self.conn.execute("SELECT name, value FROM stats"))
+        lookups = values.get("lookups", 0)
+        return {
+            "entries": self.conn.execute("SELECT COUNT(*) FROM queries").fetchone()[0],
+            "lookups": int(lookups),
+            "hit_rate": round(values.get("hits", 0) / max(1, lookups), 3),
+            "seed_rate": round(values.get("seeded", 0) / max(1, lookups), 3),
+            "avg_lookup_ms": round(values.get("lookup_ms", 0) / max(1, lookups), 3),
+            "avg_candidates": round(values.get("candidates", 0) / max(1, lookups), 2),
+        }
+
+
+# ======================================================== BENCHMARK ======================================================== #
+_TOPICS = ["population", "economy", "history", "climate", "languages", "religions", "exports", "capital cities",
+           "education system", "healthcare", "tourism", "railways", "elections", "cuisine", "wildlife"]
+_PLACES = ["South Asian countries", "Southeast Asia", "Malaysia", "Indonesia", "Japan", "Nordic countries", "Kenya",
+           "Brazil", "the Balkans", "Central Asia", "Pacific islands", "Mexico", "Canada", "Vietnam", "Chile",
+           "West Africa", "the Middle East", "Germany", "Peru", "Mongolia"]
+_ASPECTS = ["in 2020", "since independence", "compared to neighbours", "over the last decade", "today", "trends",
+            "key facts", "statistics", "overview", "challenges"]
+
+
+def _pseudo_word(rng: random.Random) -> str:
+    return "".join(rng.choice("bcdfghklmnprstvz") + rng.choice("aeiou") for _ in range(3))
+
+
+def _question(topic: str, place: str, aspect: str, word: str, rng: random.Random, paraphrase: bool) -> str:
+    if not paraphrase:
+        return f"{topic} of {place} {aspect} ({word})"
+    place = place.replace("Asian", "Asia")
+    return rng.choice([f"{place} {topic} {aspect} {word}", f"what is the {topic} of {place} {word} {aspect}",
+                       f"{word}: {aspect} {topic} in {place}", f"{place} - {topic}, {aspect}, {word}"])
+
+
+def benchmark(sizes: list[int], probes: int = 300, seed: int = 7):
+    ''' Grows a throwaway cache to each size and probes it with paraphrases and unrelated questions. '''
+    print(f"{'entries':>8} {'p50 ms':>8} {'p95 ms':>8} {'candidates':>11} {'paraphrase hit':>15} {'false hit':>10}")
+    # paraphrase hit: a reworded question returns the entry it was reworded from
+    rng = random.Random(seed)
+    path = f"/tmp/research_cache_bench_{os.getpid()}.db"
+    try:
+        cache = QueryCache(path, reuse=True)
+        known = []
+        for size in sizes:
+            while len(known) < size:
+                # A pseudo-word per question keeps the corpus growing past the template combinations
+                parts = (rng.choice(_TOPICS), rng.choice(_PLACES), rng.choice(_ASPECTS), _pseudo_word(rng))
+                known.append(parts)
+                cache.store(_question(*parts, rng, paraphrase=False), {"topic": parts[0]})
+            latencies, hits, false_hits = [], 0, 0
+            before = cache.stats()
+            for _ in range(probes):
+                parts = rng.choice(known)
+                started = time.perf_counter()
+                match = cache.lookup(_question(*parts, rng, paraphrase=True))
+                latencies.append(time.perf_counter() - started)
+                hits += bool(match and match.reusable and match.query == _question(*parts, rng, paraphrase=False))
+                unrelated = f"{rng.choice(_TOPICS)} of the moon landing programme {_pseudo_word(rng)}"
+                false_hits += bool((match := cache.lookup(unrelated)) and match.reusable)
+            after = cache.stats()
+            candidates = (after["avg_candidates"] * after["lookups"] - before["avg_candidates"] * before["lookups"]) \
+                / max(1, after["lookups"] - before["lookups"])
+            print(f"{size:>8} {percentile(latencies, 50) * 1000:>8.2f} {percentile(latencies, 95) * 1000:>8.2f} "
+                  f"{candidates:>11.1f} {hits / probes:>15.1%} {false_hits / probes:>10.1%}")
+            logging.info(f"{size} entries: {latency_summary(latencies)}")
+    finally:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+# ======================================================== BENCHMARK ======================================================== #
+
+
+if __name__ == "__main__":
+    cli = argparse.ArgumentParser(description="Near-duplicate question cache for the research assistant.")
+    cli.add_argument("--cache", default=os.getenv("RESEARCH_CACHE_PATH") or DEFAULT_CACHE_PATH)
+    sub = cli.add_subparsers(dest="command", required=True)
+    lookup_cmd = sub.add_parser("lookup", help="Show the closest cached question")
+    lookup_cmd.add_argument("query")
+    sub.add_parser("stats", help="Entries, hit rate and lookup latency")
+    bench_cmd = sub.add_parser("bench", help="Lookup latency and hit rate as the corpus grows (throwaway cache)")
+    bench_cmd.add_argument("--sizes", type=lambda s: [int(x) for x in s.split(",")], default=[1000, 10000, 50000])
+    args = cli.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='-- logger: %(message)s')
+    if args.command == "bench":
+        benchmark(args.sizes)
+    elif args.command == "stats":
+        print(json.dumps(QueryCache(args.cache).stats(), indent=2))
+    else:
+        match = QueryCache(args.cache).lookup(args.query)
+        print(json.dumps(match._asdict() if match else None, indent=2, ensure_ascii=False))
@@ -0,0 +1,101 @@
+import logging
+import math
+import re
+from collections import Counter
+
+# BM25 post-processing for research tool output. Raw search results are split into
+# passages, scored against the query, and only the best passages that fit in the
+# token budget are handed to the agent scratchpad.
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+PASSAGE_WORDS = 40
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\s*\.\.\.\s*|\n+")
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were what which who with".split())
+
+
+def estimate_tokens(text: str) -> int:
+    ''' Rough LLM token estimate (~4 characters per token), good enough for budgeting. '''
+    return math.ceil(len(text) / 4)
+
+
+def tokenize(text: str) -> list[str]:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS]
+
+
+def split_passages(text: str, passage_words: int = PASSAGE_WORDS) -> list[str]:
+    ''' Groups sentences into passages of roughly passage_words words. '''
+    passages, current, current_words = [], [], 0
+    for sentence in _SENTENCE_RE.split(text):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        current.append(sentence)
+        current_words += len(sentence.split())
+        if current_words >= passage_words:
+            passages.append(" ".join(current))
+            current, current_words = [], 0
+    if current:
+        passages.append(" ".join(current))
+    return passages
+
+
+def bm25_scores(query: str, passages: list[str], k1: float = BM25_K1, b: float = BM25_B) -> list[float]:
+    ''' Okapi BM25 score of every passage for the query, using the passages themselves as the corpus. '''
+    query_terms = set(tokenize(query))
+    docs = [Counter(tokenize(p)) for p in passages]
+    if not docs or not query_terms:
+        return [0.0] * len(passages)
+    lengths = [sum(d.values()) for d in docs]
+    avg_length = (sum(lengths) / len(lengths)) or 1.0
+    n = len(docs)
+    scores = []
+    for doc, length in zip(docs, lengths):
+        score = 0.0
+        for term in query_terms:
+            tf = doc.get(term, 0)
+            if not tf:
+                continue
+            df = sum(1 for d in docs if term in d)
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / avg_length))
+        scores.append(score)
+    return scores
+
+
+def trim_to_budget(query: str, text: str, token_budget: int) -> str:
+    ''' Keeps the highest scoring passages that fit in token_budget, in their original order. '''
+    if estimate_tokens(text) <= token_budget:
+        return text
+    passages = split_passages(text)
+    if not passages:  # Nothing but whitespace, e.g. a search that returned no text
+        return text
+    scores = bm25_scores(query, passages)
+    ranked = sorted(range(len(passages)), key=lambda i: scores[i], reverse=True)
+
+    selected, used = [], 0
+    for i in ranked:
+        cost = estimate_tokens(passages[i]) + 1
+        if used + cost > token_budget:
+            continue
+        selected.append(i)
+        used += cost
+    if not selected:
+        # Even the best passage is over budget; cut it rather than returning nothing.
+        return passages[ranked[0]][: token_budget * 4]
+    return "\n".join(passages[i] for i in sorted(selected))
+
+
+def reranked(run, token_budget: int, tool_name: str = "search"):
+    ''' Wraps a tool function (query -> text) so its output is BM25-trimmed to token_budget. '''
+    def run_reranked(query: str) -> str:
+        raw = run(query)
+        trimmed = trim_to_budget(query, raw, token_budget)
+        before, after = estimate_tokens(raw), estimate_tokens(trimmed)
+        logging.info(
+            f"{tool_name} rerank: {before} -> {after} tokens (saved {before - after}) for query '{query}'")
+        return trimmed
+    return run_reranked
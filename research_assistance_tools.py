@@ -1,22 +1,95 @@
 from langchain_community.tools import WikipediaQueryRun, DuckDuckGoSearchRun
-from langchain_community.utilities import WikipediaAPIWrapper
+from langchain_community.utilities import DuckDuckGoSearchAPIWrapper, WikipediaAPIWrapper
 from langchain.tools import Tool
 from datetime import datetime
+from research_assistance_wiki_index import local_wikipedia_tool
+from research_assistance_rerank import reranked
+from agent_http import shared_transport, wikipedia_session
+from agent_deadline import remaining
+from research_assistance_archive import ResearchArchive, previous_research_tool
+import os
+import threading
 
 
-# Search Tool - This will trigger a web search
-search = DuckDuckGoSearchRun()
+# Search Tool - This will trigger a web search.
+# Results are BM25-trimmed to SEARCH_TOKEN_BUDGET tokens before reaching the agent (0 disables it).
+SEARCH_TOKEN_BUDGET = int(os.getenv("SEARCH_TOKEN_BUDGET", "300"))
+# Per-search timeout (s); a search never waits past the run deadline either.
+SEARCH_TIMEOUT = float(os.getenv("SEARCH_TIMEOUT", "5"))
+
+
+class PersistentDuckDuckGoSearchAPIWrapper(DuckDuckGoSearchAPIWrapper):
+    ''' Shares one DDGS client per process instead of building one per search, so its connections stay
+    open between searches. Concurrent searches are capped at HTTP_MAX_PER_HOST (see agent_http.py). '''
+
+    def _ddgs_text(self, query: str, max_results: int = None) -> list[dict[str, str]]:
+        if not _ddgs_slots.acquire(timeout=remaining()):
+            raise TimeoutError("No search slot freed up before the deadline")
+        try:
+            # DDGS fixes its timeout at construction; a search with less time left gets a client of its own
+            budget = remaining(SEARCH_TIMEOUT)
+            if budget <= 0:
+                raise TimeoutError("Run deadline exceeded before the search")
+            client = _ddgs_client() if budget >= SEARCH_TIMEOUT else _new_ddgs(budget)
+            results = client.text(query, region=self.region, safesearch=self.safesearch,
+                                  timelimit=self.time, max_results=max_results or self.max_results,
+                                  backend=self.backend)
+        finally:
+            _ddgs_slots.release()
+        return list(results or [])
+
+
+_ddgs = None
+_ddgs_lock = threading.Lock()
+_ddgs_slots = threading.BoundedSemaphore(int(os.getenv("HTTP_MAX_PER_HOST", "10")))
+
+
+def _new_ddgs(timeout: float):
+    from ddgs import DDGS
+    return DDGS(timeout=timeout)
+
+
+def _ddgs_client():
+    global _ddgs
+    with _ddgs_lock:
+        if _ddgs is None:
+            _ddgs = _new_ddgs(SEARCH_TIMEOUT)
+        return _ddgs
+
+
+search = DuckDuckGoSearchRun(api_wrapper=PersistentDuckDuckGoSearchAPIWrapper())
 search_tool = Tool(
     name="search",
-    func=search.run,
+    func=reranked(search.run, SEARCH_TOKEN_BUDGET) if SEARCH_TOKEN_BUDGET else search.run,
     description="Search the web for information"
 )
 
 
-# Wikipedia Tool - This will trigger a Wikipedia search
-wikipedia_api_wrapper = WikipediaAPIWrapper(
-    top_k_results=1, doc_content_chars_max=100)
-wikipedia_tool = WikipediaQueryRun(api_wrapper=wikipedia_api_wrapper)
+class PooledWikipediaAPIWrapper(WikipediaAPIWrapper):
+    ''' Keep-alive, per-host capped connections and cached DNS instead of a new connection per API call
+    (see agent_http.py); only this tool's calls use them. '''
+
+    def run(self, query: str) -> str:
+        with wikipedia_session(shared_transport()):
+            return super().run(query)
+
+
+# Wikipedia Tool - This will trigger a Wikipedia search.
+# Set WIKIPEDIA_INDEX_PATH to answer from the offline index instead (see research_assistance_wiki_index.py).
+WIKIPEDIA_TOP_K = int(os.getenv("WIKIPEDIA_TOP_K", "1"))
+WIKIPEDIA_CHARS_MAX = int(os.getenv("WIKIPEDIA_CHARS_MAX", "100"))
+if os.getenv("WIKIPEDIA_INDEX_PATH"):
+    wikipedia_tool = local_wikipedia_tool(
+        os.getenv("WIKIPEDIA_INDEX_PATH"), WIKIPEDIA_TOP_K, WIKIPEDIA_CHARS_MAX)
+else:
+    wikipedia_api_wrapper = PooledWikipediaAPIWrapper(
+        top_k_results=WIKIPEDIA_TOP_K, doc_content_chars_max=WIKIPEDIA_CHARS_MAX)
+    wikipedia_tool = WikipediaQueryRun(api_wrapper=wikipedia_api_wrapper)
+
+
+# Saved results are also indexed for search_previous_research (see research_assistance_archive.py).
+research_archive = ResearchArchive.from_env()
+archive_tool = previous_research_tool(research_archive) if research_archive else None
 
 
 # Save Tool - This will save the output to a file.
@@ -26,6 +99,8 @@ def save_to_txt(data: str, filename: str = "research_output.txt"):
 
     with open(filename, "a", encoding="utf-8") as f:
         f.write(formatted_text)
+    if research_archive is not None:
+        research_archive.add(data, timestamp)
 
     return f"Data successfully saved to {filename}"
 
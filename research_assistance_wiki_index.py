@@ -0,0 +1,218 @@
+import argparse
+import bz2
+import gzip
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import xml.etree.ElementTree as ET
+from langchain.tools import Tool
+
+# Offline Wikipedia backend: a SQLite FTS5 index built from a dump, served through
+# a tool with the same name, input and output format as WikipediaQueryRun.
+#
+#   python ./research_assistance_wiki_index.py ingest enwiki-latest-abstract.xml.gz
+#   python ./research_assistance_wiki_index.py query "Malaysia"
+
+DEFAULT_INDEX_PATH = "wikipedia_index.db"
+NO_RESULT = "No good Wikipedia Search Result was found"
+INGEST_BATCH_SIZE = 5000
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_WIKI_MARKUP_RE = re.compile(r"\{\{[^{}]*\}\}|<ref[^>]*/>|<ref[^>]*>.*?</ref>|<[^>]+>", re.DOTALL)
+_WIKI_LINK_RE = re.compile(r"\[\[(?:[^|\]]*\|)?([^\]]*)\]\]")
+
+
+def to_fts_query(text: str) -> str:
+    ''' Turns free text into a safe FTS5 query: every word quoted, any word may match. '''
+    words = _WORD_RE.findall(text.lower())
+    return " OR ".join(f'"{word}"' for word in words)
+
+
+def _open_dump(path: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rb")
+    return open(path, "rb")
+
+
+def _local_name(tag: str) -> str:
+    # MediaWiki dumps are namespaced ({http://www.mediawiki.org/xml/export-0.10/}page)
+    return tag.rsplit("}", 1)[-1]
+
+
+def _clean_wikitext(text: str) -> str:
+    text = _WIKI_MARKUP_RE.sub("", text)
+    text = _WIKI_LINK_RE.sub(r"\1", text)
+    text = text.replace("'''", "").replace("''", "")
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def iter_dump_documents(path: str):
+    ''' Streams (title, text) pairs from an abstracts dump, a pages-articles dump or a JSONL file. '''
+    if path.endswith((".jsonl", ".jsonl.gz", ".jsonl.bz2")):
+        with _open_dump(path) as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    yield record["title"], record["text"]
+        return
+
+    with _open_dump(path) as f:
+        events = ET.iterparse(f, events=("start", "end"))
+        _, root = next(events)
+        for event, elem in events:
+            if event != "end":
+                continue
+            name = _local_name(elem.tag)
+            if name == "doc":
+                # Abstracts dump: <doc><title>Wikipedia: X</title><abstract>...</abstract></doc>
+                title = (elem.findtext("title") or "").removeprefix("Wikipedia: ")
+                abstract = elem.findtext("abstract") or ""
+                if title and abstract:
+                    yield title, abstract.strip()
+                root.clear()  # Drops the finished element; clearing it alone leaves an empty node per doc
+            elif name == "page":
+                # Pages-articles dump: <page><title/><ns/><revision><text/></revision></page>
+                children = {_local_name(child.tag): child for child in elem}
+                title = children["title"].text if "title" in children else ""
+                namespace = children["ns"].text if "ns" in children else "0"
+                text = ""
+                if "revision" in children:
+                    for child in children["revision"]:
+                        if _local_name(child.tag) == "text":
+                            text = child.text or ""
+                if title and namespace == "0" and not text.lower().startswith("#redirect"):
+                    yield title, _clean_wikitext(text)
+                root.clear()
+
+
+def create_index(index_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(index_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS pages USING fts5(title, text, tokenize='unicode61 remove_diacritics 2')")
+    # One pages rowid per title, so ingesting a dump again replaces pages instead of duplicating them
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'titles'").fetchone():
+        with conn:
+            conn.execute("CREATE TABLE titles (id INTEGER PRIMARY KEY, title TEXT NOT NULL UNIQUE)")
+            # Indexes built before the titles table: keep the first copy of each title
+            conn.execute("INSERT OR IGNORE INTO titles (id, title) SELECT rowid, title FROM pages ORDER BY rowid")
+            conn.execute("DELETE FROM pages WHERE rowid NOT IN (SELECT id FROM titles)")
+    return conn
+
+
+def _write_batch(conn: sqlite3.Connection, batch: dict[str, str]):
+    with conn:
+        conn.executemany("INSERT OR IGNORE INTO titles (title) VALUES (?)", ((title,) for title in batch))
+        conn.executemany("DELETE FROM pages WHERE rowid = (SELECT id FROM titles WHERE title = ?)",
+                         ((title,) for title in batch))
+        conn.executemany("INSERT INTO pages(rowid, title, text) VALUES ((SELECT id FROM titles WHERE title = ?), ?, ?)",
+                         ((title, title, text) for title, text in batch.items()))
+
+
+def ingest(dump_path: str, index_path: str = DEFAULT_INDEX_PATH, batch_size: int = INGEST_BATCH_SIZE) -> int:
+    ''' Builds (or updates) the local index from a dump file; a title already indexed is replaced.
+    Returns the number of pages written. '''
+    conn = create_index(index_path)
+    started = time.perf_counter()
+    total = 0
+    batch = {}  # title -> text; a title repeated within the dump keeps its last text
+    for title, text in iter_dump_documents(dump_path):
+        batch[title] = text
+        if len(batch) >= batch_size:
+            _write_batch(conn, batch)
+            total += len(batch)
+            batch.clear()
+            logging.info(f"Indexed {total} pages...")
+    if batch:
+        _write_batch(conn, batch)
+        total += len(batch)
+    with conn:
+        conn.execute("INSERT INTO pages(pages) VALUES ('optimize')")
+    conn.close()
+    logging.info(
+        f"Indexed {total} pages into {index_path} in {time.perf_counter() - started:.1f}s")
+    return total
+
+
+class LocalWikipediaIndex:
+    ''' Answers Wikipedia queries from the local FTS5 index, formatted like WikipediaAPIWrapper.run. '''
+
+    def __init__(self, index_path: str = DEFAULT_INDEX_PATH, top_k_results: int = 1, doc_content_chars_max: int = 100):
+        if not os.path.exists(index_path):
+            raise FileNotFoundError(
+                f"Wikipedia index '{index_path}' not found. Build it with: python ./research_assistance_wiki_index.py ingest <dump>")
+        self.index_path = index_path
+        self.top_k_results = top_k_results
+        self.doc_content_chars_max = doc_content_chars_max
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        # One read-only connection per thread; sqlite connections are not shareable across threads.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.index_path}?mode=ro", uri=True)
+            self._local.conn = conn
+        return conn
+
+    def search(self, query: str, top_k: int = None) -> list[tuple[str, str]]:
+        fts_query = to_fts_query(query)
+        if not fts_query:
+            return []
+        # Title matches count far more than body matches, as with the live search API.
+        return self._connection().execute(
+            "SELECT title, text FROM pages WHERE pages MATCH ? ORDER BY bm25(pages, 10.0, 1.0) LIMIT ?",
+            (fts_query, top_k or self.top_k_results),
+        ).fetchall()
+
+    def run(self, query: str) -> str:
+        started = time.perf_counter()
+        summaries = [f"Page: {title}\nSummary: {text}" for title, text in self.search(query)]
+        logging.debug(
+            f"Local wikipedia lookup for '{query}' took {(time.perf_counter() - started) * 1000:.2f}ms")
+        if not summaries:
+            return NO_RESULT
+        return "\n\n".join(summaries)[: self.doc_content_chars_max]
+
+
+def local_wikipedia_tool(index_path: str = DEFAULT_INDEX_PATH, top_k_results: int = 1, doc_content_chars_max: int = 100) -> Tool:
+    ''' Drop-in replacement for WikipediaQueryRun backed by the local index. '''
+    index = LocalWikipediaIndex(index_path, top_k_results, doc_content_chars_max)
+    return Tool(
+        name="wikipedia",
+        func=index.run,
+        description=(
+            "A wrapper around Wikipedia. Useful for when you need to answer general questions about "
+            "people, places, companies, facts, historical events, or other subjects. "
+            "Input should be a search query."
+        ),
+    )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='-- logger: %(message)s')
+
+    cli = argparse.ArgumentParser(description="Offline Wikipedia index for the research assistant.")
+    cli.add_argument("--index", default=os.getenv("WIKIPEDIA_INDEX_PATH", DEFAULT_INDEX_PATH))
+    commands = cli.add_subparsers(dest="command", required=True)
+    ingest_cmd = commands.add_parser("ingest", help="Index an abstracts/pages-articles XML dump or a JSONL file")
+    ingest_cmd.add_argument("dump")
+    ingest_cmd.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE)
+    query_cmd = commands.add_parser("query", help="Query the local index")
+    query_cmd.add_argument("text")
+    query_cmd.add_argument("--top-k", type=int, default=3)
+    query_cmd.add_argument("--chars-max", type=int, default=4000)
+    args = cli.parse_args()
+
+    if args.command == "ingest":
+        ingest(args.dump, args.index, args.batch_size)
+    else:
+        index = LocalWikipediaIndex(args.index, args.top_k, args.chars_max)
+        started = time.perf_counter()
+        print(index.run(args.text))
+        print(f"\n({(time.perf_counter() - started) * 1000:.2f}ms)")